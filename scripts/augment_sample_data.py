@@ -2,179 +2,331 @@
 """Augment MongoDB sample data with richer pins, bookmarks, replies, and chat content."""
 from __future__ import annotations
 
+import argparse
 import json
 import math
 import random
-import secrets
-from copy import deepcopy
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, Dict, List
 
+from sample_data import payloads
+from sample_data.allocator import QuotaAllocator
+from sample_data.codec import Date, ObjectId, encode, oid_value
+from sample_data.corpus import TextEngine
+from sample_data.delta import add_delta_argument
+from sample_data.geo import NO_ROOM, RoomIndex
+from sample_data.hotspots import HotspotField
+from sample_data.oids import ObjectIdFactory
+from sample_data.output import add_format_argument, check_checked_in_format
+from sample_data.payloads import build_titles, gibberish, random_coordinate
+from sample_data.pipeline import FixtureState, run_stages
+from sample_data.records import Bookmark, ChatMessage, ChatPresence, ChatRoom, Pin, Reply, User
+from sample_data.scale import ScaleConfig, ScaledDataset, generate
+from sample_data.stats import PIN_COUNTERS, apply_pin_stats, apply_user_stats, compute_stats
+
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "docs" / "mongodb-local-sample-data"
 
-random.seed(42)
-
-def load(path: Path) -> Any:
-    with path.open() as fh:
-        return json.load(fh)
-
-
-def dump(path: Path, data: Any) -> None:
-    with path.open("w") as fh:
-        json.dump(data, fh, indent=2)
-        fh.write("\n")
-
+SEED = 42
 
-def collect_oids(node: Any, bucket: set[str]) -> None:
-    if isinstance(node, dict):
-        for key, value in node.items():
-            if key == "$oid" and isinstance(value, str):
-                bucket.add(value)
-            else:
-                collect_oids(value, bucket)
-    elif isinstance(node, list):
-        for item in node:
-            collect_oids(item, bucket)
 
+class SampleData:
+    def __init__(self, state: FixtureState) -> None:
+        self.users: List[User] = state.load("users")
+        self.pins: List[Pin] = state.load("pins")
+        self.bookmarks: List[Bookmark] = state.load("bookmarks")
+        self.replies: List[Reply] = state.load("replies")
+        self.chat_messages: List[ChatMessage] = state.load("proximityChatMessages")
+        self.chat_presence: List[ChatPresence] = state.load("proximityChatPresence")
+        self.chat_rooms: List[ChatRoom] = state.load("proximityChatRooms")
 
-def oid_value(oid_obj: Dict[str, str]) -> str:
-    return oid_obj["$oid"]
+        self.oids = ObjectIdFactory()
 
+        # Users are found by ordinal through the persisted reference index;
+        # ``self.users`` is still exactly what is on disk at this point.
+        self.user_ordinals = state.references().collection("users").ordinals()
 
-def date_value(date_obj: Dict[str, str]) -> datetime:
-    return datetime.fromisoformat(date_obj["$date"].replace("Z", "+00:00"))
+    def user(self, uid: ObjectId) -> User:
+        return self.users[self.user_ordinals[uid]]
 
+    def new_oid(self, created: datetime | None = None) -> ObjectId:
+        return self.oids.new_oid(created)
 
-class SampleData:
-    def __init__(self) -> None:
-        self.users = load(DATA_DIR / "mongodb-sample-users.json")
-        self.pins = load(DATA_DIR / "mongodb-sample-pins.json")
-        self.bookmarks = load(DATA_DIR / "mongodb-sample-bookmarks.json")
-        self.replies = load(DATA_DIR / "mongodb-sample-replies.json")
-        self.chat_messages = load(DATA_DIR / "mongodb-sample-proximityChatMessages.json")
-        self.chat_presence = load(DATA_DIR / "mongodb-sample-proximityChatPresence.json")
-        self.chat_rooms = load(DATA_DIR / "mongodb-sample-proximityChatRooms.json")
-
-        self.used_oids: set[str] = set()
-        for dataset in [
-            self.users,
-            self.pins,
-            self.bookmarks,
-            self.replies,
-            self.chat_messages,
-            self.chat_presence,
-            self.chat_rooms,
-        ]:
-            collect_oids(dataset, self.used_oids)
-
-        self.user_lookup = {oid_value(user["_id"]): user for user in self.users}
-        self.pin_lookup = {oid_value(pin["_id"]): pin for pin in self.pins}
-
-    def new_oid(self) -> str:
-        while True:
-            candidate = secrets.token_hex(12)
-            if candidate not in self.used_oids:
-                self.used_oids.add(candidate)
-                return candidate
-
-    def oid_ref(self, oid: str) -> Dict[str, str]:
-        return {"$oid": oid}
+    def oid_ref(self, oid: str | ObjectId) -> ObjectId:
+        return payloads.oid_ref(oid)
 
     @staticmethod
-    def iso_date(dt: datetime) -> Dict[str, str]:
-        return {"$date": dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")}
+    def iso_date(dt: datetime) -> Date:
+        return payloads.iso_date(dt)
 
     def photo_payload(self, path: str) -> Dict[str, Any]:
-        return {
-            "url": path,
-            "thumbnailUrl": path,
-            "width": 512,
-            "height": 512,
-            "mimeType": "image/jpeg",
-        }
-
-    def avatar_payload(self, user: Dict[str, Any]) -> Dict[str, Any]:
-        avatar = deepcopy(user.get("avatar"))
-        if not avatar:
-            avatar = {
-                "url": "/images/profile/profile-01",
-                "thumbnailUrl": "/images/profile/profile-01",
-                "width": 128,
-                "height": 128,
-                "mimeType": "image/jpeg",
-                "uploadedAt": self.iso_date(datetime(2026, 8, 1, tzinfo=timezone.utc)),
-            }
-        return avatar
-
-
-def build_titles(prefixes: List[str], subjects: List[str], suffixes: List[str], needed: int) -> List[str]:
-    combos: List[str] = []
-    for p in prefixes:
-        for s in subjects:
-            for suf in suffixes:
-                combos.append(f"{p} {s} {suf}".strip())
-    random.shuffle(combos)
-    if len(combos) < needed:
-        raise ValueError("Not enough title combinations")
-    return combos[:needed]
-
-
-def random_coordinate() -> Dict[str, Any]:
-    lat = 33.7838 + random.uniform(-0.012, 0.012)
-    lon = -118.1136 + random.uniform(-0.02, 0.02)
-    return {
-        "type": "Point",
-        "coordinates": [round(lon, 6), round(lat, 6)],
-        "accuracy": random.randint(5, 12),
-    }
-
-
-def precise_address() -> Dict[str, Any]:
-    anchors = [
-        ("Marine Stadium Launch", "5255 Paoli Way"),
-        ("CSULB Rec Fields", "1250 N Bellflower Blvd"),
-        ("Bluff Park Meetup", "2500 E Ocean Blvd"),
-        ("Colorado Lagoon Hub", "5119 E Colorado St"),
-        ("Palo Verde Pit Zone", "1800 Palo Verde Ave"),
-        ("Los Altos Lot", "2250 Bellflower Blvd"),
-    ]
-    label, line1 = random.choice(anchors)
-    return {
-        "precise": label,
-        "components": {
-            "line1": line1,
-            "city": "Long Beach",
-            "state": "CA",
-            "postalCode": "90840",
-            "country": "USA",
-        },
-    }
-
-
-def approx_city() -> Dict[str, str]:
-    return {
-        "city": "Long Beach",
-        "state": "CA",
-        "country": "USA",
-        "formatted": "Long Beach, CA",
-    }
-
+        return payloads.photo_payload(path)
 
-def gibberish() -> str:
-    syllables = ["zor", "bex", "malo", "quin", "riff", "plom", "zeta", "kyu", "vex", "luma"]
-    words = [random.choice(syllables) + random.choice(["", random.choice(syllables)]) for _ in range(random.randint(3, 7))]
-    return " ".join(words).capitalize() + "!"
+    def avatar_payload(self, user: User) -> Dict[str, Any]:
+        # Avatars are never mutated after loading, so messages share the
+        # author's dict instead of each taking a deep copy.
+        return user.get("avatar") or payloads.default_avatar()
 
 
 def pluralize(word: str, count: int) -> str:
     return f"{count} {word}{'' if count == 1 else 's'}"
 
 
-def main() -> None:
-    data = SampleData()
-    user_ids = list(data.user_lookup.keys())
+SCALE_OPTIONS = (
+    ("users", "Users to generate"),
+    ("pins", "Pins to generate (events and discussions)"),
+    ("replies_per_pin", "Replies written under every pin"),
+    ("bookmarks_per_pin", "Distinct users bookmarking every pin"),
+    ("messages", "Proximity chat messages"),
+    ("presence", "Proximity chat presence records (unique per room/user)"),
+    ("rooms", "Proximity chat rooms"),
+)
+
+
+HOTSPOT_OPTIONS = [
+    "hotspots",
+    "hotspot_background",
+    "hotspot_radius",
+    "hotspot_radius_sigma",
+    "hotspot_density",
+    "hotspot_skew",
+]
+
+REPLY_OPTIONS = [
+    "reply_tail",
+    "max_replies",
+    "reply_share",
+    "reply_recency",
+    "reply_depth",
+]
+
+TEXT_OPTIONS = [
+    "vocabulary",
+    "zipf",
+    "median_words",
+    "words_sigma",
+    "max_words",
+    "description_words",
+]
+
+TRAFFIC_OPTIONS = [
+    "chat_days",
+    "sessions_per_day",
+    "session_minutes",
+    "messages_per_hour",
+    "burst_size",
+    "diurnal",
+]
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_format_argument(parser)
+    add_delta_argument(parser)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes for sharded generation and for writing collections; "
+        "does not affect output (default: CPU count)",
+    )
+    scale = parser.add_argument_group(
+        "scale mode",
+        "Generate a fresh dataset with the given cardinalities instead of augmenting the checked-in fixtures.",
+    )
+    for name, help_text in SCALE_OPTIONS:
+        scale.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name, help=help_text)
+    scale.add_argument("--event-share", type=float, help="Fraction of generated pins that are events")
+    scale.add_argument("--seed", type=int, help="Seed for the scale generator (default: 42)")
+    scale.add_argument(
+        "--shard-size",
+        type=int,
+        help="Documents per generation shard; does not affect output (default: 5000)",
+    )
+    scale.add_argument(
+        "--hotspots",
+        type=int,
+        help="Cluster pin coordinates around this many hotspots (anchors and locations first; default: uniform)",
+    )
+    scale.add_argument(
+        "--hotspot-background", type=float, help="Share of hotspot-mode pins spread uniformly (default: 0.1)"
+    )
+    scale.add_argument("--hotspot-radius", type=float, help="Median hotspot radius in meters (default: 250)")
+    scale.add_argument(
+        "--hotspot-radius-sigma",
+        type=float,
+        help="Log-normal sigma of hotspot radii; 0 makes them equal (default: 0.5)",
+    )
+    scale.add_argument(
+        "--hotspot-density",
+        type=float,
+        help="Size each hotspot to hold this many pins per km² (overrides --hotspot-radius)",
+    )
+    scale.add_argument(
+        "--hotspot-skew", type=float, help="Hotspot k gets weight 1/(k+1)**skew; 0 weighs them evenly (default: 1)"
+    )
+    scale.add_argument(
+        "--reply-tail",
+        type=float,
+        help="Draw replies per pin from a Lomax distribution of this shape, with --replies-per-pin as the median, "
+        "and thread them (smaller is heavier-tailed; default: every pin gets --replies-per-pin)",
+    )
+    scale.add_argument(
+        "--max-replies",
+        type=int,
+        help="With --reply-tail: reply cap for pins without a replyLimit (default: 5000)",
+    )
+    scale.add_argument(
+        "--reply-share", type=float, help="With --reply-tail: share of replies answering another reply (default: 0.6)"
+    )
+    scale.add_argument(
+        "--reply-recency",
+        type=float,
+        help="With --reply-tail: mean distance back to the reply answered; 1 gives chains (default: 3)",
+    )
+    scale.add_argument("--reply-depth", type=int, help="With --reply-tail: deepest reply level (default: 6)")
+    scale.add_argument(
+        "--vocabulary",
+        type=int,
+        help="Write message, reply and description text from a Zipfian vocabulary of this many words "
+        "(default: gibberish)",
+    )
+    scale.add_argument(
+        "--zipf", type=float, help="With --vocabulary: word k gets weight 1/(k+1)**zipf (default: 1.1)"
+    )
+    scale.add_argument(
+        "--median-words", type=float, help="With --vocabulary: median words per message or reply (default: 8)"
+    )
+    scale.add_argument(
+        "--words-sigma",
+        type=float,
+        help="With --vocabulary: log-normal sigma of text lengths; 0 makes them equal (default: 0.8)",
+    )
+    scale.add_argument("--max-words", type=int, help="With --vocabulary: longest text in words (default: 60)")
+    scale.add_argument(
+        "--description-words", type=float, help="With --vocabulary: median words per pin description (default: 30)"
+    )
+    scale.add_argument(
+        "--chat-days",
+        type=float,
+        help="Simulate this many days of chat sessions, heartbeats and message bursts "
+        "instead of --messages/--presence",
+    )
+    scale.add_argument(
+        "--sessions-per-day", type=float, help="With --chat-days: chat sessions per user per day (default: 1.5)"
+    )
+    scale.add_argument("--session-minutes", type=float, help="With --chat-days: mean session length (default: 15)")
+    scale.add_argument(
+        "--messages-per-hour", type=float, help="With --chat-days: mean messages per hour of a session (default: 4)"
+    )
+    scale.add_argument(
+        "--burst-size",
+        type=float,
+        help="With --chat-days: mean messages per burst; 1 gives plain Poisson arrivals (default: 3)",
+    )
+    scale.add_argument(
+        "--diurnal",
+        type=float,
+        help="With --chat-days: amplitude of the daily join cycle, 0 (flat) to 1 (default: 0.6)",
+    )
+    scale.add_argument("--out-dir", type=Path, help="Directory that receives the generated mongodb-sample-* files")
+    scale.add_argument(
+        "--show",
+        action="append",
+        metavar="COLLECTION:START[:STOP]",
+        help="Print selected generated documents (e.g. pins:734512) instead of writing files; repeatable",
+    )
+    scale.add_argument("--children", action="store_true", help="With --show pins:..., also print replies and bookmarks")
+    args = parser.parse_args(argv)
+
+    args.scale = (
+        any(getattr(args, name) is not None for name, _ in SCALE_OPTIONS)
+        or args.chat_days is not None
+        or args.reply_tail is not None
+        or args.vocabulary is not None
+        or args.out_dir is not None
+        or bool(args.show)
+    )
+    if args.scale and args.out_dir is None and not args.show:
+        parser.error("scale mode requires --out-dir (or --show)")
+    if args.scale and args.delta is not None:
+        parser.error("--delta applies to the checked-in fixtures, not to scale mode")
+    if args.out_dir is not None and args.out_dir.resolve() == DATA_DIR.resolve():
+        parser.error("refusing to overwrite the checked-in fixtures; pick another --out-dir")
+    if not args.scale:
+        check_checked_in_format(parser, args.format)
+    return args
+
+
+def show_documents(dataset: ScaledDataset, specs: List[str], children: bool) -> None:
+    """Rebuild and print individual documents without generating the rest."""
+    for spec in specs:
+        name, _, bounds = spec.partition(":")
+        view = dataset.collection(name)
+        start, _, stop = bounds.partition(":")
+        if not start:
+            raise ValueError(f"--show {spec!r} needs an index, e.g. pins:42")
+        indexes = view.indexes[int(start) : int(stop)] if stop else [view.indexes[int(start)]]
+        for index in indexes:
+            docs = [view[index]]
+            if children and view is dataset.pins:
+                docs.extend(dataset.replies_for_pin(index))
+                docs.extend(dataset.bookmarks_for_pin(index))
+            for doc in docs:
+                print(json.dumps(encode(doc), indent=2))
+
+
+def run_scaled(args: argparse.Namespace) -> None:
+    overrides = {
+        name: getattr(args, name)
+        for name in [opt for opt, _ in SCALE_OPTIONS]
+        + ["event_share", "seed", "shard_size"]
+        + HOTSPOT_OPTIONS
+        + REPLY_OPTIONS
+        + TEXT_OPTIONS
+        + TRAFFIC_OPTIONS
+        if getattr(args, name) is not None
+    }
+    config = ScaleConfig(**overrides)
+    try:
+        if args.show:
+            if config.chat_days:
+                raise ValueError("--show cannot rebuild single documents of a --chat-days simulation")
+            show_documents(ScaledDataset(config), args.show, args.children)
+            return
+        report = generate(config, args.out_dir, args.workers, args.format)
+    except (KeyError, ValueError) as exc:
+        raise SystemExit(f"error: {exc}")
+    print(f"Generated fixtures in {args.out_dir}:")
+    for line in report.lines():
+        print(line)
+    if config.hotspots:
+        print("Pin coordinates:")
+        for line in HotspotField.build(config.hotspot_config(), config.pins).lines():
+            print(line)
+    if config.vocabulary:
+        print("Text:")
+        for line in TextEngine(config.text_config()).lines():
+            print(line)
+    if report.traffic is not None:
+        print("Chat traffic:")
+        for line in report.traffic.lines():
+            print(line)
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.scale:
+        run_scaled(args)
+        return
+    run_stages([("augment", augment)], FixtureState(DATA_DIR, args.format, delta_dir=args.delta), args.workers)
+
+
+def augment(state: FixtureState) -> None:
+    """Pipeline stage: add pins, replies, bookmarks and chat traffic to ``state``."""
+    random.seed(SEED)
+    data = SampleData(state)
+    user_ids = list(data.user_ordinals)
 
     event_photos = [f"/images/event/event-{i:02d}" for i in range(21, 71)]
     discussion_photos = [f"/images/discussion/discussion-{i:02d}" for i in range(21, 71)]
@@ -209,118 +361,36 @@ def main() -> None:
         40,
     )
 
-    new_pins: List[Dict[str, Any]] = []
-    pin_meta: Dict[str, Dict[str, Any]] = {}
+    new_pins: List[Pin] = []
+    pin_meta: Dict[ObjectId, Dict[str, Any]] = {}
 
     base_start = datetime(2026, 3, 1, 17, 0, tzinfo=timezone.utc)
 
-    def pick_attendees(target: int) -> List[str]:
-        chosen: List[str] = []
-        available = user_ids.copy()
-        random.shuffle(available)
-        for _ in range(target):
-            if not available:
-                available = user_ids.copy()
-            candidate = max(
-                available,
-                key=lambda uid: (bookmark_quota.get(uid, 0), random.random()),
-            )
-            available.remove(candidate)
-            chosen.append(candidate)
-            if bookmark_quota.get(candidate, 0) > 0:
-                bookmark_quota[candidate] -= 1
-        return chosen
-
-    def ensure_min_bookmarks(assignments: Dict[str, List[str]]) -> None:
-        for uid, needed in list(bookmark_quota.items()):
-            while needed > 0:
-                pin_id = random.choice(list(assignments.keys()))
-                if uid in assignments[pin_id]:
-                    continue
-                assignments[pin_id].append(uid)
-                needed -= 1
-            bookmark_quota[uid] = 0
-
-    event_bookmark_assignments: Dict[str, List[str]] = {}
+    allocator = QuotaAllocator(bookmark_quota)
+
+    event_bookmark_assignments: Dict[ObjectId, List[ObjectId]] = {}
 
     for idx in range(40):
-        pin_id = data.new_oid()
+        start_dt = base_start + timedelta(days=idx * 2)
+        pin_id = data.new_oid(start_dt - timedelta(days=5))
         photo_path = event_photos[idx % len(event_photos)]
-        attendees = pick_attendees(random.randint(5, 6))
+        attendees = allocator.pick(random.randint(5, 6))
         event_bookmark_assignments[pin_id] = attendees.copy()
 
-        start_dt = base_start + timedelta(days=idx * 2)
         end_dt = start_dt + timedelta(hours=random.randint(2, 5))
-        expires_dt = end_dt + timedelta(days=30)
-
-        tags = random.sample([
-            "kayak",
-            "offroad",
-            "scuba",
-            "photo",
-            "debug",
-            "training",
-            "demo",
-            "music",
-        ], 3)
-
-        pin_payload = {
-            "_id": data.oid_ref(pin_id),
-            "type": "event",
-            "creatorId": data.oid_ref(random.choice(user_ids)),
-            "title": event_titles[idx],
-            "description": (
-                "Hands-on session featuring "
-                + random.choice([
-                    "kayaks",
-                    "dirt rigs",
-                    "reef drones",
-                    "camera sleds",
-                    "trail beacons",
-                ])
-                + ". Expect ridiculous banter and impromptu challenges."
-            ),
-            "coordinates": random_coordinate(),
-            "address": precise_address(),
-            "proximityRadiusMeters": random.choice([800, 1000, 1200]),
-            "photos": [data.photo_payload(photo_path)],
-            "coverPhoto": data.photo_payload(photo_path),
-            "tagIds": [],
-            "tags": tags,
-            "options": {
-                "allowBookmarks": True,
-                "allowShares": True,
-                "allowReplies": True,
-                "showAttendeeList": True,
-                "featured": False,
-                "visibilityMode": "map-and-list",
-                "reminderMinutesBefore": random.choice([30, 45, 60]),
-            },
-            "relatedPinIds": [],
-            "linkedLocationId": linked_location,
-            "linkedChatRoomId": None,
-            "visibility": "public",
-            "isActive": True,
-            "attendingUserIds": [data.oid_ref(uid) for uid in attendees],
-            "attendeeWaitlistIds": [],
-            "attendable": True,
-            "participantLimit": random.choice([40, 60, 80, 120]),
-            "participantCount": len(attendees),
-            "startDate": data.iso_date(start_dt),
-            "endDate": data.iso_date(end_dt),
-            "stats": {
-                "bookmarkCount": 0,
-                "replyCount": 0,
-                "shareCount": random.randint(0, 5),
-                "viewCount": random.randint(120, 800),
-            },
-            "bookmarkCount": 0,
-            "replyCount": 0,
-            "descriptionHasMarkdown": False,
-            "createdAt": data.iso_date(start_dt - timedelta(days=5)),
-            "updatedAt": data.iso_date(start_dt - timedelta(days=5)),
-            "expiresAt": data.iso_date(expires_dt),
-        }
+
+        tags = random.sample(payloads.EVENT_TAGS, 3)
+        pin_payload = payloads.event_pin_payload(
+            pin_id,
+            random.choice(user_ids),
+            event_titles[idx],
+            photo_path,
+            attendees,
+            start_dt,
+            end_dt,
+            tags,
+            linked_location,
+        )
         new_pins.append(pin_payload)
         pin_meta[pin_id] = {
             "type": "event",
@@ -330,64 +400,24 @@ def main() -> None:
         }
 
     # ensure quotas satisfied
-    ensure_min_bookmarks(event_bookmark_assignments)
+    shortfall = allocator.fill(event_bookmark_assignments)
+    for uid, missing in shortfall.items():
+        print(f"Warning: user {uid} is {missing} event bookmarks short of the quota; every event already includes them.")
 
     for idx in range(40):
-        pin_id = data.new_oid()
-        photo_path = discussion_photos[idx % len(discussion_photos)]
         start_dt = base_start + timedelta(days=idx)
-        expires_dt = start_dt + timedelta(days=90)
-        tags = random.sample([
-            "chat",
-            "debug",
-            "design",
-            "surf",
-            "grid",
-            "map",
-            "qa",
-            "coffee",
-        ], 3)
-        pin_payload = {
-            "_id": data.oid_ref(pin_id),
-            "type": "discussion",
-            "creatorId": data.oid_ref(random.choice(user_ids)),
-            "title": discussion_titles[idx],
-            "description": "Open mic for nonsense theories, waypoint lore, and snack trades.",
-            "coordinates": random_coordinate(),
-            "approximateAddress": approx_city(),
-            "proximityRadiusMeters": random.choice([400, 600, 800]),
-            "photos": [data.photo_payload(photo_path)],
-            "coverPhoto": data.photo_payload(photo_path),
-            "tagIds": [],
-            "tags": tags,
-            "options": {
-                "allowBookmarks": True,
-                "allowShares": True,
-                "allowReplies": True,
-                "showAttendeeList": False,
-                "visibilityMode": "map-and-list",
-                "featured": False,
-            },
-            "relatedPinIds": [],
-            "linkedLocationId": linked_location,
-            "linkedChatRoomId": None,
-            "visibility": "public",
-            "isActive": True,
-            "participantCount": 0,
-            "autoDelete": False,
-            "stats": {
-                "bookmarkCount": 0,
-                "replyCount": 0,
-                "shareCount": random.randint(0, 3),
-                "viewCount": random.randint(60, 420),
-            },
-            "bookmarkCount": 0,
-            "replyCount": 0,
-            "createdAt": data.iso_date(start_dt - timedelta(days=3)),
-            "updatedAt": data.iso_date(start_dt - timedelta(days=3)),
-            "expiresAt": data.iso_date(expires_dt),
-            "replyLimit": random.choice([50, 75, 100, 150, 200]),
-        }
+        pin_id = data.new_oid(start_dt - timedelta(days=3))
+        photo_path = discussion_photos[idx % len(discussion_photos)]
+        tags = random.sample(payloads.DISCUSSION_TAGS, 3)
+        pin_payload = payloads.discussion_pin_payload(
+            pin_id,
+            random.choice(user_ids),
+            discussion_titles[idx],
+            photo_path,
+            start_dt,
+            tags,
+            linked_location,
+        )
         new_pins.append(pin_payload)
         pin_meta[pin_id] = {
             "type": "discussion",
@@ -395,14 +425,18 @@ def main() -> None:
             "photo": photo_path,
         }
 
+    # Link each new pin to the chat room whose circle it falls in, if any.
+    rooms = RoomIndex.from_rooms(data.chat_rooms)
+    for pin, room_id in zip(new_pins, rooms.assign_ids([pin["coordinates"] for pin in new_pins])):
+        pin["linkedChatRoomId"] = room_id
+
     data.pins.extend(new_pins)
     for pin in new_pins:
         pid = oid_value(pin["_id"])
-        data.pin_lookup[pid] = pin
         existing_pin_types[pid] = pin["type"]
 
     # Replies
-    new_replies: List[Dict[str, Any]] = []
+    new_replies: List[Reply] = []
     for pin_id, meta in pin_meta.items():
         pin_type = meta["type"]
         participant_pool = (
@@ -411,27 +445,12 @@ def main() -> None:
         reply_authors = random.sample(participant_pool, min(len(participant_pool), 3))
         parent_id = None
         for idx, author_id in enumerate(reply_authors):
-            reply_id = data.new_oid()
-            message = (
-                "Splatwave latency check" if pin_type == "event" else "Thread drift accepted"
-            )
-            snippet_bank = [
-                "blip", "swoop", "gloop", "kay-mode", "debug dribble", "calico loop",
-            ]
-            message = f"{random.choice(snippet_bank)} : {gibberish()}"
-            reply_payload = {
-                "_id": data.oid_ref(reply_id),
-                "pinId": data.oid_ref(pin_id),
-                "parentReplyId": data.oid_ref(parent_id) if parent_id else None,
-                "authorId": data.oid_ref(author_id),
-                "message": message,
-                "attachments": [],
-                "reactions": [],
-                "mentionedUserIds": [],
-                "audit": {"createdBy": data.oid_ref(author_id)},
-                "createdAt": data.iso_date(datetime(2026, 6, 1, tzinfo=timezone.utc) + timedelta(days=random.randint(0, 60))),
-                "updatedAt": data.iso_date(datetime(2026, 6, 1, tzinfo=timezone.utc) + timedelta(days=random.randint(0, 60))),
-            }
+            message = f"{random.choice(payloads.SNIPPET_BANK)} : {gibberish()}"
+            reply_window = datetime(2026, 6, 1, tzinfo=timezone.utc)
+            created = reply_window + timedelta(days=random.randint(0, 60))
+            updated = reply_window + timedelta(days=random.randint(0, 60))
+            reply_id = data.new_oid(created)
+            reply_payload = payloads.reply_payload(reply_id, pin_id, parent_id, author_id, message, created, updated)
             new_replies.append(reply_payload)
             if idx == 0:
                 parent_id = reply_id
@@ -440,7 +459,7 @@ def main() -> None:
     data.replies.extend(new_replies)
 
     # Bookmarks
-    new_bookmarks: List[Dict[str, Any]] = []
+    new_bookmarks: List[Bookmark] = []
     bookmark_pairs = {(oid_value(bm["userId"]), oid_value(bm["pinId"])) for bm in data.bookmarks}
 
     for pin_id, meta in pin_meta.items():
@@ -448,39 +467,19 @@ def main() -> None:
             users_for_pin = event_bookmark_assignments.get(pin_id, meta.get("attendees", []))
         else:
             users_for_pin = random.sample(user_ids, 4)
-        notes_template = {
-            "event": "Stack extras for {}",
-            "discussion": "Clip notes for {}",
-        }
         for uid in users_for_pin:
             if (uid, pin_id) in bookmark_pairs:
                 continue
             bookmark_pairs.add((uid, pin_id))
-            bookmark_id = data.new_oid()
             stamp = datetime(2026, 7, 1, tzinfo=timezone.utc) + timedelta(days=random.randint(0, 45))
-            payload = {
-                "_id": data.oid_ref(bookmark_id),
-                "userId": data.oid_ref(uid),
-                "pinId": data.oid_ref(pin_id),
-                "collectionId": None,
-                "notes": notes_template[meta["type"]].format(meta["title"]),
-                "reminderAt": None,
-                "tagIds": [],
-                "audit": {
-                    "createdBy": data.oid_ref(uid),
-                    "updatedBy": data.oid_ref(uid),
-                },
-                "createdAt": data.iso_date(stamp),
-                "updatedAt": data.iso_date(stamp),
-            }
+            bookmark_id = data.new_oid(stamp)
+            notes = payloads.BOOKMARK_NOTES[meta["type"]].format(meta["title"])
+            payload = payloads.bookmark_payload(bookmark_id, uid, pin_id, notes, stamp)
             new_bookmarks.append(payload)
 
     data.bookmarks.extend(new_bookmarks)
 
-    # Chat conversation for CSULB Grid R2C3 (room id ...007)
-    room_id = "68e061721329566a22d40007"
-    chat_room = next(room for room in data.chat_rooms if oid_value(room["_id"]) == room_id)
-
+    # Chat conversation: every user posts once, in the room covering where they posted from.
     chat_start = datetime(2026, 10, 21, 18, 0, tzinfo=timezone.utc)
     attachments_pool = [
         "/images/discussion/discussion-05",
@@ -488,106 +487,102 @@ def main() -> None:
         "/images/discussion/discussion-33",
         "/images/event/event-27",
     ]
-    new_messages: List[Dict[str, Any]] = []
-
+    drafts = []
     for idx, uid in enumerate(user_ids):
-        msg_id = data.new_oid()
-        author = data.user_lookup[uid]
         dt = chat_start + timedelta(minutes=idx * 2)
+        msg_id = data.new_oid(dt)
         attachments = []
         if idx % 3 == 0:
             image_path = random.choice(attachments_pool)
-            attachments = [
-                {
-                    "type": "image",
-                    **data.photo_payload(image_path),
-                }
-            ]
-        payload = {
-            "_id": data.oid_ref(msg_id),
-            "roomId": data.oid_ref(room_id),
-            "pinId": None,
-            "authorId": data.oid_ref(uid),
-            "replyToMessageId": None,
-            "message": gibberish(),
-            "coordinates": random_coordinate(),
-            "attachments": attachments,
-            "audit": {"createdBy": data.oid_ref(uid)},
-            "createdAt": data.iso_date(dt),
-            "updatedAt": data.iso_date(dt),
-            "author": {
-                "_id": data.oid_ref(uid),
-                "username": author["username"],
-                "displayName": author["displayName"],
-                "avatar": data.avatar_payload(author),
-            },
-            "authorAvatar": data.avatar_payload(author),
-        }
+            attachments = [payloads.image_attachment(image_path)]
+        drafts.append((uid, msg_id, dt, gibberish(), random_coordinate(), attachments))
+
+    message_rooms = rooms.assign_points([draft[4] for draft in drafts])
+    new_messages: List[ChatMessage] = []
+    user_rooms: Dict[ObjectId, int] = {}
+    for (uid, msg_id, dt, message, coordinate, attachments), room in zip(drafts, message_rooms):
+        if room == NO_ROOM:
+            print(f"Warning: no chat room covers {coordinate['coordinates']}; user {uid} posts nothing.")
+            continue
+        author = data.user(uid)
+        user_rooms[uid] = int(room)
+        payload = payloads.chat_message_payload(
+            msg_id,
+            rooms.ids[room],
+            uid,
+            author["username"],
+            author["displayName"],
+            data.avatar_payload(author),
+            data.avatar_payload(author),
+            message,
+            coordinate,
+            attachments,
+            dt,
+        )
         new_messages.append(payload)
 
     data.chat_messages.extend(new_messages)
 
-    new_presence: List[Dict[str, Any]] = []
+    # Each user is present in the room they posted in. (roomId, userId) is a
+    # unique index, so a user already present there gets a new session instead.
+    presence_by_key = {(oid_value(doc["roomId"]), oid_value(doc["userId"])): doc for doc in data.chat_presence}
+    new_presence: List[ChatPresence] = []
+    updated_presence: List[ChatPresence] = []
     for idx, uid in enumerate(user_ids):
-        presence_id = data.new_oid()
-        session_id = data.new_oid()
+        if uid not in user_rooms:
+            continue
         joined = chat_start + timedelta(minutes=idx)
         last_active = joined + timedelta(minutes=5 + idx % 4)
-        new_presence.append(
-            {
-                "_id": data.oid_ref(presence_id),
-                "roomId": data.oid_ref(room_id),
-                "userId": data.oid_ref(uid),
-                "sessionId": data.oid_ref(session_id),
-                "joinedAt": data.iso_date(joined),
-                "lastActiveAt": data.iso_date(last_active),
-            }
-        )
+        room_id = rooms.ids[user_rooms[uid]]
+        existing = presence_by_key.get((room_id, uid))
+        if existing is not None:
+            existing["sessionId"] = data.oid_ref(data.new_oid(joined))
+            existing["joinedAt"] = data.iso_date(joined)
+            existing["lastActiveAt"] = data.iso_date(last_active)
+            updated_presence.append(existing)
+            continue
+        presence_id = data.new_oid(joined)
+        session_id = data.new_oid(joined)
+        payload = payloads.presence_payload(presence_id, room_id, uid, session_id, joined, last_active)
+        presence_by_key[(room_id, uid)] = payload
+        new_presence.append(payload)
     data.chat_presence.extend(new_presence)
 
-    chat_room["participantIds"] = [data.oid_ref(uid) for uid in user_ids]
-    chat_room["participantCount"] = len(user_ids)
-
-    # Recalculate stats
-    bookmark_counts = Counter()
-    for bm in data.bookmarks:
-        bookmark_counts[oid_value(bm["pinId"])] += 1
-    reply_counts = Counter()
-    for reply in data.replies:
-        reply_counts[oid_value(reply["pinId"])] += 1
-
-    for pin in data.pins:
-        pid = oid_value(pin["_id"])
-        b_count = bookmark_counts.get(pid, 0)
-        r_count = reply_counts.get(pid, 0)
-        pin["bookmarkCount"] = b_count
-        pin["replyCount"] = r_count
-        if "stats" not in pin:
-            pin["stats"] = {}
-        pin["stats"]["bookmarkCount"] = b_count
-        pin["stats"]["replyCount"] = r_count
-        if pin["type"] == "event":
-            attendees = pin.get("attendingUserIds", [])
-            pin["participantCount"] = len(attendees)
-
-    # Update user bookmark stats
-    user_bookmarks = Counter()
-    for bm in data.bookmarks:
-        user_bookmarks[oid_value(bm["userId"])] += 1
-    for user in data.users:
-        uid = oid_value(user["_id"])
-        stats = user.get("stats") or {}
-        stats["bookmarks"] = user_bookmarks.get(uid, 0)
-        user["stats"] = stats
-
-    # Persist
-    dump(DATA_DIR / "mongodb-sample-pins.json", data.pins)
-    dump(DATA_DIR / "mongodb-sample-replies.json", data.replies)
-    dump(DATA_DIR / "mongodb-sample-bookmarks.json", data.bookmarks)
-    dump(DATA_DIR / "mongodb-sample-users.json", data.users)
-    dump(DATA_DIR / "mongodb-sample-proximityChatMessages.json", data.chat_messages)
-    dump(DATA_DIR / "mongodb-sample-proximityChatPresence.json", data.chat_presence)
-    dump(DATA_DIR / "mongodb-sample-proximityChatRooms.json", data.chat_rooms)
+    room_docs = {oid_value(room["_id"]): room for room in data.chat_rooms}
+    touched_rooms: List[ChatRoom] = []
+    for position in sorted(set(user_rooms.values())):
+        chat_room = room_docs[rooms.ids[position]]
+        participants = [oid_value(oid) for oid in chat_room.get("participantIds") or []]
+        participants.extend(uid for uid in user_ids if user_rooms.get(uid) == position and uid not in participants)
+        chat_room["participantIds"] = [data.oid_ref(uid) for uid in participants]
+        chat_room["participantCount"] = len(participants)
+        touched_rooms.append(chat_room)
+
+    # Recalculate pin counters and user bookmark stats
+    stats = compute_stats(
+        pins=data.pins,
+        users=data.users,
+        bookmarks=data.bookmarks,
+        replies=data.replies,
+        memory_budget=state.memory_budget,
+        spill_dir=state.spill_dir,
+    )
+    apply_pin_stats(data.pins, stats)
+    apply_user_stats(data.users, stats, ("bookmarks",))
+
+    # Persisted by the pipeline, in parallel and all together (see sample_data.persist),
+    # and journalled so recompute_user_stats can update incrementally.
+    state.record_changes("users", "update", data.users, ("stats",))
+    state.record_changes("pins", "insert", new_pins)
+    state.record_changes("pins", "update", data.pins, PIN_COUNTERS + ("stats",))
+    state.record_changes("bookmarks", "insert", new_bookmarks)
+    state.record_changes("replies", "insert", new_replies)
+    state.record_changes("proximityChatMessages", "insert", new_messages)
+    state.record_changes("proximityChatPresence", "insert", new_presence)
+    state.record_changes(
+        "proximityChatPresence", "update", updated_presence, ("sessionId", "joinedAt", "lastActiveAt")
+    )
+    state.record_changes("proximityChatRooms", "update", touched_rooms, ("participantIds", "participantCount"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Write the sample fixtures as a mongodump directory (BSON plus index metadata).
+
+Restore it with ``mongorestore --drop --numParallelCollections 4 --dir <out>``;
+the collections land in the database named by ``--db``.
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import List
+
+from sample_data.collections import DATA_DIR
+from sample_data.mongodump import DEFAULT_DB, DUMP_DIR_NAME, verify_dump, write_dump
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=DATA_DIR,
+        help="Directory holding the mongodb-sample-* files (default: the checked-in fixtures)",
+    )
+    parser.add_argument("--out", type=Path, help=f"Dump directory (default: <data dir>/{DUMP_DIR_NAME})")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"Database to restore into (default: {DEFAULT_DB})")
+    parser.add_argument("--workers", type=int, help="Worker processes, one collection each (default: CPU count)")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Decode the dump again, compare it with the fixtures and check its unique indexes; "
+        "exit 1 on any difference or duplicate key",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    report = write_dump(args.data_dir, args.out, args.db, args.workers)
+    if args.check:
+        verify_dump(args.data_dir, args.out, args.db, args.workers, report)
+    for line in report.lines():
+        print(line)
+    if not report.ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,167 @@
 #!/usr/bin/env python3
-"""Ensure every pin in sample data has at least 2-3 replies."""
+"""Ensure every pin in sample data has at least 2-3 replies.
+
+With ``--reply-tail``, pins are instead topped up to heavy-tailed reply counts
+with threaded replies; see :mod:`sample_data.replytree`.
+"""
 from __future__ import annotations
 
-import json
+import argparse
+import functools
 import random
-import secrets
-from collections import Counter
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+
+from sample_data.codec import Date, oid_value
+from sample_data.columns import add_column_cache_argument
+from sample_data.delta import add_delta_argument
+from sample_data.oids import ObjectIdFactory
+from sample_data.output import add_format_argument, check_checked_in_format
+from sample_data.pipeline import FixtureState, run_stages
+from sample_data.records import Pin, Reply
+from sample_data.replytree import ReplyTreeConfig, ReplyTrees
+from sample_data.spill import add_memory_budget_argument
+from sample_data.stats import apply_pin_stats, compute_stats
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "docs" / "mongodb-local-sample-data"
 
-random.seed(99)
+SEED = 99
 
 
-def load(name: str) -> Any:
-    return json.loads((DATA_DIR / name).read_text())
+def iso_date(dt: datetime) -> Date:
+    return Date.from_datetime(dt)
 
 
-def dump(name: str, data: Any) -> None:
-    (DATA_DIR / name).write_text(json.dumps(data, indent=2) + "\n")
+SYLLABLES = ["zor", "plix", "melo", "drim", "kyu", "vex", "luma", "riff", "scof", "bloop"]
+FLAIRS = ["!", "?", "...", "!!!"]
+TEMPLATES = [
+    "{noise} calibrating vibes around '{title}'",
+    "{noise} pls bring more snacks to '{title}'",
+    "{noise} someone left a paddle at '{title}'",
+    "{noise} thread drift achieved near '{title}'",
+]
 
 
-def oid_value(obj: Dict[str, str] | None) -> str | None:
-    if isinstance(obj, dict):
-        return obj.get("$oid")
-    return None
+def gibberish() -> str:
+    words = [random.choice(SYLLABLES) + random.choice(["", random.choice(SYLLABLES)]) for _ in range(random.randint(3, 6))]
+    return " ".join(words).capitalize() + random.choice(FLAIRS)
 
 
-def iso_date(dt: datetime) -> Dict[str, str]:
-    return {"$date": dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")}
+def playful_sentence(pin_title: str) -> str:
+    return random.choice(TEMPLATES).format(noise=gibberish(), title=pin_title)
 
 
-def gibberish() -> str:
-    syllables = [
-        "zor",
-        "plix",
-        "melo",
-        "drim",
-        "kyu",
-        "vex",
-        "luma",
-        "riff",
-        "scof",
-        "bloop",
-    ]
-    words = [random.choice(syllables) + random.choice(["", random.choice(syllables)]) for _ in range(random.randint(3, 6))]
-    flair = random.choice(["!", "?", "...", "!!!"])
-    return " ".join(words).capitalize() + flair
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_format_argument(parser)
+    add_delta_argument(parser)
+    add_memory_budget_argument(parser)
+    add_column_cache_argument(parser)
+    tail = parser.add_argument_group("heavy-tailed replies")
+    tail.add_argument(
+        "--reply-tail",
+        type=float,
+        help="Top pins up to reply counts drawn from a Lomax distribution of this shape "
+        "(smaller is heavier-tailed) instead of 2-3",
+    )
+    tail.add_argument("--median-replies", type=float, default=3.0, help="With --reply-tail: median count (default: 3)")
+    tail.add_argument(
+        "--max-replies",
+        type=int,
+        default=5000,
+        help="With --reply-tail: cap for pins without a replyLimit (default: 5000)",
+    )
+    tail.add_argument(
+        "--reply-share",
+        type=float,
+        default=0.6,
+        help="With --reply-tail: share of replies answering another reply (default: 0.6)",
+    )
+    tail.add_argument(
+        "--reply-recency",
+        type=float,
+        default=3.0,
+        help="With --reply-tail: mean distance back to the reply answered; 1 gives chains (default: 3)",
+    )
+    tail.add_argument("--reply-depth", type=int, default=6, help="With --reply-tail: deepest reply level (default: 6)")
+    args = parser.parse_args(argv)
+    check_checked_in_format(parser, args.format)
+    return args
 
 
-def playful_sentence(pin_title: str) -> str:
-    templates = [
-        "{noise} calibrating vibes around '{title}'",
-        "{noise} pls bring more snacks to '{title}'",
-        "{noise} someone left a paddle at '{title}'",
-        "{noise} thread drift achieved near '{title}'",
-    ]
-    return random.choice(templates).format(noise=gibberish(), title=pin_title)
-
-
-def main() -> None:
-    users = load("mongodb-sample-users.json")
-    pins = load("mongodb-sample-pins.json")
-    replies = load("mongodb-sample-replies.json")
-
-    user_ids = [oid_value(u["_id"]) for u in users]
-    user_lookup = {oid_value(u["_id"]): u for u in users}
-
-    used_reply_ids = {oid_value(r["_id"]) for r in replies}
-
-    def new_oid() -> str:
-        while True:
-            candidate = secrets.token_hex(12)
-            if candidate not in used_reply_ids:
-                used_reply_ids.add(candidate)
-                return candidate
-
-    reply_counts = Counter()
-    for reply in replies:
-        pid = oid_value(reply.get("pinId"))
-        if pid:
-            reply_counts[pid] += 1
-
-    new_replies: List[Dict[str, Any]] = []
+def tree_config(args: argparse.Namespace) -> Optional[ReplyTreeConfig]:
+    if args.reply_tail is None:
+        return None
+    config = ReplyTreeConfig(
+        median=args.median_replies,
+        tail=args.reply_tail,
+        max_replies=args.max_replies,
+        reply_share=args.reply_share,
+        recency=args.reply_recency,
+        max_depth=args.reply_depth,
+        seed=SEED,
+    )
+    try:
+        config.validate()
+    except ValueError as exc:
+        raise SystemExit(f"error: {exc}")
+    return config
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    state = FixtureState(DATA_DIR, args.format, args.memory_budget, args.spill_dir, args.column_cache, args.delta)
+    run_stages([("replies", functools.partial(ensure_replies, trees=tree_config(args)))], state)
+
+
+def ensure_replies(state: FixtureState, trees: Optional[ReplyTreeConfig] = None) -> None:
+    """Pipeline stage: top every pin up to 2-3 replies (or to heavy-tailed
+    counts drawn per ``trees``) and refresh pin reply counts."""
+    random.seed(SEED)
+    pins: List[Pin] = state.load("pins")
+    user_ids = [oid_value(u["_id"]) for u in state.iter("users")]
+
+    stats = compute_stats(
+        pins=pins,
+        replies=state.source("replies"),
+        memory_budget=state.memory_budget,
+        spill_dir=state.spill_dir,
+    )
+    oids = ObjectIdFactory()
     baseline = datetime(2026, 8, 1, 12, 0, tzinfo=timezone.utc)
+    if trees is not None:
+        new_replies = tree_replies(ReplyTrees(trees), pins, stats, user_ids, oids, baseline)
+    else:
+        new_replies = floor_replies(pins, stats, user_ids, oids, baseline)
 
-    for pin in pins:
+    if not new_replies:
+        print("All pins already satisfied minimum replies.")
+    else:
+        replies: List[Reply] = state.load("replies")
+        replies.extend(new_replies)
+        state.record_changes("replies", "insert", new_replies)
+        print(f"Added {len(new_replies)} replies across {len({oid_value(r['pinId']) for r in new_replies})} pins.")
+
+    # Update pin stats (reply_counts already includes the replies added above)
+    if new_replies:
+        apply_pin_stats(pins, stats, ("replyCount",))
+        state.record_changes("pins", "update", pins, ("replyCount", "stats"))
+
+
+def floor_replies(
+    pins: List[Pin], stats: Any, user_ids: List[Any], oids: ObjectIdFactory, baseline: datetime
+) -> List[Reply]:
+    """Top every pin with fewer than 2 replies up to 2-3, chaining some of them."""
+    reply_counts = stats.pin_counts["replyCount"]
+    new_replies: List[Reply] = []
+    for doc, pin in enumerate(pins):
         pid = oid_value(pin["_id"])
-        if not pid:
+        row = stats.pins.rows[doc]
+        if row < 0:
             continue
-        existing = reply_counts.get(pid, 0)
+        existing = reply_counts[row]
         if existing >= 2:
             continue
         target = random.choice([2, 3])
@@ -113,46 +182,86 @@ def main() -> None:
                 available = pool.copy()
                 random.shuffle(available)
             author_id = available.pop()
-            reply_id = new_oid()
             created = baseline + timedelta(days=random.randint(0, 30), minutes=random.randint(0, 720))
+            reply_id = oids.new_oid(created)
             message = playful_sentence(pin.get("title", "a pin"))
-            payload = {
-                "_id": {"$oid": reply_id},
-                "pinId": {"$oid": pid},
-                "parentReplyId": {"$oid": parent_id} if parent_id and random.random() < 0.6 else None,
-                "authorId": {"$oid": author_id},
-                "message": message,
-                "attachments": [],
-                "reactions": [],
-                "mentionedUserIds": [],
-                "audit": {"createdBy": {"$oid": author_id}},
-                "createdAt": iso_date(created),
-                "updatedAt": iso_date(created),
-            }
+            payload = Reply(
+                _id=reply_id,
+                pinId=pid,
+                parentReplyId=parent_id if parent_id and random.random() < 0.6 else None,
+                authorId=author_id,
+                message=message,
+                attachments=[],
+                reactions=[],
+                mentionedUserIds=[],
+                audit={"createdBy": author_id},
+                createdAt=iso_date(created),
+                updatedAt=iso_date(created),
+            )
             new_replies.append(payload)
             parent_id = reply_id
-            reply_counts[pid] += 1
+            reply_counts[row] += 1
+    return new_replies
 
-    if not new_replies:
-        print("All pins already satisfied minimum replies.")
-    else:
-        replies.extend(new_replies)
-        dump("mongodb-sample-replies.json", replies)
-        print(f"Added {len(new_replies)} replies across {len({oid_value(r['pinId']) for r in new_replies})} pins.")
 
-    # Update pin stats
-    if new_replies:
-        counts = Counter()
-        for reply in replies:
-            pid = oid_value(reply.get("pinId"))
-            if pid:
-                counts[pid] += 1
-        for pin in pins:
-            pid = oid_value(pin["_id"])
-            c = counts.get(pid, 0)
-            pin["replyCount"] = c
-            pin.setdefault("stats", {})["replyCount"] = c
-        dump("mongodb-sample-pins.json", pins)
+def tree_replies(
+    trees: ReplyTrees, pins: List[Pin], stats: Any, user_ids: List[Any], oids: ObjectIdFactory, baseline: datetime
+) -> List[Reply]:
+    """Top every pin up to its drawn reply count, one batch for all pins.
+
+    Counts, parents, authors and times come from ``trees`` keyed by the pin's
+    position in the fixture; new replies only answer other new replies.
+    """
+    reply_counts = stats.pin_counts["replyCount"]
+    ordinals: Dict[Any, int] = {uid: k for k, uid in enumerate(user_ids)}
+    docs = [doc for doc in range(len(pins)) if stats.pins.rows[doc] >= 0]
+    limits = [(pins[doc].get("replyLimit") or 0) if pins[doc]["type"] != "event" else 0 for doc in docs]
+    keys: List[int] = []
+    rows: List[int] = []
+    needed: List[int] = []
+    pools: List[List[int]] = []
+    for doc, target in zip(docs, trees.counts(docs, limits)):
+        row = stats.pins.rows[doc]
+        missing = max(int(target) - reply_counts[row], 0)
+        if not missing:
+            continue
+        pin = pins[doc]
+        keys.append(doc)
+        rows.append(row)
+        needed.append(missing)
+        if pin["type"] == "event":
+            attendees = (oid_value(a) for a in pin.get("attendingUserIds", []) or [])
+            pools.append([ordinals[uid] for uid in attendees if uid in ordinals])
+        else:
+            pools.append([])
+    if not keys or not user_ids:
+        return []
+    batch = trees.build(keys, needed, pools, len(user_ids)).lists()
+    new_replies: List[Reply] = []
+    for i, doc in enumerate(keys):
+        pin = pins[doc]
+        pid = oid_value(pin["_id"])
+        first = batch.starts[i]
+        for j in range(first, batch.starts[i + 1]):
+            author_id = user_ids[batch.author[j]]
+            created = baseline + timedelta(seconds=batch.offset[j])
+            parent = batch.parent[j]
+            payload = Reply(
+                _id=oids.new_oid(created),
+                pinId=pid,
+                parentReplyId=new_replies[parent]["_id"] if parent >= 0 else None,
+                authorId=author_id,
+                message=playful_sentence(pin.get("title", "a pin")),
+                attachments=[],
+                reactions=[],
+                mentionedUserIds=[],
+                audit={"createdBy": author_id},
+                createdAt=iso_date(created),
+                updatedAt=iso_date(created),
+            )
+            new_replies.append(payload)
+        reply_counts[rows[i]] += needed[i]
+    return new_replies
 
 
 if __name__ == "__main__":
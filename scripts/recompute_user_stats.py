@@ -2,72 +2,124 @@
 """Recompute user stats (bookmarks, events hosted/attended, posts) from sample data."""
 from __future__ import annotations
 
-import json
-from collections import Counter
+import argparse
+import functools
+import sys
 from pathlib import Path
-from typing import Any, Dict
+from typing import List
+
+from sample_data.codec import oid_value
+from sample_data.columns import add_column_cache_argument
+from sample_data.delta import add_delta_argument
+from sample_data.incremental import FullRecomputeNeeded, IncrementalUpdate, incremental_update, verify
+from sample_data.journal import Change, UserStatsSnapshot
+from sample_data.output import add_format_argument, check_checked_in_format
+from sample_data.pipeline import FixtureState, run_stages
+from sample_data.records import User
+from sample_data.spill import add_memory_budget_argument
+from sample_data.stats import USER_COUNTERS, apply_user_stats, compute_stats
 
 ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = ROOT / "docs" / "mongodb-local-sample-data"
 
 
-def load(name: str) -> Any:
-    return json.loads((DATA_DIR / name).read_text())
-
-
-def dump(name: str, data: Any) -> None:
-    (DATA_DIR / name).write_text(json.dumps(data, indent=2) + "\n")
-
-
-def oid_value(obj: Dict[str, str] | None) -> str | None:
-    if isinstance(obj, dict):
-        return obj.get("$oid")
-    return None
-
-
-def main() -> None:
-    users = load("mongodb-sample-users.json")
-    pins = load("mongodb-sample-pins.json")
-    bookmarks = load("mongodb-sample-bookmarks.json")
-    replies = load("mongodb-sample-replies.json")
-
-    bookmark_counts = Counter()
-    for bm in bookmarks:
-        uid = oid_value(bm.get("userId"))
-        if uid:
-            bookmark_counts[uid] += 1
-
-    events_hosted = Counter()
-    events_attended = Counter()
-    for pin in pins:
-        pid_type = pin.get("type")
-        creator = oid_value(pin.get("creatorId"))
-        if pid_type == "event" and creator:
-            events_hosted[creator] += 1
-        if pid_type == "event":
-            for attendee in pin.get("attendingUserIds", []) or []:
-                attendee_id = oid_value(attendee)
-                if attendee_id:
-                    events_attended[attendee_id] += 1
-
-    reply_counts = Counter()
-    for reply in replies:
-        author = oid_value(reply.get("authorId"))
-        if author:
-            reply_counts[author] += 1
-
-    for user in users:
-        uid = oid_value(user.get("_id"))
-        if not uid:
-            continue
-        stats = user.get("stats") or {}
-        stats["bookmarks"] = bookmark_counts.get(uid, 0)
-        stats["eventsHosted"] = events_hosted.get(uid, 0)
-        stats["eventsAttended"] = events_attended.get(uid, 0)
-        stats["posts"] = reply_counts.get(uid, 0)
-        user["stats"] = stats
-
-    dump("mongodb-sample-users.json", users)
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_format_argument(parser)
+    add_delta_argument(parser)
+    add_memory_budget_argument(parser)
+    add_column_cache_argument(parser)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--full",
+        action="store_true",
+        help="Rescan every pin, bookmark and reply instead of applying the change journal",
+    )
+    mode.add_argument(
+        "--verify",
+        action="store_true",
+        help="Check the incremental result against a full recompute; writes nothing",
+    )
+    args = parser.parse_args(argv)
+    check_checked_in_format(parser, args.format)
+    return args
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    state = FixtureState(DATA_DIR, args.format, args.memory_budget, args.spill_dir, args.column_cache, args.delta)
+    if args.verify:
+        try:
+            problems = verify(state)
+        except ValueError as exc:
+            problems = [str(exc)]
+        for line in problems:
+            print(line)
+        if problems:
+            sys.exit(1)
+        print("Incremental user stats match a full recompute.")
+        return
+    run_stages([("stats", functools.partial(recompute_stats, full=args.full))], state)
+
+
+def recompute_stats(state: FixtureState, full: bool = False) -> None:
+    """Pipeline stage: bring each user's ``stats`` counters up to date.
+
+    Applies the change journal to the saved counters when it can, and falls
+    back to rebuilding them from the other collections otherwise.
+    """
+    try:
+        changes = state.take_changes()
+    except ValueError as exc:
+        changes = []
+        full = True
+        print(f"Full recompute: {exc}.")
+    snapshot = UserStatsSnapshot.load(state.data_dir)
+
+    if not full:
+        try:
+            update = incremental_update(state, snapshot, changes)
+        except FullRecomputeNeeded as exc:
+            print(f"Full recompute: {exc}.")
+        else:
+            apply_incremental(state, update, changes)
+            return
+
+    users: List[User] = state.load("users")
+    stats = compute_stats(
+        pins=state.source("pins"),
+        users=users,
+        bookmarks=state.source("bookmarks"),
+        replies=state.source("replies"),
+        memory_budget=state.memory_budget,
+        spill_dir=state.spill_dir,
+    )
+    apply_user_stats(users, stats)
+    state.mark_dirty("users")
+    state.snapshot = UserStatsSnapshot(USER_COUNTERS, stats.user_totals(users))
+
+
+def apply_incremental(state: FixtureState, update: IncrementalUpdate, changes: List[Change]) -> None:
+    if not changes:
+        print("User stats are up to date.")
+        return
+    updated = 0
+    if update.affected:
+        users: List[User] = state.load("users")
+        zeros = [0] * len(USER_COUNTERS)
+        for user in users:
+            uid = oid_value(user.get("_id"))
+            if uid not in update.affected:
+                continue
+            stats = user.get("stats") or {}
+            for name, value in zip(USER_COUNTERS, update.totals.get(uid, zeros)):
+                stats[name] = value
+            user["stats"] = stats
+            updated += 1
+        if updated:
+            state.mark_dirty("users")
+    print(f"Applied {len(changes)} journalled changes ({update.inserted} new documents); updated {updated} users.")
+    state.snapshot = UserStatsSnapshot(USER_COUNTERS, update.totals)
 
 
 if __name__ == "__main__":
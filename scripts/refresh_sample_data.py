@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Refresh the sample fixtures in one process: augment, ensure pin replies, recompute user stats.
+
+Equivalent to running augment_sample_data.py, ensure_pin_replies.py and
+recompute_user_stats.py one after another, except that each collection is
+parsed once, later stages see earlier stages' changes in memory, and every
+changed collection is written once at the end.
+"""
+from __future__ import annotations
+
+import argparse
+from typing import List
+
+from augment_sample_data import DATA_DIR, augment
+from ensure_pin_replies import ensure_replies
+from recompute_user_stats import recompute_stats
+from sample_data.columns import add_column_cache_argument
+from sample_data.delta import add_delta_argument
+from sample_data.integrity import validate, validate_uncached
+from sample_data.mongodump import add_dump_argument, write_dump
+from sample_data.output import add_format_argument, check_checked_in_format
+from sample_data.pipeline import FixtureState, run_stages
+from sample_data.spill import add_memory_budget_argument
+
+STAGES = {
+    "augment": augment,
+    "replies": ensure_replies,
+    "stats": recompute_stats,
+}
+
+
+def parse_stages(value: str) -> List[str]:
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(STAGES))
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    # Stages always run in pipeline order, whatever order they were listed in.
+    return [name for name in STAGES if name in names]
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--stages",
+        type=parse_stages,
+        default=list(STAGES),
+        help=f"Comma-separated subset of {','.join(STAGES)} to run (default: all)",
+    )
+    add_format_argument(parser)
+    add_delta_argument(parser)
+    add_dump_argument(parser)
+    add_memory_budget_argument(parser)
+    add_column_cache_argument(parser)
+    parser.add_argument("--workers", type=int, help="Worker processes for writing collections (default: CPU count)")
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Check the refreshed fixtures with validate_sample_data.py afterwards; exit 1 on any problem",
+    )
+    args = parser.parse_args(argv)
+    check_checked_in_format(parser, args.format)
+    return args
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    stages = [(name, STAGES[name]) for name in args.stages]
+    state = FixtureState(DATA_DIR, args.format, args.memory_budget, args.spill_dir, args.column_cache, args.delta)
+    run_stages(stages, state, args.workers)
+    if args.bson_dump is not None:
+        for line in write_dump(DATA_DIR, args.bson_dump, workers=args.workers).lines():
+            print(line)
+    if args.validate:
+        report = validate(DATA_DIR, args.workers) if args.column_cache else validate_uncached(DATA_DIR, args.workers)
+        for line in report.lines():
+            print(line)
+        if not report.ok:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
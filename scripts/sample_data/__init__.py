@@ -0,0 +1 @@
+"""Shared helpers for the MongoDB sample-data scripts in ``scripts/``."""
@@ -0,0 +1,83 @@
+"""Quota-driven assignment of users to pins.
+
+``augment_sample_data`` wants every user to end up with a minimum number of
+event bookmarks. :class:`QuotaAllocator` hands out attendee slots to the users
+with the most quota left (a heap, so each pick is ``O(log users)``) and then
+tops up whatever is still missing with events each user is not already part
+of, reporting quotas that cannot be met instead of looping forever.
+"""
+from __future__ import annotations
+
+import heapq
+import random
+from collections import defaultdict
+from typing import Any, Dict, Hashable, List, Mapping, MutableMapping, Set, Tuple
+
+HeapEntry = Tuple[int, float, Hashable]
+
+
+class QuotaAllocator:
+    def __init__(self, quotas: Mapping[Hashable, int], rng: Any = random) -> None:
+        self.rng = rng
+        self.remaining: Dict[Hashable, int] = {uid: max(int(q), 0) for uid, q in quotas.items()}
+        # Every user sits in the heap exactly once, keyed on the negated
+        # remaining quota with a random tie-break, so popping and re-pushing a
+        # user never leaves stale entries behind.
+        self._heap: List[HeapEntry] = [(-q, rng.random(), uid) for uid, q in self.remaining.items()]
+        heapq.heapify(self._heap)
+
+    def pick(self, count: int) -> List[Hashable]:
+        """Pick ``count`` distinct users, favouring the largest remaining quota.
+
+        Users whose quota is already met are still eligible (in random order),
+        so events can always be filled; ``count`` is capped at the user count.
+        """
+        count = min(count, len(self._heap))
+        chosen = [heapq.heappop(self._heap)[2] for _ in range(count)]
+        for uid in chosen:
+            if self.remaining[uid] > 0:
+                self.remaining[uid] -= 1
+            heapq.heappush(self._heap, (-self.remaining[uid], self.rng.random(), uid))
+        return chosen
+
+    def fill(self, assignments: MutableMapping[Hashable, List[Hashable]]) -> Dict[Hashable, int]:
+        """Append users with unmet quota to slots they are not already in.
+
+        Returns ``{user: shortfall}`` for quotas that exceed the number of slots
+        the user could still join; those users get every remaining slot.
+        """
+        keys = list(assignments)
+        total = len(keys)
+        membership: Dict[Hashable, Set[int]] = defaultdict(set)
+        for position, key in enumerate(keys):
+            for uid in assignments[key]:
+                membership[uid].add(position)
+
+        shortfall: Dict[Hashable, int] = {}
+        for uid, needed in self.remaining.items():
+            if needed <= 0:
+                continue
+            taken = membership[uid]
+            free = total - len(taken)
+            if needed > free:
+                shortfall[uid] = needed - free
+                needed = free
+            for position in self._free_positions(taken, total, free, needed):
+                assignments[keys[position]].append(uid)
+            self.remaining[uid] = 0
+        return shortfall
+
+    def _free_positions(self, taken: Set[int], total: int, free: int, needed: int) -> List[int]:
+        if needed <= 0:
+            return []
+        if 2 * (free - needed) >= total:
+            # Every draw succeeds with probability >= 1/2, so rejection
+            # sampling finishes in O(needed) expected draws.
+            picked: Set[int] = set()
+            while len(picked) < needed:
+                position = self.rng.randrange(total)
+                if position not in taken:
+                    picked.add(position)
+            return sorted(picked)
+        candidates = [position for position in range(total) if position not in taken]
+        return sorted(self.rng.sample(candidates, needed))
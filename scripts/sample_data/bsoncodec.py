@@ -0,0 +1,250 @@
+"""Encode and decode BSON documents with the standard library alone.
+
+Only the types the fixtures hold are supported, which is what ``mongodump``
+would write for them:
+
+==============================  ======================================
+Python                          BSON
+==============================  ======================================
+``float``                       double (``0x01``)
+``str``                         string (``0x02``)
+``dict`` / record               embedded document (``0x03``)
+``list`` / ``tuple``            array (``0x04``)
+:class:`~codec.ObjectId`        ObjectId (``0x07``)
+``bool``                        boolean (``0x08``)
+:class:`~codec.Date`            UTC datetime (``0x09``)
+``None``                        null (``0x0A``)
+``int``                         int32 (``0x10``) or int64 (``0x12``)
+==============================  ======================================
+
+Extended JSON ``$oid``/``$date`` dicts that the codec left uncompacted
+(non-canonical spellings) are written as the ObjectId or datetime they stand
+for. Decoding gives back compact values, so ``decode_document(encode_document(doc))``
+equals ``doc`` for any fixture document.
+"""
+from __future__ import annotations
+
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .codec import _RECORD_TYPES, Date, DateSeconds, ObjectId
+
+_INT32 = struct.Struct("<i")
+_INT64 = struct.Struct("<q")
+_DOUBLE = struct.Struct("<d")
+_INT32_RANGE = range(-(1 << 31), 1 << 31)
+_INT64_RANGE = range(-(1 << 63), 1 << 63)
+
+# Largest document the server accepts (16 MiB).
+MAX_DOCUMENT_SIZE = 16 * 1024 * 1024
+
+
+class BSONError(ValueError):
+    """A value that cannot be written as BSON, or bytes that are not BSON."""
+
+
+def _cstring(key: str) -> bytes:
+    raw = key.encode("utf-8")
+    if b"\x00" in raw:
+        raise BSONError(f"field name {key!r} contains a NUL byte")
+    return raw + b"\x00"
+
+
+def _extended(node: Dict[str, Any]) -> Optional[Any]:
+    """The ObjectId or Date a leftover ``$oid``/``$date`` dict stands for, else ``None``."""
+    if len(node) != 1:
+        return None
+    if "$oid" in node:
+        value = node["$oid"]
+        return ObjectId(value) if isinstance(value, str) else None
+    if "$date" in node:
+        value = node["$date"]
+        if isinstance(value, str):
+            return Date.from_datetime(datetime.fromisoformat(value.replace("Z", "+00:00")))
+        if isinstance(value, dict) and isinstance(value.get("$numberLong"), str):
+            return Date(int(value["$numberLong"]))
+    return None
+
+
+def _element(out: bytearray, key: str, value: Any) -> None:
+    kind = type(value)
+    name = _cstring(key)
+    if kind is str:
+        raw = value.encode("utf-8")
+        out += b"\x02" + name + _INT32.pack(len(raw) + 1) + raw + b"\x00"
+    elif kind is ObjectId:
+        out += b"\x07" + name + value
+    elif kind is Date or kind is DateSeconds:
+        out += b"\x09" + name + _INT64.pack(value)
+    elif value is True or value is False:
+        out += b"\x08" + name + (b"\x01" if value else b"\x00")
+    elif value is None:
+        out += b"\x0a" + name
+    elif isinstance(value, int):
+        if value in _INT32_RANGE:
+            out += b"\x10" + name + _INT32.pack(value)
+        elif value in _INT64_RANGE:
+            out += b"\x12" + name + _INT64.pack(value)
+        else:
+            raise BSONError(f"{key}: integer {value} does not fit in 64 bits")
+    elif isinstance(value, float):
+        out += b"\x01" + name + _DOUBLE.pack(value)
+    elif isinstance(value, dict):
+        special = _extended(value)
+        if special is not None:
+            _element(out, key, special)
+        else:
+            out += b"\x03" + name
+            _document(out, value.items())
+    elif kind in _RECORD_TYPES:
+        out += b"\x03" + name
+        _document(out, value.pairs())
+    elif isinstance(value, (list, tuple)):
+        out += b"\x04" + name
+        _document(out, ((str(index), item) for index, item in enumerate(value)))
+    elif isinstance(value, str):
+        _element(out, key, str(value))
+    else:
+        raise BSONError(f"{key}: cannot encode a {kind.__name__} as BSON")
+
+
+def _document(out: bytearray, pairs: Any) -> None:
+    start = len(out)
+    out += b"\x00\x00\x00\x00"
+    for key, value in pairs:
+        if not isinstance(key, str):
+            raise BSONError(f"field names must be strings, not {type(key).__name__}")
+        _element(out, key, value)
+    out += b"\x00"
+    out[start : start + 4] = _INT32.pack(len(out) - start)
+
+
+def encode_document(doc: Any) -> bytes:
+    """``doc`` (a dict or record) as one BSON document."""
+    out = bytearray()
+    pairs = doc.pairs() if type(doc) in _RECORD_TYPES else doc.items()
+    _document(out, pairs)
+    if len(out) > MAX_DOCUMENT_SIZE:
+        raise BSONError(f"document is {len(out):,} bytes, over the {MAX_DOCUMENT_SIZE:,}-byte limit")
+    return bytes(out)
+
+
+def _read_cstring(data: bytes, pos: int) -> Tuple[str, int]:
+    end = data.find(b"\x00", pos)
+    if end < 0:
+        raise BSONError(f"unterminated field name at byte {pos}")
+    return data[pos:end].decode("utf-8"), end + 1
+
+
+def _read_document(data: bytes, pos: int, array: bool) -> Tuple[Any, int]:
+    (size,) = _INT32.unpack_from(data, pos)
+    end = pos + size
+    if size < 5 or end > len(data) or data[end - 1] != 0:
+        raise BSONError(f"bad document length {size} at byte {pos}")
+    items: List[Any] = []
+    doc: Dict[str, Any] = {}
+    pos += 4
+    while pos < end - 1:
+        kind = data[pos]
+        key, pos = _read_cstring(data, pos + 1)
+        if kind == 0x02:
+            (length,) = _INT32.unpack_from(data, pos)
+            value: Any = data[pos + 4 : pos + 3 + length].decode("utf-8")
+            pos += 4 + length
+        elif kind == 0x07:
+            value = ObjectId(data[pos : pos + 12])
+            pos += 12
+        elif kind == 0x09:
+            value = Date(_INT64.unpack_from(data, pos)[0])
+            pos += 8
+        elif kind == 0x10:
+            value = _INT32.unpack_from(data, pos)[0]
+            pos += 4
+        elif kind == 0x12:
+            value = _INT64.unpack_from(data, pos)[0]
+            pos += 8
+        elif kind == 0x01:
+            value = _DOUBLE.unpack_from(data, pos)[0]
+            pos += 8
+        elif kind == 0x08:
+            value = data[pos] == 1
+            pos += 1
+        elif kind == 0x0A:
+            value = None
+        elif kind == 0x03 or kind == 0x04:
+            value, pos = _read_document(data, pos, kind == 0x04)
+        else:
+            raise BSONError(f"unsupported BSON type 0x{kind:02x} for field {key!r}")
+        if array:
+            items.append(value)
+        else:
+            doc[key] = value
+    if pos != end - 1:
+        raise BSONError(f"document ending at byte {end} overruns its length")
+    return (items if array else doc), end
+
+
+def decode_document(data: bytes, offset: int = 0) -> Tuple[Dict[str, Any], int]:
+    """The document starting at ``offset`` in ``data``, and the offset just past it."""
+    try:
+        return _read_document(data, offset, False)
+    except (struct.error, IndexError, UnicodeDecodeError) as exc:
+        raise BSONError(f"truncated or corrupt BSON at byte {offset}: {exc}") from exc
+
+
+def iter_bson(path: Path) -> Iterator[Dict[str, Any]]:
+    """Every document in a ``.bson`` file, as ``mongodump`` and :mod:`sample_data.mongodump` write them."""
+    with path.open("rb") as fh:
+        while True:
+            head = fh.read(4)
+            if not head:
+                return
+            if len(head) < 4:
+                raise BSONError(f"{path}: truncated document header")
+            (size,) = _INT32.unpack(head)
+            if size < 5 or size > MAX_DOCUMENT_SIZE:
+                raise BSONError(f"{path}: bad document length {size}")
+            buffer = head + fh.read(size - 4)
+            if len(buffer) != size:
+                raise BSONError(f"{path}: truncated document")
+            yield decode_document(buffer)[0]
+
+
+def same_value(expected: Any, actual: Any) -> bool:
+    """Whether a decoded value is what ``expected`` was encoded from.
+
+    Stricter than ``==``: ``True`` is not ``1`` and ``1.0`` is not ``1``, since
+    BSON keeps those apart and the server would see them differently.
+    """
+    kind = type(expected)
+    if kind is dict or kind in _RECORD_TYPES:
+        pairs = list(expected.pairs() if kind in _RECORD_TYPES else expected.items())
+        if kind is dict:
+            special = _extended(expected)
+            if special is not None:
+                return same_value(special, actual)
+        return (
+            type(actual) is dict
+            and len(pairs) == len(actual)
+            and list(actual) == [key for key, _ in pairs]
+            and all(same_value(value, actual[key]) for key, value in pairs)
+        )
+    if isinstance(expected, (list, tuple)):
+        return (
+            type(actual) is list
+            and len(expected) == len(actual)
+            and all(same_value(a, b) for a, b in zip(expected, actual))
+        )
+    if isinstance(expected, Date):
+        return type(actual) is Date and int(actual) == int(expected)
+    if expected is True or expected is False or expected is None:
+        return actual is expected
+    if isinstance(expected, float):
+        return type(actual) is float and (actual == expected or (actual != actual and expected != expected))
+    if isinstance(expected, int):
+        return type(actual) is int and actual == expected
+    if isinstance(expected, str):
+        return type(actual) is str and actual == expected
+    return type(actual) is type(expected) and actual == expected
@@ -0,0 +1,171 @@
+"""Compact in-memory form of Extended JSON ``$oid`` and ``$date`` values.
+
+The fixtures spell every reference as ``{"$oid": "<24 hex>"}`` and every
+timestamp as ``{"$date": "<ISO 8601>"}``. Held as dicts, each of those costs a
+dict plus a string; a pin with 80 attendees carries hundreds of them. While the
+scripts work on the data, the values are held instead as
+
+* :class:`ObjectId` -- the 12 raw bytes of the id (a ``bytes`` subclass), and
+* :class:`Date` -- milliseconds since the Unix epoch (an ``int`` subclass),
+
+and :func:`encode` turns them back into Extended JSON only when a document is
+written. Decoding is lossless: a value is only made compact when re-encoding it
+reproduces the original text exactly, anything else is left as it was loaded.
+"""
+from __future__ import annotations
+
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Set, Union
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_MS = timedelta(milliseconds=1)
+_OID_RE = re.compile(r"[0-9a-f]{24}")
+
+
+class ObjectId(bytes):
+    """The 12 bytes of an ObjectId; prints and encodes as lowercase hex."""
+
+    __slots__ = ()
+
+    def __new__(cls, value: Union[str, bytes]) -> "ObjectId":
+        if type(value) is cls:
+            return value  # type: ignore[return-value]
+        raw = bytes.fromhex(value) if isinstance(value, str) else bytes(value)
+        if len(raw) != 12:
+            raise ValueError(f"an ObjectId is 12 bytes, got {value!r}")
+        return super().__new__(cls, raw)
+
+    @classmethod
+    def from_int(cls, value: int) -> "ObjectId":
+        return bytes.__new__(cls, value.to_bytes(12, "big"))
+
+    def __str__(self) -> str:
+        return self.hex()
+
+    def __repr__(self) -> str:
+        return f"ObjectId({self.hex()!r})"
+
+    def __reduce__(self) -> Any:
+        return (ObjectId, (bytes(self),))
+
+    def __copy__(self) -> "ObjectId":
+        return self
+
+    def __deepcopy__(self, memo: Any) -> "ObjectId":
+        return self
+
+    def extended(self) -> Dict[str, str]:
+        return {"$oid": self.hex()}
+
+
+class Date(int):
+    """A UTC timestamp in epoch milliseconds, written as ``...T..:..:...mmmZ``."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_datetime(cls, dt: datetime) -> "Date":
+        return cls((dt - EPOCH) // _ONE_MS)
+
+    def to_datetime(self) -> datetime:
+        return EPOCH + int(self) * _ONE_MS
+
+    def isoformat(self) -> str:
+        dt = self.to_datetime()
+        return f"{dt.strftime('%Y-%m-%dT%H:%M:%S')}.{dt.microsecond // 1000:03d}Z"
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.isoformat()!r})"
+
+    def __reduce__(self) -> Any:
+        return (type(self), (int(self),))
+
+    def __copy__(self) -> "Date":
+        return self
+
+    def __deepcopy__(self, memo: Any) -> "Date":
+        return self
+
+    def extended(self) -> Dict[str, str]:
+        return {"$date": self.isoformat()}
+
+
+class DateSeconds(Date):
+    """A :class:`Date` loaded from a whole-second string (no ``.mmm``)."""
+
+    __slots__ = ()
+
+    def isoformat(self) -> str:
+        return self.to_datetime().strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_date(text: str) -> Optional[Date]:
+    try:
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        return None
+    for cls in (Date, DateSeconds):
+        value = cls.from_datetime(dt)
+        if value.isoformat() == text:
+            return value
+    return None
+
+
+def decode_hook(obj: Dict[str, Any]) -> Any:
+    """``object_hook`` that swaps canonical ``$oid``/``$date`` dicts for compact values."""
+    if len(obj) == 1:
+        if "$oid" in obj:
+            value = obj["$oid"]
+            if isinstance(value, str) and _OID_RE.fullmatch(value):
+                return ObjectId(value)
+        elif "$date" in obj:
+            value = obj["$date"]
+            if isinstance(value, str):
+                return _parse_date(value) or obj
+    return obj
+
+
+_COMPACT_TYPES = (ObjectId, Date, DateSeconds)
+_NESTED_TYPES = {dict, list, *_COMPACT_TYPES}
+_RECORD_TYPES: Set[type] = set()
+
+
+def register_record(cls: type) -> None:
+    """Let :func:`encode` expand instances of ``cls`` (see :mod:`sample_data.records`)."""
+    _RECORD_TYPES.add(cls)
+    _NESTED_TYPES.add(cls)
+
+
+def encode(node: Any) -> Any:
+    """Return ``node`` with every compact value expanded back to Extended JSON."""
+    kind = type(node)
+    if kind is dict:
+        # Plain leaves are copied as-is; recursing only into values that may
+        # change keeps this walk cheap next to json.dumps itself.
+        return {key: encode(value) if type(value) in _NESTED_TYPES else value for key, value in node.items()}
+    if kind is list:
+        return [encode(value) if type(value) in _NESTED_TYPES else value for value in node]
+    if kind in _COMPACT_TYPES:
+        return node.extended()
+    if kind in _RECORD_TYPES:
+        return {key: encode(value) if type(value) in _NESTED_TYPES else value for key, value in node.pairs()}
+    return node
+
+
+def oid_value(value: Any) -> Optional[ObjectId]:
+    """The :class:`ObjectId` held by a reference field, or ``None``."""
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, dict) and isinstance(value.get("$oid"), str):
+        return ObjectId(value["$oid"])
+    return None
+
+
+def date_value(value: Any) -> datetime:
+    """The aware ``datetime`` held by a timestamp field."""
+    if isinstance(value, Date):
+        return value.to_datetime()
+    return datetime.fromisoformat(value["$date"].replace("Z", "+00:00"))
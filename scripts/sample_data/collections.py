@@ -0,0 +1,58 @@
+"""Fixture collection names and their files under ``docs/mongodb-local-sample-data``."""
+from __future__ import annotations
+
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+DATA_DIR = ROOT / "docs" / "mongodb-local-sample-data"
+
+# Keys match the collection names used by server/scripts/utils/sampleDataLoader.js.
+COLLECTION_FILES = {
+    "users": "mongodb-sample-users.json",
+    "pins": "mongodb-sample-pins.json",
+    "bookmarks": "mongodb-sample-bookmarks.json",
+    "replies": "mongodb-sample-replies.json",
+    "proximityChatRooms": "mongodb-sample-proximityChatRooms.json",
+    "proximityChatMessages": "mongodb-sample-proximityChatMessages.json",
+    "proximityChatPresence": "mongodb-sample-proximityChatPresence.json",
+    "locations": "mongodb-sample-locations.json",
+}
+
+# Output formats (see sample_data.output) and the suffix each one is saved with.
+# COLLECTION_FILES names the default, pretty-printed ``.json`` file.
+FORMAT_SUFFIXES = {
+    "pretty": ".json",
+    "compact": ".json",
+    "ndjson": ".ndjson",
+    "ndjson.gz": ".ndjson.gz",
+}
+FORMATS = tuple(FORMAT_SUFFIXES)
+DEFAULT_FORMAT = "pretty"
+
+
+def _stem(path: Path) -> str:
+    for suffix in sorted(set(FORMAT_SUFFIXES.values()), key=len, reverse=True):
+        if path.name.endswith(suffix):
+            return path.name[: -len(suffix)]
+    return path.name
+
+
+def format_path(path: Path, fmt: str) -> Path:
+    """``path`` with its fixture suffix swapped for the one ``fmt`` writes."""
+    return path.with_name(_stem(path) + FORMAT_SUFFIXES[fmt])
+
+
+def format_variants(path: Path) -> list[Path]:
+    """Every file name the collection stored at ``path`` may have, ``.json`` first."""
+    stem = _stem(path)
+    return [path.with_name(stem + suffix) for suffix in dict.fromkeys(FORMAT_SUFFIXES.values())]
+
+
+def existing_variant(path: Path) -> Path:
+    """``path`` if it exists, else whichever other-format copy does (else ``path``)."""
+    if path.exists():
+        return path
+    for candidate in format_variants(path):
+        if candidate.exists():
+            return candidate
+    return path
@@ -0,0 +1,451 @@
+"""Memory-mapped columnar cache of the fixture collections.
+
+Parsing a large ``mongodb-sample-*`` file dominates a stats pass that only
+needs a handful of fields. :class:`ColumnCache` converts each collection's hot
+fields into flat binary arrays once, under a directory keyed by the SHA-256 of
+the source file, and later runs map them straight into memory
+(:class:`ColumnSet`). A fixture that changes hashes differently, so its
+columns are rebuilt on next use and the stale entry removed.
+
+Column layouts (native byte order, recorded in ``meta.json``):
+
+* ObjectId fields (``_id``, ``pinId``, ``userId``, ...): ``<field>.keys`` holds
+  the distinct ids sorted, 12 bytes each, and ``<field>.codes`` one ``uint32``
+  per document indexing into them (:data:`MISSING` when absent).
+* ObjectId lists (``attendingUserIds``, ...): the same, plus ``<field>.offsets``
+  (``uint64``, one more than the documents) delimiting each document's values.
+* ``type``: ``uint32`` codes into the category names listed in ``meta.json``.
+* Stored counters (``replyCount``, ``stats.posts``, ...): ``int64``,
+  :data:`NO_INT` when absent or not an integer.
+* ``coordinates``: ``float64`` longitude/latitude pairs, NaN when absent.
+* Dates (``createdAt``, ``updatedAt``): ``int64`` epoch milliseconds,
+  :data:`NO_DATE` when absent.
+
+With NumPy the columns are ``numpy`` arrays over the mapping; without it they
+are ``memoryview`` casts. Either way nothing is copied until it is used.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+from itertools import compress, repeat
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .codec import Date, ObjectId, date_value, oid_value
+from .collections import existing_variant
+from .jsonstream import iter_documents
+from .output import write_text_atomic
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+CACHE_VERSION = 2
+CACHE_DIR_NAME = ".column-cache"
+
+MISSING = 0xFFFFFFFF
+NO_DATE = -(1 << 63)
+NO_INT = -(1 << 63)
+
+OID_FIELDS = (
+    "_id", "pinId", "userId", "authorId", "creatorId", "roomId", "parentReplyId", "linkedLocationId", "ownerId",
+)
+LIST_FIELDS = ("attendingUserIds", "participantIds")
+CATEGORY_FIELDS = ("type",)
+DATE_FIELDS = ("createdAt", "updatedAt")
+# Denormalised counters, dotted for fields of a subdocument.
+INT_FIELDS = (
+    "bookmarkCount", "replyCount", "participantCount", "stats.bookmarkCount", "stats.replyCount",
+    "stats.bookmarks", "stats.eventsHosted", "stats.eventsAttended", "stats.posts",
+)
+
+_OID_BYTES = 12
+_HASH_CHUNK = 1 << 20
+_HASHES_NAME = "hashes.json"
+
+assert array("I").itemsize == 4 and array("Q").itemsize == 8 and array("q").itemsize == 8
+
+
+def _map(path: Path) -> Any:
+    """A read-only mapping of ``path`` (``b""`` for an empty file, which cannot be mapped)."""
+    with path.open("rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _view(buffer: Any, typecode: str) -> Any:
+    if np is not None:
+        return np.frombuffer(buffer, dtype=np.dtype(typecode))
+    return memoryview(buffer).cast(typecode)
+
+
+class CodedColumn:
+    """An ObjectId column: per-row codes into the sorted distinct ids."""
+
+    def __init__(self, keys: Any, codes: Any) -> None:
+        self._key_bytes = keys
+        self.codes = codes
+        self._keys: Optional[List[ObjectId]] = None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def keys(self) -> List[ObjectId]:
+        if self._keys is None:
+            raw = bytes(self._key_bytes)
+            self._keys = [ObjectId(raw[i : i + _OID_BYTES]) for i in range(0, len(raw), _OID_BYTES)]
+        return self._keys
+
+    @property
+    def distinct(self) -> int:
+        """How many distinct ids the column holds."""
+        return len(self._key_bytes) // _OID_BYTES
+
+    def key(self, code: int) -> ObjectId:
+        """The id with code ``code``, without decoding the others."""
+        start = int(code) * _OID_BYTES
+        return ObjectId(bytes(self._key_bytes[start : start + _OID_BYTES]))
+
+    def key_array(self) -> Any:
+        """The distinct ids as a sorted NumPy ``S12`` array (NumPy only)."""
+        return np.frombuffer(self._key_bytes, dtype="S12")
+
+    def rows(self) -> List[int]:
+        """Each row's code, ``-1`` where the field is absent."""
+        return [-1 if code == MISSING else code for code in self.codes]
+
+    def totals(self) -> Iterator[Tuple[ObjectId, int]]:
+        """``(id, occurrences)`` for every id that occurs, in id order."""
+        keys = self.keys
+        if np is not None:
+            codes = np.asarray(self.codes)
+            counts = np.bincount(codes[codes != MISSING], minlength=len(keys))
+            for code in np.flatnonzero(counts).tolist():
+                yield keys[code], int(counts[code])
+            return
+        counts = [0] * len(keys)
+        for code in self.codes:
+            if code != MISSING:
+                counts[code] += 1
+        for code, n in enumerate(counts):
+            if n:
+                yield keys[code], n
+
+    def select(self, mask: Any) -> "CodedColumn":
+        """The rows where ``mask`` is true."""
+        if np is not None:
+            return CodedColumn(self._key_bytes, np.asarray(self.codes)[np.asarray(mask, dtype=bool)])
+        return CodedColumn(self._key_bytes, array("I", compress(self.codes, mask)))
+
+
+class ListColumn:
+    """A column of ObjectId lists: ``values`` flattened, split by ``offsets``."""
+
+    def __init__(self, offsets: Any, values: CodedColumn) -> None:
+        self.offsets = offsets
+        self.values = values
+
+    def _lengths(self) -> Any:
+        return np.diff(np.asarray(self.offsets).astype(np.intp))
+
+    def lengths(self) -> List[int]:
+        if np is not None:
+            return self._lengths().tolist()
+        offsets = self.offsets
+        return [offsets[i + 1] - offsets[i] for i in range(len(offsets) - 1)]
+
+    def select(self, mask: Any) -> CodedColumn:
+        """Every value of the rows where ``mask`` is true."""
+        if np is not None:
+            return self.values.select(np.repeat(np.asarray(mask, dtype=bool), self._lengths()))
+        keep: List[bool] = []
+        for flag, n in zip(mask, self.lengths()):
+            keep.extend(repeat(flag, n))
+        return self.values.select(keep)
+
+
+class CategoryColumn:
+    def __init__(self, categories: Sequence[str], codes: Any) -> None:
+        self.categories = list(categories)
+        self.codes = codes
+
+    def mask(self, value: str) -> Any:
+        """Which rows hold ``value``."""
+        if value not in self.categories:
+            return np.zeros(len(self.codes), dtype=bool) if np is not None else [False] * len(self.codes)
+        code = self.categories.index(value)
+        if np is not None:
+            return np.asarray(self.codes) == code
+        return [c == code for c in self.codes]
+
+
+class ColumnSet:
+    """The cached columns of one collection file."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.meta: Dict[str, Any] = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        self.rows: int = self.meta["rows"]
+        self.fields: Dict[str, str] = self.meta["fields"]
+
+    def _column(self, name: str, typecode: str) -> Any:
+        return _view(_map(self.directory / name), typecode)
+
+    def _missing_codes(self) -> Any:
+        if np is not None:
+            return np.full(self.rows, MISSING, dtype=np.uint32)
+        return array("I", repeat(MISSING, self.rows))
+
+    def oid(self, field: str) -> CodedColumn:
+        if self.fields.get(field) != "oid":
+            return CodedColumn(b"", self._missing_codes())
+        return CodedColumn(_map(self.directory / f"{field}.keys"), self._column(f"{field}.codes", "I"))
+
+    def oid_list(self, field: str) -> ListColumn:
+        if self.fields.get(field) != "oid_list":
+            offsets = np.zeros(self.rows + 1, dtype=np.uint64) if np is not None else array("Q", repeat(0, self.rows + 1))
+            return ListColumn(offsets, CodedColumn(b"", array("I")))
+        values = CodedColumn(_map(self.directory / f"{field}.keys"), self._column(f"{field}.codes", "I"))
+        return ListColumn(self._column(f"{field}.offsets", "Q"), values)
+
+    def category(self, field: str) -> CategoryColumn:
+        if self.fields.get(field) != "category":
+            return CategoryColumn([], self._missing_codes())
+        return CategoryColumn(self.meta["categories"][field], self._column(f"{field}.codes", "I"))
+
+    def ints(self, field: str) -> Any:
+        """The integer ``field`` of each row (:data:`NO_INT` when absent)."""
+        if self.fields.get(field) != "int":
+            if np is not None:
+                return np.full(self.rows, NO_INT, dtype=np.int64)
+            return array("q", repeat(NO_INT, self.rows))
+        return self._column(f"{field}.i8", "q")
+
+    def coordinates(self) -> Any:
+        """``float64`` values, longitude then latitude for each row (NaN when absent)."""
+        if self.fields.get("coordinates") != "lonlat":
+            if np is not None:
+                return np.full(self.rows * 2, np.nan)
+            return array("d", repeat(float("nan"), self.rows * 2))
+        return self._column("coordinates.f8", "d")
+
+    def dates(self, field: str) -> Any:
+        """Epoch milliseconds for each row (:data:`NO_DATE` when absent)."""
+        if self.fields.get(field) != "date":
+            if np is not None:
+                return np.full(self.rows, NO_DATE, dtype=np.int64)
+            return array("q", repeat(NO_DATE, self.rows))
+        return self._column(f"{field}.i8", "q")
+
+
+def _encode_oids(values: List[Optional[ObjectId]]) -> Tuple[bytes, array]:
+    keys = sorted(set(values) - {None})
+    index = {key: code for code, key in enumerate(keys)}
+    codes = array("I", [MISSING if value is None else index[value] for value in values])
+    return b"".join(keys), codes
+
+
+def _coordinates(value: Any) -> Tuple[float, float]:
+    try:
+        lon, lat = value["coordinates"][:2]
+        return float(lon), float(lat)
+    except (TypeError, KeyError, ValueError, IndexError):
+        return float("nan"), float("nan")
+
+
+def _date_ms(value: Any) -> int:
+    if isinstance(value, Date):
+        return int(value)
+    if isinstance(value, dict) and isinstance(value.get("$date"), str):
+        try:
+            return int(Date.from_datetime(date_value(value)))
+        except ValueError:
+            pass
+    return NO_DATE
+
+
+def _int(doc: Any, path: Tuple[str, ...]) -> Optional[int]:
+    value = doc
+    for key in path:
+        if not hasattr(value, "get"):
+            return None
+        value = value.get(key)
+    if isinstance(value, int) and not isinstance(value, bool) and NO_INT < value < 1 << 63:
+        return value
+    return None
+
+
+def build_columns(docs: Iterable[Any], directory: Path) -> int:
+    """Write the hot columns of ``docs`` into ``directory``; returns the row count."""
+    oids: Dict[str, List[Optional[ObjectId]]] = {field: [] for field in OID_FIELDS}
+    lists: Dict[str, Tuple[array, List[Optional[ObjectId]]]] = {
+        field: (array("Q", [0]), []) for field in LIST_FIELDS
+    }
+    categories: Dict[str, Dict[str, int]] = {field: {} for field in CATEGORY_FIELDS}
+    category_codes: Dict[str, array] = {field: array("I") for field in CATEGORY_FIELDS}
+    dates: Dict[str, array] = {field: array("q") for field in DATE_FIELDS}
+    ints: Dict[str, array] = {field: array("q") for field in INT_FIELDS}
+    int_paths = {field: tuple(field.split(".")) for field in INT_FIELDS}
+    coordinates = array("d")
+    present: set = set()
+
+    rows = 0
+    for doc in docs:
+        rows += 1
+        for field in OID_FIELDS:
+            value = doc.get(field)
+            if value is not None:
+                present.add(field)
+            oids[field].append(oid_value(value))
+        for field in LIST_FIELDS:
+            offsets, values = lists[field]
+            items = doc.get(field)
+            if isinstance(items, list):
+                present.add(field)
+                values.extend(oid_value(item) for item in items)
+            offsets.append(len(values))
+        for field in CATEGORY_FIELDS:
+            value = doc.get(field)
+            if isinstance(value, str):
+                present.add(field)
+                code = categories[field].setdefault(value, len(categories[field]))
+            else:
+                code = MISSING
+            category_codes[field].append(code)
+        for field in DATE_FIELDS:
+            value = doc.get(field)
+            if value is not None:
+                present.add(field)
+            dates[field].append(_date_ms(value))
+        for field in INT_FIELDS:
+            number = _int(doc, int_paths[field])
+            if number is not None:
+                present.add(field)
+            ints[field].append(NO_INT if number is None else number)
+        value = doc.get("coordinates")
+        if value is not None:
+            present.add("coordinates")
+        coordinates.extend(_coordinates(value))
+
+    fields: Dict[str, str] = {}
+    for field in OID_FIELDS:
+        if field in present:
+            keys, codes = _encode_oids(oids[field])
+            (directory / f"{field}.keys").write_bytes(keys)
+            (directory / f"{field}.codes").write_bytes(codes.tobytes())
+            fields[field] = "oid"
+    for field in LIST_FIELDS:
+        if field in present:
+            offsets, values = lists[field]
+            keys, codes = _encode_oids(values)
+            (directory / f"{field}.keys").write_bytes(keys)
+            (directory / f"{field}.codes").write_bytes(codes.tobytes())
+            (directory / f"{field}.offsets").write_bytes(offsets.tobytes())
+            fields[field] = "oid_list"
+    for field in CATEGORY_FIELDS:
+        if field in present:
+            (directory / f"{field}.codes").write_bytes(category_codes[field].tobytes())
+            fields[field] = "category"
+    for field in DATE_FIELDS:
+        if field in present:
+            (directory / f"{field}.i8").write_bytes(dates[field].tobytes())
+            fields[field] = "date"
+    for field in INT_FIELDS:
+        if field in present:
+            (directory / f"{field}.i8").write_bytes(ints[field].tobytes())
+            fields[field] = "int"
+    if "coordinates" in present:
+        (directory / "coordinates.f8").write_bytes(coordinates.tobytes())
+        fields["coordinates"] = "lonlat"
+
+    meta = {
+        "version": CACHE_VERSION,
+        "byteorder": sys.byteorder,
+        "rows": rows,
+        "fields": fields,
+        "categories": {field: list(categories[field]) for field in CATEGORY_FIELDS if field in present},
+    }
+    (directory / "meta.json").write_text(json.dumps(meta, indent=2) + "\n", encoding="utf-8")
+    return rows
+
+
+class ColumnCache:
+    """Cached :class:`ColumnSet` per collection file, rebuilt when the file's content changes."""
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = cache_dir
+        self.built: List[str] = []
+
+    def _memo(self) -> Dict[str, List[Any]]:
+        try:
+            return json.loads((self.cache_dir / _HASHES_NAME).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _digest(self, path: Path) -> str:
+        # Remember each file's hash against its size and mtime so an unchanged
+        # fixture is not re-read just to find out it is unchanged.
+        st = path.stat()
+        key = str(path.resolve())
+        entry = self._memo().get(key)
+        if entry and entry[:2] == [st.st_size, st.st_mtime_ns]:
+            return entry[2]
+        digest = hashlib.sha256()
+        with path.open("rb") as fh:
+            for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+                digest.update(chunk)
+        # Re-read just before writing: other processes may be caching other files.
+        memo = self._memo()
+        memo[key] = [st.st_size, st.st_mtime_ns, digest.hexdigest()]
+        write_text_atomic(self.cache_dir / _HASHES_NAME, json.dumps(memo, indent=2) + "\n")
+        return memo[key][2]
+
+    def columns(self, path: Path) -> Optional[ColumnSet]:
+        """The columns of the collection stored at ``path`` (any format), or ``None`` if there is none."""
+        actual = existing_variant(path)
+        if not actual.exists():
+            return None
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = self.cache_dir / f"{actual.name}-{self._digest(actual)[:24]}"
+        try:
+            columns = ColumnSet(entry)
+            if columns.meta.get("version") == CACHE_VERSION and columns.meta.get("byteorder") == sys.byteorder:
+                return columns
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        self._build(actual, entry)
+        return ColumnSet(entry)
+
+    def _build(self, source: Path, entry: Path) -> None:
+        temp = Path(tempfile.mkdtemp(prefix=f".{source.name}.", dir=self.cache_dir))
+        try:
+            build_columns(iter_documents(source, compact=True), temp)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(temp, entry)
+        except BaseException:
+            shutil.rmtree(temp, ignore_errors=True)
+            raise
+        self.built.append(source.name)
+        for stale in self.cache_dir.glob(f"{source.name}-*"):
+            if stale != entry:
+                shutil.rmtree(stale, ignore_errors=True)
+
+
+def add_column_cache_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--no-column-cache",
+        dest="column_cache",
+        action="store_false",
+        help=f"Parse the fixtures instead of reading their cached columns (kept in <data dir>/{CACHE_DIR_NAME})",
+    )
@@ -0,0 +1,205 @@
+"""Zipfian message text, sampled a batch at a time.
+
+:func:`~sample_data.payloads.gibberish` picks every syllable with its own
+``rng.choice`` call, so text is a large share of the cost of a big fixture,
+and its 3-7 evenly drawn words say nothing about how search and payload size
+behave on real chat. :class:`TextEngine` instead samples from fixed tables:
+
+* a vocabulary of ``vocabulary`` pseudo-words built from
+  :data:`~sample_data.payloads.SYLLABLES`, shortest first, word ``r`` being
+  drawn with weight ``1 / (r + 1) ** zipf`` (``zipf=0`` weighs them evenly), so
+  the common words are the short ones;
+* a message length in words from a log-normal with median ``median_words``
+  and shape ``words_sigma``, cut off at ``max_words``;
+* closing punctuation from :data:`PUNCTUATION`.
+
+Text ``i`` of a stream is a pure function of ``(seed, stream, i)``: each draw
+is a SplitMix64 output keyed like :class:`~sample_data.counter_rng.CounterRandom`
+and looked up in a cumulative table, which NumPy does for a whole batch at
+once (:meth:`TextEngine.texts`) and plain Python one text at a time, with the
+same result.
+"""
+from __future__ import annotations
+
+import math
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import accumulate
+from typing import Any, Dict, List, Sequence, Tuple
+
+from . import payloads
+from .counter_rng import MASK64, keyed_uniform, keyed_uniforms
+from .sharding import derive_seed
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+# Uniforms per text: length, punctuation, then one per word.
+DRAWS = 256
+MAX_WORDS = DRAWS - 2
+MAX_VOCABULARY = 1_000_000
+PUNCTUATION = (("", 0.3), (".", 0.25), ("!", 0.2), ("?", 0.12), ("...", 0.08), ("!!!", 0.05))
+# Texts computed per batch when :meth:`TextEngine.text` misses its cache.
+READ_AHEAD = 1024
+
+
+@dataclass
+class TextConfig:
+    vocabulary: int = 5000
+    zipf: float = 1.1
+    median_words: float = 8.0
+    # Shape of the log-normal length distribution; 0 gives every text median_words.
+    words_sigma: float = 0.8
+    max_words: int = 60
+    seed: int = 42
+
+    def validate(self) -> None:
+        if not 1 <= self.vocabulary <= MAX_VOCABULARY:
+            raise ValueError(f"vocabulary must be between 1 and {MAX_VOCABULARY}")
+        if self.zipf < 0:
+            raise ValueError("zipf exponent must be non-negative")
+        if not 1 <= self.max_words <= MAX_WORDS:
+            raise ValueError(f"max words must be between 1 and {MAX_WORDS}")
+        if self.median_words < 1:
+            raise ValueError("median words must be at least 1")
+        if self.words_sigma < 0:
+            raise ValueError("words sigma must be non-negative")
+
+
+def _cumulative(weights: Sequence[float]) -> List[float]:
+    total = sum(weights)
+    cdf = [weight / total for weight in accumulate(weights)]
+    cdf[-1] = 1.0
+    return cdf
+
+
+def vocabulary_words(size: int) -> List[str]:
+    """The ``size`` most common words, most common first.
+
+    Words of ``k`` syllables come after all words of fewer; within a length
+    they are spread by a fixed stride so neighbours do not share a prefix.
+    """
+    base = len(payloads.SYLLABLES)
+    words: List[str] = []
+    syllables = 1
+    while len(words) < size:
+        tier = base**syllables
+        for i in range(min(tier, size - len(words))):
+            # 7_654_321 is coprime to every power of 10 (and of 2 and 5).
+            code = (i * 7_654_321 + 12_345) % tier
+            parts = []
+            for _ in range(syllables):
+                code, digit = divmod(code, base)
+                parts.append(payloads.SYLLABLES[digit])
+            words.append("".join(parts))
+        syllables += 1
+    return words
+
+
+@lru_cache(maxsize=4)
+def _vocabulary(size: int, zipf: float) -> Tuple[List[str], List[str], List[float]]:
+    """Words, capitalised words and the Zipf CDF."""
+    words = vocabulary_words(size)
+    cdf = _cumulative([1 / (rank + 1) ** zipf for rank in range(size)])
+    return words, [word.capitalize() for word in words], cdf
+
+
+def _length_cdf(median: float, sigma: float, max_words: int) -> List[float]:
+    """CDF over lengths ``1..max_words`` of a log-normal discretised at the integers."""
+    if sigma == 0:
+        target = min(max(round(median), 1), max_words)
+        return [0.0 if n < target else 1.0 for n in range(1, max_words + 1)]
+    mu = math.log(median)
+    weights = [math.exp(-((math.log(n) - mu) ** 2) / (2 * sigma * sigma)) / n for n in range(1, max_words + 1)]
+    return _cumulative(weights)
+
+
+class TextEngine:
+    """Draws texts for ``config``; see the module docstring."""
+
+    def __init__(self, config: TextConfig) -> None:
+        config.validate()
+        self.config = config
+        self.words, self.capitals, self.word_cdf = _vocabulary(config.vocabulary, config.zipf)
+        self.length_cdf = _length_cdf(config.median_words, config.words_sigma, config.max_words)
+        self.punctuation = [mark for mark, _ in PUNCTUATION]
+        self.punctuation_cdf = _cumulative([weight for _, weight in PUNCTUATION])
+        if np is not None:
+            self._word_cdf = np.array(self.word_cdf)
+            self._length_cdf = np.array(self.length_cdf)
+            self._punctuation_cdf = np.array(self.punctuation_cdf)
+            # Object arrays so a batch's pieces are gathered by fancy indexing.
+            self._words = np.array(self.words, dtype=object)
+            self._capitals = np.array(self.capitals, dtype=object)
+            # Each text ends in its mark and a newline, which splits the batch apart again.
+            self._endings = np.array([mark + "\n" for mark in self.punctuation], dtype=object)
+        self._keys: Dict[str, int] = {}
+        self._batches: Dict[str, Tuple[int, List[str]]] = {}
+
+    def key(self, stream: str) -> int:
+        key = self._keys.get(stream)
+        if key is None:
+            key = self._keys[stream] = derive_seed(self.config.seed, f"text-{stream}", 0) & MASK64
+        return key
+
+    def text(self, stream: str, index: int) -> str:
+        """Text ``index`` of ``stream``.
+
+        With NumPy, a miss computes the next :data:`READ_AHEAD` texts of the
+        stream in one batch, so walking a stream in order stays vectorised.
+        """
+        batch = self._batches.get(stream)
+        if batch is not None and batch[0] <= index < batch[0] + len(batch[1]):
+            return batch[1][index - batch[0]]
+        if np is None:
+            return self._text(self.key(stream), index)
+        self.prefetch(stream, index, index + READ_AHEAD)
+        return self._batches[stream][1][0]
+
+    def prefetch(self, stream: str, lo: int, hi: int) -> None:
+        """Compute texts ``lo`` to ``hi`` of ``stream`` in one batch for later :meth:`text` calls."""
+        self._batches[stream] = (lo, self.texts(stream, range(lo, hi)))
+
+    def texts(self, stream: str, indexes: Sequence[int]) -> List[str]:
+        """Texts ``indexes`` of ``stream``."""
+        key = self.key(stream)
+        if np is None:
+            return [self._text(key, index) for index in indexes]
+        indexes = np.asarray(indexes, dtype=np.uint64)
+        if not len(indexes):
+            return []
+        base = indexes * np.uint64(DRAWS)
+        lengths = np.searchsorted(self._length_cdf, keyed_uniforms(key, base + np.uint64(1)), side="right") + 1
+        marks = np.searchsorted(self._punctuation_cdf, keyed_uniforms(key, base + np.uint64(2)), side="right")
+        starts = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=starts[1:])
+        text_of = np.repeat(np.arange(len(lengths)), lengths)
+        position = np.arange(int(starts[-1]), dtype=np.int64) - starts[text_of]
+        u = keyed_uniforms(key, base[text_of] + (position + 3).astype(np.uint64))
+        ranks = np.searchsorted(self._word_cdf, u, side="right")
+        # Words at even slots, separators at odd ones: a space, or the text's ending after its last word.
+        pieces = np.empty(2 * len(ranks), dtype=object)
+        pieces[0::2] = self._words[ranks]
+        pieces[2 * starts[:-1]] = self._capitals[ranks[starts[:-1]]]
+        pieces[1::2] = " "
+        pieces[2 * starts[1:] - 1] = self._endings[marks]
+        return "".join(pieces.tolist()).split("\n")[:-1]
+
+    def _text(self, key: int, index: int) -> str:
+        base = index * DRAWS
+        length = bisect_right(self.length_cdf, keyed_uniform(key, base + 1)) + 1
+        mark = bisect_right(self.punctuation_cdf, keyed_uniform(key, base + 2))
+        ranks = [bisect_right(self.word_cdf, keyed_uniform(key, base + 3 + k)) for k in range(length)]
+        words = [self.capitals[ranks[0]]] + [self.words[rank] for rank in ranks[1:]]
+        return " ".join(words) + self.punctuation[mark]
+
+    def lines(self) -> List[str]:
+        common = ", ".join(self.words[:8])
+        return [
+            f"  {self.config.vocabulary:,} words, Zipf exponent {self.config.zipf:g} (most common: {common})",
+            f"  median {self.config.median_words:g} words per text, at most {self.config.max_words}",
+        ]
+
@@ -0,0 +1,99 @@
+"""Counter-based random numbers for random-access fixture generation.
+
+``CounterRandom`` is a drop-in ``random.Random`` whose n-th 64-bit output is a
+pure function of ``(key, n)`` (the SplitMix64 finaliser applied to
+``key + n * golden_gamma``). Keying one instance per document by
+``(seed, collection, index)`` makes every generated document reproducible on
+its own, without replaying the documents before it.
+
+:func:`keyed_uniform` and :func:`keyed_uniforms` give the same floats for
+explicit counters, one at a time or as a NumPy array, for generators that
+address their draws directly instead of through an instance.
+"""
+from __future__ import annotations
+
+import random
+from typing import Any, Tuple
+
+from .sharding import derive_seed
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+_INV_2_53 = 1.0 / (1 << 53)
+
+
+def mix64(z: int) -> int:
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def keyed_uniform(key: int, counter: int) -> float:
+    """Uniform float in ``[0, 1)``: what ``CounterRandom(key)`` draws at step ``counter``."""
+    return (mix64((key + counter * GOLDEN_GAMMA) & MASK64) >> 11) * _INV_2_53
+
+
+def keyed_uniforms(key: int, counters: Any) -> Any:
+    """:func:`keyed_uniform` for a NumPy ``uint64`` array of counters (NumPy only)."""
+    z = counters * np.uint64(GOLDEN_GAMMA) + np.uint64(key)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) * _INV_2_53
+
+
+class CounterRandom(random.Random):
+    """``random.Random`` backed by a keyed counter instead of a Mersenne state."""
+
+    def __init__(self, key: int = 0) -> None:
+        self._key = 0
+        self._counter = 0
+        super().__init__(key)
+
+    def seed(self, a: Any = None, version: int = 2) -> None:
+        # Keys are plain integers; anything else would make the stream depend
+        # on per-process hash randomisation.
+        if a is None:
+            a = 0
+        if not isinstance(a, int):
+            raise TypeError("CounterRandom keys must be integers")
+        self._key = a & MASK64
+        self._counter = 0
+
+    def _next64(self) -> int:
+        # mix64 inlined: this is the hot path of every draw.
+        self._counter += 1
+        z = (self._key + self._counter * GOLDEN_GAMMA) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def random(self) -> float:
+        return (self._next64() >> 11) * _INV_2_53
+
+    def getrandbits(self, k: int) -> int:
+        if k < 0:
+            raise ValueError("number of bits must be non-negative")
+        if k <= 64:
+            return self._next64() >> (64 - k) if k else 0
+        value, bits = 0, 0
+        while bits < k:
+            value = (value << 64) | self._next64()
+            bits += 64
+        return value >> (bits - k)
+
+    def getstate(self) -> Tuple[int, int]:
+        return self._key, self._counter
+
+    def setstate(self, state: Tuple[int, int]) -> None:
+        self._key, self._counter = state
+
+
+def doc_rng(seed: int, collection: str, index: int) -> CounterRandom:
+    """RNG for document ``index`` of ``collection`` under ``seed``."""
+    return CounterRandom(derive_seed(seed, collection, index))
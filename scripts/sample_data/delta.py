@@ -0,0 +1,153 @@
+"""Delta output: just the documents a run inserted, changed or removed.
+
+The fixture files are always rewritten in full, but a database seeded from
+them only needs what changed. With a delta directory, :class:`FixtureState`
+remembers a digest of every document it loads (:func:`document_digests`) and,
+when it flushes, compares the collections it writes against them
+(:func:`diff_collection`). New and modified documents go to
+``<collection>.ndjson`` in the delta directory, whole, in canonical Extended
+JSON; removed ids are listed in ``manifest.json``.
+
+A delta accumulates across runs until it is applied: each flush merges its
+changes into what is already there, the latest version of a document
+winning. Applying it (``node server/scripts/load-sample-data.js --delta``)
+upserts by ``_id``, so applying the same delta twice does no harm.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from .codec import ObjectId, oid_value
+from .collections import DATA_DIR
+from .jsonstream import iter_documents
+from .output import DocumentWriter, commit_all, compact_element, write_text_atomic
+
+DELTA_DIR_NAME = ".delta"
+MANIFEST_NAME = "manifest.json"
+DELTA_VERSION = 1
+
+Digests = Dict[ObjectId, bytes]
+
+
+def _digest(doc: Any) -> bytes:
+    return hashlib.blake2b(compact_element(doc).encode("utf-8"), digest_size=16).digest()
+
+
+def document_digests(docs: Iterable[Any]) -> Digests:
+    """Digest of each document's encoded form, keyed by ``_id`` (documents without one are skipped)."""
+    digests: Digests = {}
+    for doc in docs:
+        oid = oid_value(doc.get("_id"))
+        if oid is not None:
+            digests[oid] = _digest(doc)
+    return digests
+
+
+@dataclass
+class CollectionDelta:
+    # New or modified documents, in collection order.
+    upserts: List[Any] = field(default_factory=list)
+    deleted: List[ObjectId] = field(default_factory=list)
+    inserted: int = 0
+    updated: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.upserts or self.deleted)
+
+
+def diff_collection(docs: Sequence[Any], before: Digests) -> CollectionDelta:
+    """What turns the documents digested in ``before`` into ``docs``."""
+    delta = CollectionDelta()
+    seen = set()
+    for doc in docs:
+        oid = oid_value(doc.get("_id"))
+        if oid is None:
+            continue
+        seen.add(oid)
+        old = before.get(oid)
+        if old is None:
+            delta.inserted += 1
+        elif old == _digest(doc):
+            continue
+        else:
+            delta.updated += 1
+        delta.upserts.append(doc)
+    delta.deleted = [oid for oid in before if oid not in seen]
+    return delta
+
+
+def _read_manifest(delta_dir: Path) -> Dict[str, Any]:
+    try:
+        manifest = json.loads((delta_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {"version": DELTA_VERSION, "collections": {}}
+    if manifest.get("version") != DELTA_VERSION:
+        raise ValueError(f"{delta_dir / MANIFEST_NAME}: unsupported delta version {manifest.get('version')!r}")
+    return manifest
+
+
+def write_delta(delta_dir: Path, deltas: Dict[str, CollectionDelta]) -> List[Tuple[str, int, int]]:
+    """Merge ``deltas`` into the delta in ``delta_dir``; returns ``(collection, upserts, deletes)`` written."""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+    delta_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(delta_dir)
+    writers: List[DocumentWriter] = []
+    summary = []
+    try:
+        for name, delta in deltas.items():
+            entry = manifest["collections"].get(name, {})
+            path = delta_dir / f"{name}.ndjson"
+            # Earlier upserts stay in place unless this run replaced or removed them.
+            upserts: Dict[Any, Any] = {}
+            if entry.get("file"):
+                for doc in iter_documents(delta_dir / entry["file"], compact=True):
+                    upserts[oid_value(doc.get("_id"))] = doc
+            deleted = {ObjectId(oid) for oid in entry.get("deleted", [])}
+            for oid in delta.deleted:
+                upserts.pop(oid, None)
+                deleted.add(oid)
+            for doc in delta.upserts:
+                oid = oid_value(doc.get("_id"))
+                upserts[oid] = doc
+                deleted.discard(oid)
+
+            writer = DocumentWriter(path, "ndjson")
+            writer.open()
+            writers.append(writer)
+            writer.write_all(upserts.values())
+            writer.finish()
+            manifest["collections"][name] = {
+                "file": path.name,
+                "upserts": len(upserts),
+                "deleted": sorted(str(oid) for oid in deleted),
+            }
+            summary.append((name, len(upserts), len(deleted)))
+        commit_all([(writer.temp_path, writer.path) for writer in writers if writer.temp_path is not None])
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+    manifest["updatedAt"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    # The manifest goes last: until it is replaced, the previous one still describes a full delta.
+    write_text_atomic(delta_dir / MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+    return summary
+
+
+def add_delta_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--delta",
+        type=Path,
+        nargs="?",
+        const=DATA_DIR / DELTA_DIR_NAME,
+        metavar="DIR",
+        help="Also write the inserted, changed and removed documents to NDJSON patch files in DIR "
+        f"(default: <data dir>/{DELTA_DIR_NAME}), for load-sample-data.js --delta",
+    )
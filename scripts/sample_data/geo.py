@@ -0,0 +1,196 @@
+"""Which proximity chat room a coordinate falls in.
+
+A point belongs to a room when its haversine distance from the room's centre
+is at most ``radiusMeters`` -- the same test ``server/routes/chats.js`` applies
+before letting a user post. Rooms overlap (the CSULB grid cells are 2.6 km
+circles about 3.2 km apart), so :meth:`RoomIndex.assign` picks the room whose
+centre is nearest, the earlier room in the collection on a tie, and
+:data:`NO_ROOM` for a point no room covers.
+
+Rooms are bucketed into a latitude/longitude grid whose cells are as tall as
+the largest room radius, each room listed under every cell its circle may
+reach. A point then only measures its distance to the few rooms listed under
+its own cell. With NumPy, points are assigned a chunk at a time: every
+(point, candidate room) pair of the chunk is measured in one vectorised pass;
+without it the same candidates are checked one point at a time, with the same
+result.
+"""
+from __future__ import annotations
+
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from .codec import ObjectId, oid_value
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+# As in server/routes/chats.js.
+EARTH_RADIUS_METERS = 6371000.0
+NO_ROOM = -1
+# Points measured per vectorised pass; bounds the (point, room) pair arrays.
+CHUNK = 1 << 16
+
+
+def haversine_meters(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_METERS * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def _haversine_np(lon1: Any, lat1: Any, lon2: Any, lat2: Any) -> Any:
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_METERS * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def point_of(coordinates: Any) -> Tuple[float, float]:
+    """``(longitude, latitude)`` of a GeoJSON point, NaNs if it has none."""
+    try:
+        lon, lat = coordinates["coordinates"][:2]
+        return float(lon), float(lat)
+    except (KeyError, TypeError, ValueError):
+        return math.nan, math.nan
+
+
+class RoomIndex:
+    """Grid-bucketed room circles; see the module docstring."""
+
+    def __init__(
+        self, ids: Sequence[ObjectId], lons: Sequence[float], lats: Sequence[float], radii: Sequence[float]
+    ) -> None:
+        self.ids = list(ids)
+        self.lons = array("d", lons)
+        self.lats = array("d", lats)
+        self.radii = array("d", radii)
+        largest = max(self.radii, default=0.0)
+        # Cell edge in degrees: one largest radius of latitude (at least a metre).
+        self.cell = math.degrees(max(largest, 1.0) / EARTH_RADIUS_METERS)
+        # Columns divide 360 degrees evenly, so cells line up across the antimeridian.
+        self.columns = math.ceil(360 / self.cell)
+        self.width = 360 / self.columns
+        buckets: Dict[int, List[int]] = {}
+        for room in range(len(self.ids)):
+            for key in self._reach(room):
+                buckets.setdefault(key, []).append(room)
+        self.buckets = {key: tuple(rooms) for key, rooms in buckets.items()}
+        if np is not None:
+            keys = sorted(self.buckets)
+            self._keys = np.array(keys, dtype=np.int64)
+            counts = np.array([len(self.buckets[key]) for key in keys], dtype=np.int64)
+            self._starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+            self._counts = counts
+            self._rooms = np.array([room for key in keys for room in self.buckets[key]], dtype=np.int64)
+            self._lons = np.frombuffer(self.lons, dtype=np.float64)
+            self._lats = np.frombuffer(self.lats, dtype=np.float64)
+            self._radii = np.frombuffer(self.radii, dtype=np.float64)
+
+    @classmethod
+    def from_rooms(cls, rooms: Iterable[Mapping[str, Any]]) -> "RoomIndex":
+        """Index room documents; rooms without an id, a centre or a radius are left out."""
+        ids, lons, lats, radii = [], [], [], []
+        for room in rooms:
+            oid = oid_value(room.get("_id"))
+            lon, lat = point_of(room.get("coordinates"))
+            radius = room.get("radiusMeters")
+            if oid is None or not (math.isfinite(lon) and math.isfinite(lat)) or not isinstance(radius, (int, float)):
+                continue
+            ids.append(oid)
+            lons.append(lon)
+            lats.append(lat)
+            radii.append(float(radius))
+        return cls(ids, lons, lats, radii)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _key(self, row: int, column: int) -> int:
+        return row * self.columns + column % self.columns
+
+    def _reach(self, room: int) -> List[int]:
+        """Keys of every cell the circle of ``room`` may reach."""
+        lat, lon = self.lats[room], self.lons[room]
+        span = math.degrees(self.radii[room] / EARTH_RADIUS_METERS)
+        low, high = max(lat - span, -90.0), min(lat + span, 90.0)
+        cos_edge = math.cos(math.radians(max(abs(low), abs(high))))
+        rows = range(math.floor((low + 90) / self.cell), math.floor((high + 90) / self.cell) + 1)
+        if cos_edge < 1e-9 or span / cos_edge >= 180:
+            columns = range(self.columns)
+        else:
+            lon_span = span / cos_edge
+            columns = range(
+                math.floor((lon - lon_span + 180) / self.width), math.floor((lon + lon_span + 180) / self.width) + 1
+            )
+        return [self._key(row, column) for row in rows for column in columns]
+
+    def room_id(self, position: int) -> Optional[ObjectId]:
+        return None if position == NO_ROOM else self.ids[position]
+
+    def assign(self, lons: Sequence[float], lats: Sequence[float]) -> Any:
+        """Room position of each point (:data:`NO_ROOM` if none covers it).
+
+        A NumPy ``int64`` array with NumPy, else an ``array('q')``.
+        """
+        if np is None:
+            return array("q", (self._assign_one(lon, lat) for lon, lat in zip(lons, lats)))
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        out = np.full(len(lons), NO_ROOM, dtype=np.int64)
+        if len(self._keys):
+            for lo in range(0, len(lons), CHUNK):
+                out[lo : lo + CHUNK] = self._assign_chunk(lons[lo : lo + CHUNK], lats[lo : lo + CHUNK])
+        return out
+
+    def assign_points(self, points: Sequence[Any]) -> Any:
+        """:meth:`assign` for GeoJSON points."""
+        lons, lats = zip(*(point_of(point) for point in points)) if points else ((), ())
+        return self.assign(lons, lats)
+
+    def assign_ids(self, points: Sequence[Any]) -> List[Optional[ObjectId]]:
+        """Room id for each GeoJSON point (``None`` where no room covers it)."""
+        return [self.room_id(int(position)) for position in self.assign_points(points)]
+
+    def _cell(self, lon: float, lat: float) -> int:
+        return self._key(math.floor((lat + 90) / self.cell), math.floor((lon + 180) / self.width))
+
+    def _assign_one(self, lon: float, lat: float) -> int:
+        if not (math.isfinite(lon) and math.isfinite(lat)):
+            return NO_ROOM
+        best, best_distance = NO_ROOM, math.inf
+        for room in self.buckets.get(self._cell(lon, lat), ()):
+            distance = haversine_meters(lon, lat, self.lons[room], self.lats[room])
+            if distance <= self.radii[room] and distance < best_distance:
+                best, best_distance = room, distance
+        return best
+
+    def _assign_chunk(self, lons: Any, lats: Any) -> Any:
+        out = np.full(len(lons), NO_ROOM, dtype=np.int64)
+        valid = np.flatnonzero(np.isfinite(lons) & np.isfinite(lats))
+        lons, lats = lons[valid], lats[valid]
+        rows = np.floor((lats + 90) / self.cell).astype(np.int64)
+        columns = np.floor((lons + 180) / self.width).astype(np.int64) % self.columns
+        keys = rows * self.columns + columns
+        slots = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        counts = np.where(self._keys[slots] == keys, self._counts[slots], 0)
+        total = int(counts.sum())
+        if not total:
+            return out
+        # One row per (point, candidate room) pair.
+        point = np.repeat(np.arange(len(keys)), counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        room = self._rooms[np.repeat(self._starts[slots], counts) + np.arange(total) - first]
+        distance = _haversine_np(lons[point], lats[point], self._lons[room], self._lats[room])
+        inside = distance <= self._radii[room]
+        point, room, distance = point[inside], room[inside], distance[inside]
+        # Nearest centre first within each point, then the earlier room.
+        order = np.lexsort((room, distance, point))
+        point, room = point[order], room[order]
+        head = np.ones(len(point), dtype=bool)
+        head[1:] = point[1:] != point[:-1]
+        out[valid[point[head]]] = room[head]
+        return out
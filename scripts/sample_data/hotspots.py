@@ -0,0 +1,215 @@
+"""Clustered pin coordinates for geo-query stress fixtures.
+
+:func:`~sample_data.payloads.random_coordinate` spreads points evenly over a
+small box around CSULB, so no 2dsphere query ever meets the thousands of pins
+piled around one campus building that slow ``$near`` and ``$geoWithin`` down
+in production. :class:`HotspotField` instead draws from a mixture:
+
+* with probability ``background``, a point uniform over the bounding box;
+* otherwise a point uniform over the disc of one hotspot, hotspot ``k`` being
+  picked with weight ``1 / (k + 1) ** skew`` (``skew=0`` weighs them evenly).
+
+Hotspot centres are the ``precise_address()`` anchors
+(:data:`~sample_data.payloads.ANCHOR_POINTS`), then the points of the
+locations fixture, then uniform points in the box if more are asked for.
+Radii are log-normal around ``radius_meters``; with ``density`` set, each disc
+is instead sized so that its expected share of ``total`` points lands at that
+many points per km².
+
+Point ``i`` is a pure function of ``(seed, i)``: its uniforms are SplitMix64
+outputs keyed like :class:`~sample_data.counter_rng.CounterRandom`, which NumPy
+evaluates for a whole range at once (:meth:`HotspotField.points`) and plain
+Python one point at a time (:meth:`HotspotField.point`), with the same result.
+"""
+from __future__ import annotations
+
+import math
+from bisect import bisect_right
+from dataclasses import dataclass
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple
+
+from . import payloads
+from .collections import COLLECTION_FILES, DATA_DIR, existing_variant
+from .counter_rng import MASK64, CounterRandom, keyed_uniform, keyed_uniforms
+from .geo import EARTH_RADIUS_METERS, point_of
+from .jsonstream import iter_documents
+from .sharding import derive_seed
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+Point = Tuple[float, float]
+# Uniforms drawn per point: mixture component, then two for the position.
+DRAWS = 3
+DEGREES_PER_METER = math.degrees(1 / EARTH_RADIUS_METERS)
+
+
+@dataclass
+class HotspotConfig:
+    hotspots: int = 8
+    # Share of points drawn uniformly over the bounding box instead.
+    background: float = 0.1
+    radius_meters: float = 250.0
+    # Sigma of the log-normal radius distribution; 0 gives every disc radius_meters.
+    radius_sigma: float = 0.5
+    # Points per km² inside each disc; overrides the radius distribution.
+    density: Optional[float] = None
+    skew: float = 1.0
+    seed: int = 42
+
+    def validate(self) -> None:
+        if self.hotspots < 1:
+            raise ValueError("hotspots must be at least 1")
+        if not 0.0 <= self.background <= 1.0:
+            raise ValueError("hotspot background must be between 0 and 1")
+        if self.radius_meters <= 0:
+            raise ValueError("hotspot radius must be positive")
+        if self.radius_sigma < 0:
+            raise ValueError("hotspot radius sigma must be non-negative")
+        if self.density is not None and self.density <= 0:
+            raise ValueError("hotspot density must be positive")
+        if self.skew < 0:
+            raise ValueError("hotspot skew must be non-negative")
+
+
+def seed_centers(data_dir: Path = DATA_DIR) -> List[Point]:
+    """The anchors' points, then those of the locations fixture (duplicates dropped)."""
+    centers = list(payloads.ANCHOR_POINTS.values())
+    path = existing_variant(data_dir / COLLECTION_FILES["locations"])
+    if path.exists():
+        for doc in iter_documents(path, compact=True):
+            lon, lat = point_of(doc.get("coordinates"))
+            if math.isfinite(lon) and math.isfinite(lat) and (lon, lat) not in centers:
+                centers.append((lon, lat))
+    return centers
+
+
+def default_bounds(centers: Sequence[Point]) -> Tuple[float, float, float, float]:
+    """``random_coordinate``'s box, grown to take in every centre: ``(lon0, lat0, lon1, lat1)``."""
+    lat, lon = payloads.CSULB_CENTER
+    lons = [lon - payloads.LON_SPAN, lon + payloads.LON_SPAN] + [point[0] for point in centers]
+    lats = [lat - payloads.LAT_SPAN, lat + payloads.LAT_SPAN] + [point[1] for point in centers]
+    return min(lons), min(lats), max(lons), max(lats)
+
+
+def _uniform(key: int, index: int, draw: int) -> float:
+    return keyed_uniform(key, index * DRAWS + draw + 1)
+
+
+def _uniforms_np(key: int, lo: int, hi: int, draw: int) -> Any:
+    return keyed_uniforms(key, np.arange(lo, hi, dtype=np.uint64) * np.uint64(DRAWS) + np.uint64(draw + 1))
+
+
+class HotspotField:
+    """A resolved mixture: fixed centres, radii and weights; see the module docstring."""
+
+    def __init__(
+        self,
+        centers: Sequence[Point],
+        radii: Sequence[float],
+        weights: Sequence[float],
+        background: float,
+        bounds: Tuple[float, float, float, float],
+        key: int,
+    ) -> None:
+        self.centers = list(centers)
+        self.radii = list(radii)
+        self.background = background
+        self.bounds = bounds
+        self.key = key & MASK64
+        total = sum(weights)
+        shares = [(1 - background) * weight / total for weight in weights]
+        # Component 0 is the background; 1.. are the hotspots.
+        self.cumulative = list(accumulate([background] + shares))
+        self.cumulative[-1] = 1.0
+        self._lat_scale = [radius * DEGREES_PER_METER for radius in self.radii]
+        self._lon_scale = [
+            scale / math.cos(math.radians(lat)) for scale, (_, lat) in zip(self._lat_scale, self.centers)
+        ]
+        self._batch: Optional[Tuple[int, Any, Any]] = None
+
+    @classmethod
+    def build(
+        cls, config: HotspotConfig, total: int, centers: Optional[Sequence[Point]] = None
+    ) -> "HotspotField":
+        """Resolve ``config`` for a fixture of ``total`` points (``total`` only matters with ``density``)."""
+        config.validate()
+        seeds = list(centers) if centers is not None else seed_centers()
+        bounds = default_bounds(seeds)
+        chosen = seeds[: config.hotspots]
+        for k in range(len(chosen), config.hotspots):
+            rng = CounterRandom(derive_seed(config.seed, "hotspot-centers", k))
+            chosen.append((rng.uniform(bounds[0], bounds[2]), rng.uniform(bounds[1], bounds[3])))
+        weights = [1 / (k + 1) ** config.skew for k in range(len(chosen))]
+        if config.density is not None:
+            share = (1 - config.background) / sum(weights)
+            radii = [1000 * math.sqrt(total * share * weight / (math.pi * config.density)) for weight in weights]
+        else:
+            radii = [
+                CounterRandom(derive_seed(config.seed, "hotspot-radii", k)).lognormvariate(
+                    math.log(config.radius_meters), config.radius_sigma
+                )
+                for k in range(len(chosen))
+            ]
+        return cls(chosen, radii, weights, config.background, bounds, derive_seed(config.seed, "hotspot-points", 0))
+
+    def point(self, index: int) -> Point:
+        """``(longitude, latitude)`` of point ``index``."""
+        batch = self._batch
+        if batch is not None and batch[0] <= index < batch[0] + len(batch[1]):
+            return float(batch[1][index - batch[0]]), float(batch[2][index - batch[0]])
+        component = min(bisect_right(self.cumulative, _uniform(self.key, index, 0)), len(self.cumulative) - 1)
+        u, v = _uniform(self.key, index, 1), _uniform(self.key, index, 2)
+        if component == 0:
+            lon0, lat0, lon1, lat1 = self.bounds
+            return lon0 + u * (lon1 - lon0), lat0 + v * (lat1 - lat0)
+        k = component - 1
+        lon, lat = self.centers[k]
+        distance, angle = math.sqrt(u), 2 * math.pi * v
+        return (
+            lon + distance * math.sin(angle) * self._lon_scale[k],
+            lat + distance * math.cos(angle) * self._lat_scale[k],
+        )
+
+    def points(self, lo: int, hi: int) -> Tuple[Any, Any]:
+        """Longitudes and latitudes of points ``lo`` to ``hi``, as arrays (lists without NumPy)."""
+        if np is None:
+            pairs = [self.point(index) for index in range(lo, hi)]
+            return [lon for lon, _ in pairs], [lat for _, lat in pairs]
+        component = np.minimum(
+            np.searchsorted(np.array(self.cumulative), _uniforms_np(self.key, lo, hi, 0), side="right"),
+            len(self.cumulative) - 1,
+        )
+        u, v = _uniforms_np(self.key, lo, hi, 1), _uniforms_np(self.key, lo, hi, 2)
+        lon0, lat0, lon1, lat1 = self.bounds
+        lons, lats = lon0 + u * (lon1 - lon0), lat0 + v * (lat1 - lat0)
+        hot = component > 0
+        k = component[hot] - 1
+        centers = np.array(self.centers, dtype=np.float64).reshape(-1, 2)
+        distance, angle = np.sqrt(u[hot]), 2 * np.pi * v[hot]
+        lons[hot] = centers[k, 0] + distance * np.sin(angle) * np.array(self._lon_scale)[k]
+        lats[hot] = centers[k, 1] + distance * np.cos(angle) * np.array(self._lat_scale)[k]
+        return lons, lats
+
+    def prefetch(self, lo: int, hi: int) -> None:
+        """Compute points ``lo`` to ``hi`` in one batch for later :meth:`point` calls."""
+        lons, lats = self.points(lo, hi)
+        self._batch = (lo, lons, lats)
+
+    def coordinates(self, index: int) -> List[float]:
+        """Point ``index`` as a GeoJSON ``[longitude, latitude]`` pair, rounded like random_coordinate."""
+        lon, lat = self.point(index)
+        return [round(lon, 6), round(lat, 6)]
+
+    def lines(self) -> List[str]:
+        out = [f"  {len(self.centers)} hotspots, {self.background:.0%} background"]
+        for (lon, lat), radius, share in zip(self.centers, self.radii, self._shares()):
+            out.append(f"    ({lon:.5f}, {lat:.5f})  radius {radius:8.1f} m  {share:6.1%} of points")
+        return out
+
+    def _shares(self) -> List[float]:
+        return [b - a for a, b in zip(self.cumulative, self.cumulative[1:])]
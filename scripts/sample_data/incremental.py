@@ -0,0 +1,129 @@
+"""Bring the user counters up to date from the change journal.
+
+A full recompute rescans every pin, bookmark and reply. When the counters
+were saved by the last recompute (:class:`~sample_data.journal.UserStatsSnapshot`)
+and every change since then went through the journal, it is enough to add
+what the inserted documents contribute (:func:`~sample_data.stats.user_contributions`)
+and rewrite the users whose counters moved.
+
+Anything the journal cannot account for raises :class:`FullRecomputeNeeded`:
+no snapshot, a collection file changed outside the journal, new users (whose
+counters may include references made before they existed), or in-place edits
+to the fields the counters are derived from.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from .codec import ObjectId, oid_value
+from .journal import Change, UserStatsSnapshot, fingerprint
+from .pipeline import FixtureState
+from .stats import USER_COUNTERS, compute_stats, user_contributions
+
+# Fields the user counters are derived from, per source collection.
+SOURCE_FIELDS = {
+    "pins": frozenset({"_id", "type", "creatorId", "attendingUserIds"}),
+    "bookmarks": frozenset({"_id", "userId"}),
+    "replies": frozenset({"_id", "authorId"}),
+}
+TRACKED = ("users",) + tuple(SOURCE_FIELDS)
+
+
+class FullRecomputeNeeded(Exception):
+    """The saved counters cannot be brought up to date from the journal alone."""
+
+
+@dataclass
+class IncrementalUpdate:
+    # Every user's counters after the journalled changes, keyed by id.
+    totals: Dict[ObjectId, List[int]]
+    # Users whose stored ``stats`` must be rewritten.
+    affected: Set[ObjectId] = field(default_factory=set)
+    inserted: int = 0
+
+
+def _check_files(state: FixtureState, snapshot: UserStatsSnapshot, changes: Sequence[Change]) -> None:
+    expected = dict(snapshot.files)
+    for change in changes:
+        if change.file is not None:
+            expected[change.collection] = change.file
+    for name in TRACKED:
+        if fingerprint(state.path(name)) != expected.get(name):
+            raise FullRecomputeNeeded(f"{state.path(name).name} changed outside the change journal")
+
+
+def incremental_update(
+    state: FixtureState, snapshot: Optional[UserStatsSnapshot], changes: Sequence[Change]
+) -> IncrementalUpdate:
+    """Apply ``changes`` to ``snapshot``; reads only the collections that gained documents."""
+    if snapshot is None:
+        raise FullRecomputeNeeded("no saved user counters yet")
+    if tuple(snapshot.counters) != USER_COUNTERS:
+        raise FullRecomputeNeeded("the saved user counters are from an older layout")
+    _check_files(state, snapshot, changes)
+
+    affected: Set[ObjectId] = set()
+    inserted: Dict[str, Set[ObjectId]] = {}
+    for change in changes:
+        if change.collection == "users":
+            if change.op == "insert":
+                raise FullRecomputeNeeded("users were added")
+            affected.update(change.ids)
+        elif change.collection in SOURCE_FIELDS:
+            if change.op == "insert":
+                inserted.setdefault(change.collection, set()).update(change.ids)
+            elif change.fields is None or SOURCE_FIELDS[change.collection].intersection(change.fields):
+                raise FullRecomputeNeeded(f"{change.collection} were edited in place")
+
+    docs: Dict[str, List[Any]] = {}
+    for name, ids in inserted.items():
+        docs[name] = [doc for doc in state.iter(name) if oid_value(doc.get("_id")) in ids]
+        # Exactly one document per journalled id: a missing one was removed,
+        # and an extra one shares its id with a document counted before.
+        if len(docs[name]) != len(ids):
+            raise FullRecomputeNeeded(f"journalled {name} do not match {state.path(name).name} one-to-one")
+
+    totals = {uid: list(values) for uid, values in snapshot.users.items()}
+    for uid, delta in user_contributions(**docs).items():
+        current = totals.setdefault(uid, [0] * len(USER_COUNTERS))
+        for slot, n in enumerate(delta):
+            current[slot] += n
+        affected.add(uid)
+    return IncrementalUpdate(totals, affected, sum(len(ids) for ids in inserted.values()))
+
+
+def full_totals(state: FixtureState, users: Sequence[Any]) -> Dict[ObjectId, List[int]]:
+    """Every user's counters from a full scan of the source collections."""
+    stats = compute_stats(
+        pins=state.source("pins"),
+        users=users,
+        bookmarks=state.source("bookmarks"),
+        replies=state.source("replies"),
+        memory_budget=state.memory_budget,
+        spill_dir=state.spill_dir,
+    )
+    return stats.user_totals(users)
+
+
+def verify(state: FixtureState) -> List[str]:
+    """Compare the incremental result with a full recompute; one line per disagreement.
+
+    Nothing is written and the journal is left as it is.
+    """
+    changes = state.journal.read() + state.changes
+    try:
+        update = incremental_update(state, UserStatsSnapshot.load(state.data_dir), changes)
+    except FullRecomputeNeeded as exc:
+        return [f"incremental recompute not possible: {exc}"]
+    users = list(state.iter("users"))
+    zeros = [0] * len(USER_COUNTERS)
+    problems = []
+    for uid, expected in full_totals(state, users).items():
+        got = update.totals.get(uid, zeros)
+        if got != expected:
+            diffs = ", ".join(
+                f"{name} {g} != {e}" for name, g, e in zip(USER_COUNTERS, got, expected) if g != e
+            )
+            problems.append(f"user {uid}: {diffs}")
+    return problems
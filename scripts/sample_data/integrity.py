@@ -0,0 +1,377 @@
+"""Referential-integrity checks over a whole fixture set.
+
+:func:`validate` reads every collection once, one worker process per
+collection, into its cached columns (see :mod:`sample_data.columns`); with a
+warm cache that is just mapping the files. Everything else works on the
+columns: each ObjectId field is already a sorted array of distinct ids plus a
+code per document, so a reference check looks up only the distinct ids a
+field holds among the target collection's ``_id`` keys, and the
+per-document work is array indexing.
+
+It reports:
+
+* ``_id`` values that are missing or shared by several documents, and
+  documents sharing a key the models declare unique (:data:`UNIQUE_KEYS`);
+* references that do not resolve (:data:`REFERENCES`), and replies whose
+  ``parentReplyId`` points at a reply on another pin;
+* stored counters that disagree with the collections they summarise:
+  pin ``bookmarkCount``/``replyCount`` (and their ``stats`` mirrors),
+  event ``participantCount`` and the user ``stats`` counters, recomputed
+  with :func:`~sample_data.stats.compute_stats`.
+"""
+from __future__ import annotations
+
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .collections import COLLECTION_FILES, existing_variant
+from .columns import CACHE_DIR_NAME, MISSING, NO_INT, CodedColumn, ColumnCache, ColumnSet
+from .sharding import default_workers, run_tasks
+from .stats import PIN_COUNTERS, PIN_STAT_COUNTERS, USER_COUNTERS, compute_stats
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+# (collection, field, referenced collection); list fields hold several references.
+REFERENCES: Tuple[Tuple[str, str, str], ...] = (
+    ("pins", "creatorId", "users"),
+    ("pins", "attendingUserIds", "users"),
+    ("pins", "linkedLocationId", "locations"),
+    ("bookmarks", "pinId", "pins"),
+    ("bookmarks", "userId", "users"),
+    ("replies", "pinId", "pins"),
+    ("replies", "authorId", "users"),
+    ("replies", "parentReplyId", "replies"),
+    ("proximityChatRooms", "ownerId", "users"),
+    ("proximityChatRooms", "participantIds", "users"),
+    ("proximityChatMessages", "roomId", "proximityChatRooms"),
+    ("proximityChatMessages", "authorId", "users"),
+    ("proximityChatMessages", "pinId", "pins"),
+    ("proximityChatPresence", "roomId", "proximityChatRooms"),
+    ("proximityChatPresence", "userId", "users"),
+)
+LIST_REFERENCES = frozenset({"attendingUserIds", "participantIds"})
+
+# (collection, fields) of the compound unique indexes the models declare, as
+# listed in sample_data.mongodump.INDEXES; mongorestore fails on a duplicate.
+UNIQUE_KEYS: Tuple[Tuple[str, Tuple[str, str]], ...] = (
+    ("bookmarks", ("userId", "pinId")),
+    ("proximityChatPresence", ("roomId", "userId")),
+)
+
+# Examples listed per finding.
+EXAMPLES = 3
+
+
+@dataclass
+class Finding:
+    check: str
+    subject: str
+    count: int
+    examples: List[str] = field(default_factory=list)
+
+    def line(self) -> str:
+        text = f"  {self.check:<10} {self.subject}: {self.count:,}"
+        if self.examples:
+            text += f" (e.g. {'; '.join(self.examples)})"
+        return text
+
+
+@dataclass
+class IntegrityReport:
+    findings: List[Finding] = field(default_factory=list)
+    documents: Dict[str, int] = field(default_factory=dict)
+    skipped: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.findings
+
+    def lines(self) -> List[str]:
+        total = sum(self.documents.values())
+        out = [
+            f"Checked {total:,} documents in {len(self.documents)} collections in {self.elapsed:.2f}s: "
+            + ("no problems." if self.ok else f"{len(self.findings)} problem(s).")
+        ]
+        out.extend(finding.line() for finding in self.findings)
+        if self.skipped:
+            out.append(f"  skipped (collection file missing): {', '.join(self.skipped)}")
+        return out
+
+
+def _columns_dir(path: Path, cache_dir: Path) -> Optional[str]:
+    """Worker task: make sure the columns of ``path`` are cached; returns their directory."""
+    columns = ColumnCache(cache_dir).columns(path)
+    return None if columns is None else str(columns.directory)
+
+
+def _codes(column: CodedColumn) -> Any:
+    return np.asarray(column.codes) if np is not None else list(column.codes)
+
+
+def _label(ids: CodedColumn, row: int) -> str:
+    code = ids.codes[row]
+    return f"#{row}" if code == MISSING else str(ids.key(code))
+
+
+def _check_ids(name: str, columns: ColumnSet) -> List[Finding]:
+    ids = columns.oid("_id")
+    codes = _codes(ids)
+    findings = []
+    if np is not None:
+        missing = int(np.count_nonzero(codes == MISSING))
+        counts = np.bincount(codes[codes != MISSING], minlength=ids.distinct)
+        shared = np.flatnonzero(counts > 1).tolist()
+    else:
+        missing = sum(1 for code in codes if code == MISSING)
+        counts = [0] * ids.distinct
+        for code in codes:
+            if code != MISSING:
+                counts[code] += 1
+        shared = [code for code, n in enumerate(counts) if n > 1]
+    if missing:
+        findings.append(Finding("no-id", f"{name}._id", missing))
+    if shared:
+        extra = sum(int(counts[code]) - 1 for code in shared)
+        examples = [f"{ids.key(code)} x{int(counts[code])}" for code in shared[:EXAMPLES]]
+        findings.append(Finding("duplicate", f"{name}._id", extra, examples))
+    return findings
+
+
+def _key_label(column: CodedColumn, code: int) -> str:
+    return "null" if code >= column.distinct else str(column.key(code))
+
+
+def _check_unique_pair(name: str, fields: Tuple[str, str], columns: ColumnSet) -> Optional[Finding]:
+    """Documents repeating another's ``fields`` pair (an absent field counts as null, as in MongoDB)."""
+    first, second = columns.oid(fields[0]), columns.oid(fields[1])
+    if np is not None:
+        # Fold MISSING into one extra code per column so each pair packs into one int64.
+        width = second.distinct + 1
+        a = np.minimum(_codes(first).astype(np.int64), first.distinct)
+        b = np.minimum(_codes(second).astype(np.int64), second.distinct)
+        keys, counts = np.unique(a * width + b, return_counts=True)
+        repeated = counts > 1
+        extra = int((counts[repeated] - 1).sum())
+        shared = [
+            (int(key) // width, int(key) % width, int(n))
+            for key, n in zip(keys[repeated][:EXAMPLES], counts[repeated][:EXAMPLES])
+        ]
+    else:
+        pairs: Dict[Tuple[int, int], int] = {}
+        for pair in zip(first.codes, second.codes):
+            pairs[pair] = pairs.get(pair, 0) + 1
+        repeats = sorted((x, y, n) for (x, y), n in pairs.items() if n > 1)
+        extra = sum(n - 1 for _, _, n in repeats)
+        shared = repeats[:EXAMPLES]
+    if not extra:
+        return None
+    examples = [f"({_key_label(first, x)}, {_key_label(second, y)}) x{n}" for x, y, n in shared]
+    return Finding("duplicate", f"{name}.({', '.join(fields)})", extra, examples)
+
+
+def _unresolved(refs: CodedColumn, targets: CodedColumn) -> Any:
+    """Per distinct key of ``refs``: true where it is not one of ``targets``' keys."""
+    if np is not None:
+        return _lookup(targets.key_array(), refs.key_array()) < 0
+    known = set(targets.keys)
+    return [key not in known for key in refs.keys]
+
+
+def _lookup(known: Any, keys: Any) -> Any:
+    """Index of each of ``keys`` in the sorted ``known``, ``-1`` where absent (NumPy)."""
+    if not len(known):
+        return np.full(len(keys), -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(known, keys), len(known) - 1)
+    return np.where(known[pos] == keys, pos, -1)
+
+
+def _list_row(offsets: Any, position: int) -> int:
+    """The row whose list holds the ``position``-th value."""
+    if np is not None:
+        return int(np.searchsorted(np.asarray(offsets), position, side="right")) - 1
+    return next(row for row in range(len(offsets) - 1) if offsets[row + 1] > position)
+
+
+def _dangling_rows(codes: Any, bad: Any) -> Any:
+    """Positions in ``codes`` whose key is flagged in ``bad``."""
+    if np is not None:
+        valid = codes != MISSING
+        hits = np.zeros(len(codes), dtype=bool)
+        hits[valid] = bad[codes[valid]]
+        return np.flatnonzero(hits)
+    return [i for i, code in enumerate(codes) if code != MISSING and bad[code]]
+
+
+def _check_reference(
+    name: str, fieldname: str, target: str, columns: Dict[str, ColumnSet]
+) -> Optional[Finding]:
+    source = columns[name]
+    ids = source.oid("_id")
+    if fieldname in LIST_REFERENCES:
+        listed = source.oid_list(fieldname)
+        refs, offsets = listed.values, listed.offsets
+    else:
+        refs, offsets = source.oid(fieldname), None
+    bad = _unresolved(refs, columns[target].oid("_id"))
+    if not (bad.any() if np is not None else any(bad)):
+        return None
+    positions = _dangling_rows(_codes(refs), bad)
+    examples = []
+    for position in [int(position) for position in positions[:EXAMPLES]]:
+        row = position if offsets is None else _list_row(offsets, position)
+        examples.append(f"{_label(ids, row)} -> {refs.key(refs.codes[position])}")
+    return Finding("dangling", f"{name}.{fieldname} -> {target}", len(positions), examples)
+
+
+def _check_reply_parents(replies: ColumnSet) -> Optional[Finding]:
+    """Replies whose (resolvable) parent reply belongs to another pin."""
+    ids, parents, pins = replies.oid("_id"), replies.oid("parentReplyId"), replies.oid("pinId")
+    if np is not None:
+        id_codes, parent_codes, pin_codes = _codes(ids), _codes(parents), _codes(pins)
+        # Reply row of each distinct id (its first document), then of each parent.
+        rows = np.flatnonzero(id_codes != MISSING)
+        row_of_id = np.full(ids.distinct + 1, -1, dtype=np.int64)
+        row_of_id[id_codes[rows[::-1]]] = rows[::-1]
+        parent_ids = np.append(_lookup(ids.key_array(), parents.key_array()), -1)
+        has_parent = parent_codes != MISSING
+        parent_rows = np.full(len(parent_codes), -1, dtype=np.int64)
+        parent_rows[has_parent] = row_of_id[parent_ids[parent_codes[has_parent]]]
+        linked = np.flatnonzero(parent_rows >= 0)
+        mismatched = linked[pin_codes[parent_rows[linked]] != pin_codes[linked]].tolist()
+    else:
+        id_index = {key: code for code, key in enumerate(ids.keys)}
+        row_of_id: Dict[int, int] = {}
+        for row, code in enumerate(ids.codes):
+            if code != MISSING:
+                row_of_id.setdefault(code, row)
+        parent_rows = [
+            -1 if code == MISSING else row_of_id.get(id_index.get(parents.keys[code], -1), -1)
+            for code in parents.codes
+        ]
+        mismatched = [
+            row for row, parent in enumerate(parent_rows) if parent >= 0 and pins.codes[parent] != pins.codes[row]
+        ]
+    if not mismatched:
+        return None
+    examples = [f"{_label(ids, row)} -> {_label(ids, parent_rows[row])}" for row in mismatched[:EXAMPLES]]
+    return Finding("parent", "replies.parentReplyId on another pin", len(mismatched), examples)
+
+
+def _expected(counts: Sequence[int], rows: Sequence[int]) -> Any:
+    """Per-document values of per-index ``counts`` (0 for documents without an id)."""
+    if np is not None:
+        rows_array = np.asarray(rows, dtype=np.int64)
+        values = np.asarray(counts, dtype=np.int64)
+        return np.where(rows_array >= 0, values[np.maximum(rows_array, 0)] if len(values) else 0, 0)
+    return [counts[row] if row >= 0 else 0 for row in rows]
+
+
+def _compare(
+    subject: str, ids: CodedColumn, stored: Any, expected: Any, only: Optional[Any] = None
+) -> Optional[Finding]:
+    if np is not None:
+        stale = np.asarray(stored) != expected
+        if only is not None:
+            stale &= np.asarray(only, dtype=bool)
+        rows: Iterable[int] = np.flatnonzero(stale).tolist()
+    else:
+        rows = [
+            row
+            for row, (got, want) in enumerate(zip(stored, expected))
+            if got != want and (only is None or only[row])
+        ]
+    rows = list(rows)
+    if not rows:
+        return None
+    examples = []
+    for row in rows[:EXAMPLES]:
+        got = stored[row]
+        shown = "missing" if got == NO_INT else str(int(got))
+        examples.append(f"{_label(ids, row)} has {shown}, expected {int(expected[row])}")
+    return Finding("stale", subject, len(rows), examples)
+
+
+def _check_counters(columns: Dict[str, ColumnSet]) -> List[Finding]:
+    pins, users = columns.get("pins"), columns.get("users")
+    empty: Tuple[Any, ...] = ()
+    stats = compute_stats(
+        pins=pins if pins is not None else empty,
+        users=users if users is not None else empty,
+        bookmarks=columns.get("bookmarks", empty),
+        replies=columns.get("replies", empty),
+    )
+    findings: List[Optional[Finding]] = []
+    if pins is not None:
+        ids = pins.oid("_id")
+        for name in PIN_COUNTERS:
+            if name == "participantCount":
+                events = pins.category("type").mask("event")
+                participants = np.asarray(stats.participants) if np is not None else stats.participants
+                findings.append(_compare("pins.participantCount (events)", ids, pins.ints(name), participants, events))
+                continue
+            expected = _expected(stats.pin_counts[name], stats.pins.rows)
+            findings.append(_compare(f"pins.{name}", ids, pins.ints(name), expected))
+            if name in PIN_STAT_COUNTERS:
+                findings.append(_compare(f"pins.stats.{name}", ids, pins.ints(f"stats.{name}"), expected))
+    if users is not None:
+        ids = users.oid("_id")
+        has_id = [row >= 0 for row in stats.users.rows]
+        for name in USER_COUNTERS:
+            expected = _expected(stats.user_counts[name], stats.users.rows)
+            findings.append(_compare(f"users.stats.{name}", ids, users.ints(f"stats.{name}"), expected, has_id))
+    return [finding for finding in findings if finding is not None]
+
+
+def validate(
+    data_dir: Path, workers: Optional[int] = None, cache_dir: Optional[Path] = None
+) -> IntegrityReport:
+    """Check the fixture set in ``data_dir``.
+
+    Columns are cached under ``cache_dir`` (default: the fixtures' own column
+    cache); pass a throwaway directory to leave no cache behind.
+    """
+    started = time.perf_counter()
+    cache_dir = cache_dir or data_dir / CACHE_DIR_NAME
+    names = [name for name in COLLECTION_FILES if existing_variant(data_dir / COLLECTION_FILES[name]).exists()]
+    tasks = [(_columns_dir, (data_dir / COLLECTION_FILES[name], cache_dir)) for name in names]
+    workers = min(workers or default_workers(), len(tasks)) if tasks else 1
+    columns = {
+        name: ColumnSet(Path(directory))
+        for name, directory in zip(names, run_tasks(tasks, workers))
+        if directory is not None
+    }
+
+    report = IntegrityReport(documents={name: cols.rows for name, cols in columns.items()})
+    report.skipped = sorted({target for _, _, target in REFERENCES} - set(columns))
+    for name, cols in columns.items():
+        report.findings.extend(_check_ids(name, cols))
+    for name, fields in UNIQUE_KEYS:
+        if name in columns:
+            finding = _check_unique_pair(name, fields, columns[name])
+            if finding is not None:
+                report.findings.append(finding)
+    for name, fieldname, target in REFERENCES:
+        if name in columns and target in columns:
+            finding = _check_reference(name, fieldname, target, columns)
+            if finding is not None:
+                report.findings.append(finding)
+    if "replies" in columns:
+        finding = _check_reply_parents(columns["replies"])
+        if finding is not None:
+            report.findings.append(finding)
+    report.findings.extend(_check_counters(columns))
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def validate_uncached(data_dir: Path, workers: Optional[int] = None) -> IntegrityReport:
+    """:func:`validate` with the columns built in a temporary directory."""
+    with tempfile.TemporaryDirectory(prefix="sample-data-columns-") as temp:
+        return validate(data_dir, workers, Path(temp))
@@ -0,0 +1,72 @@
+"""Share identical immutable subdocuments between generated documents.
+
+Photos, avatars, address blocks and pin ``options`` repeat across thousands of
+documents. :class:`InternCache` hands out one object per distinct key instead
+of rebuilding an equal dict every time, keeps at most ``maxsize`` of them
+(least recently used first out) and remembers the JSON text each one encodes
+to, so :mod:`sample_data.output` serialises a shared subdocument once per
+nesting level rather than once per reference.
+
+Interned values are shared: treat them as read-only. Replace the field on the
+document instead of mutating the subdocument in place.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_MAXSIZE = 1 << 14
+
+
+class InternCache:
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._values: "OrderedDict[Hashable, Any]" = OrderedDict()
+        # id(value) -> {indent level: encoded text}. Only ids of values still
+        # held in _values appear here, so an id is never reused while mapped.
+        self._encoded: Dict[int, Dict[int, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def get(self, key: Hashable, build: Callable[..., T], *args: Any) -> T:
+        """Return the value interned under ``key``, calling ``build(*args)`` on a miss."""
+        values = self._values
+        try:
+            value = values[key]
+        except KeyError:
+            self.misses += 1
+            value = build(*args)
+            values[key] = value
+            self._encoded[id(value)] = {}
+            if len(values) > self.maxsize:
+                _, evicted = values.popitem(last=False)
+                self._encoded.pop(id(evicted), None)
+            return value
+        self.hits += 1
+        values.move_to_end(key)
+        return value
+
+    def encoded(self, value: Any, level: int, render: Callable[[Any, int], str]) -> Optional[str]:
+        """Cached ``render(value, level)`` for interned values, ``None`` otherwise."""
+        memo = self._encoded.get(id(value))
+        if memo is None:
+            return None
+        text = memo.get(level)
+        if text is None:
+            text = memo[level] = render(value, level)
+        return text
+
+    def clear(self) -> None:
+        self._values.clear()
+        self._encoded.clear()
+        self.hits = self.misses = 0
+
+
+SUBDOCUMENTS = InternCache()
@@ -0,0 +1,142 @@
+"""Change journal and user-counter snapshot for incremental stats recomputes.
+
+Stages record the ids of the documents they insert or update on their
+:class:`~sample_data.pipeline.FixtureState`; when the state is flushed those
+changes are appended to ``.changes.ndjson`` in the fixture directory, one
+:class:`Change` per line, together with the fingerprint (name, size, mtime) of
+the collection file they were written to. ``recompute_user_stats`` keeps the
+per-user counters it last wrote in ``.user-stats.json`` (:class:`UserStatsSnapshot`)
+and, on the next run, applies only the journalled changes to them.
+
+A fingerprint that no longer matches the file on disk means the collection was
+edited outside the journal, and the snapshot can no longer be trusted.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .codec import ObjectId
+from .collections import existing_variant
+from .output import write_text_atomic
+
+JOURNAL_NAME = ".changes.ndjson"
+SNAPSHOT_NAME = ".user-stats.json"
+SNAPSHOT_VERSION = 1
+
+OPS = ("insert", "update")
+
+Fingerprint = Dict[str, Any]
+
+
+def fingerprint(path: Path) -> Optional[Fingerprint]:
+    """Identify the current contents of the collection stored at ``path``."""
+    actual = existing_variant(path)
+    try:
+        st = actual.stat()
+    except FileNotFoundError:
+        return None
+    return {"file": actual.name, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+@dataclass
+class Change:
+    collection: str
+    op: str
+    ids: List[ObjectId]
+    # Top-level fields an update touched; ``None`` means "any".
+    fields: Optional[Sequence[str]] = None
+    file: Optional[Fingerprint] = None
+
+    def __post_init__(self) -> None:
+        if self.op not in OPS:
+            raise ValueError(f"unknown change op {self.op!r} (expected one of {', '.join(OPS)})")
+
+    def to_json(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"collection": self.collection, "op": self.op}
+        if self.fields is not None:
+            out["fields"] = list(self.fields)
+        out["ids"] = [str(oid) for oid in self.ids]
+        out["file"] = self.file
+        return out
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "Change":
+        return cls(
+            data["collection"],
+            data["op"],
+            [ObjectId(oid) for oid in data["ids"]],
+            data.get("fields"),
+            data.get("file"),
+        )
+
+
+class ChangeJournal:
+    def __init__(self, data_dir: Path) -> None:
+        self.path = data_dir / JOURNAL_NAME
+
+    def read(self) -> List[Change]:
+        """Every journalled change, oldest first; ``ValueError`` if the journal is damaged."""
+        try:
+            text = self.path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return []
+        changes = []
+        for lineno, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                changes.append(Change.from_json(json.loads(line)))
+            except (ValueError, KeyError, TypeError) as exc:
+                raise ValueError(f"{self.path}:{lineno}: unreadable journal entry ({exc})") from exc
+        return changes
+
+    @staticmethod
+    def _lines(changes: Iterable[Change]) -> str:
+        return "".join(json.dumps(change.to_json(), separators=(",", ":")) + "\n" for change in changes)
+
+    def append(self, changes: Sequence[Change]) -> None:
+        if changes:
+            with self.path.open("a", encoding="utf-8") as fh:
+                fh.write(self._lines(changes))
+
+    def replace(self, changes: Sequence[Change]) -> None:
+        """Start the journal over with just ``changes`` (removing it if there are none)."""
+        if changes:
+            write_text_atomic(self.path, self._lines(changes))
+        else:
+            self.path.unlink(missing_ok=True)
+
+
+@dataclass
+class UserStatsSnapshot:
+    """Per-user counters as last written, plus the collection files they were computed from."""
+
+    counters: Sequence[str]
+    users: Dict[ObjectId, List[int]] = field(default_factory=dict)
+    files: Dict[str, Optional[Fingerprint]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, data_dir: Path) -> Optional["UserStatsSnapshot"]:
+        """The saved snapshot, or ``None`` if there is none (or it is unreadable)."""
+        try:
+            data = json.loads((data_dir / SNAPSHOT_NAME).read_text(encoding="utf-8"))
+            if data.get("version") != SNAPSHOT_VERSION:
+                return None
+            users = {ObjectId(oid): list(values) for oid, values in data["users"].items()}
+            return cls(tuple(data["counters"]), users, data["files"])
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def save(self, data_dir: Path) -> None:
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "counters": list(self.counters),
+            "files": self.files,
+            "users": {str(oid): values for oid, values in self.users.items()},
+        }
+        write_text_atomic(data_dir / SNAPSHOT_NAME, json.dumps(data, separators=(",", ":")) + "\n")
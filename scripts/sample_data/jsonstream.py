@@ -0,0 +1,216 @@
+"""Stream documents out of Extended JSON fixture files one at a time.
+
+The fixture files under ``docs/mongodb-local-sample-data`` are either a single
+top-level JSON array (the checked-in layout) or newline-delimited JSON. Both are
+decoded incrementally from a bounded text buffer so memory stays flat no matter
+how large the file grows. With ``compact=True`` canonical ``$oid``/``$date``
+values come back in the compact form described in :mod:`sample_data.codec`.
+
+:func:`iter_offsets` also reports where each document sits in an uncompressed
+file, and :func:`read_document` reads one back from such an offset.
+"""
+from __future__ import annotations
+
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Any, Iterator, Optional, TextIO, Tuple
+
+from .codec import decode_hook
+from .collections import existing_variant
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = " \t\n\r"
+# Longest token a chunk boundary can split without the decoder reaching the
+# end of the window (``-Infinity``), with room to spare.
+_MAX_TOKEN = 16
+_decoder = json.JSONDecoder()
+_compact_decoder = json.JSONDecoder(object_hook=decode_hook)
+
+
+class _Buffer:
+    """Sliding text window over a file handle."""
+
+    def __init__(
+        self,
+        fh: TextIO,
+        chunk_size: int,
+        decoder: json.JSONDecoder = _decoder,
+        offset: int = 0,
+        source: str = "<stream>",
+    ) -> None:
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.decoder = decoder
+        self.source = source
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+        # ``offset`` is the byte position the handle starts at; the UTF-8
+        # length of the consumed text is tallied up to ``_mark``.
+        self.offset = offset
+        self._mark = 0
+
+    def tell_bytes(self, pos: Optional[int] = None) -> int:
+        """Byte offset of ``pos`` in the window (default: the current position)."""
+        if pos is not None:
+            return self.offset + len(self.text[self._mark : pos].encode("utf-8"))
+        self.offset += len(self.text[self._mark : self.pos].encode("utf-8"))
+        self._mark = self.pos
+        return self.offset
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.fh.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop the consumed prefix so the window never holds more than the
+        # current document plus one chunk.
+        self.tell_bytes()
+        self._mark = 0
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self) -> str:
+        """Advance past whitespace and return the next character ("" at EOF)."""
+        while True:
+            text, pos = self.text, self.pos
+            end = len(text)
+            while pos < end and text[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < end:
+                return text[pos]
+            if not self.fill():
+                return ""
+
+    def decode(self) -> Any:
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError as exc:
+                # Only an error at the end of the window can be a document cut
+                # off by the chunk boundary; anything earlier is in the file.
+                if self._truncated(exc) and self.fill():
+                    continue
+                raise ValueError(f"{self.source}: {exc.msg} at byte {self.tell_bytes(exc.pos)}") from exc
+            if end == len(self.text) and not self.eof and not isinstance(value, (dict, list, str)):
+                # A bare scalar touching the end of the window may be truncated
+                # (``12`` of ``123``); read more before trusting it.
+                if self.fill():
+                    continue
+            self.pos = end
+            return value
+
+    def _truncated(self, exc: json.JSONDecodeError) -> bool:
+        # The decoder reports where the failing token starts: a partial
+        # literal or escape (``tru``, ``\\u00``) sits within a few characters
+        # of the end, and an unterminated string always runs to it.
+        return exc.pos >= len(self.text) - _MAX_TOKEN or exc.msg.startswith("Unterminated string")
+
+
+def _iter_array(buf: _Buffer, source: str) -> Iterator[Any]:
+    buf.pos += 1  # consume "["
+    if buf.skip_whitespace() == "]":
+        buf.pos += 1
+        return
+    while True:
+        if buf.skip_whitespace() == "":
+            raise ValueError(f"{source}: unterminated JSON array")
+        yield buf.decode()
+        token = buf.skip_whitespace()
+        if token == ",":
+            buf.pos += 1
+            continue
+        if token == "]":
+            buf.pos += 1
+            return
+        raise ValueError(f"{source}: expected ',' or ']' but found {token!r}")
+
+
+def _iter_lines(buf: _Buffer) -> Iterator[Any]:
+    while buf.skip_whitespace():
+        yield buf.decode()
+
+
+def iter_stream(
+    fh: TextIO,
+    source: str = "<stream>",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    compact: bool = False,
+) -> Iterator[Any]:
+    """Yield documents from an open text handle holding a JSON array or NDJSON."""
+    buf = _Buffer(fh, chunk_size, _compact_decoder if compact else _decoder, source=source)
+    first = buf.skip_whitespace()
+    if first == "[":
+        yield from _iter_array(buf, source)
+        if buf.skip_whitespace():
+            raise ValueError(f"{source}: trailing data after JSON array")
+    elif first:
+        yield from _iter_lines(buf)
+
+
+def iter_documents(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE, compact: bool = False) -> Iterator[Any]:
+    """Yield each document stored in ``path`` without loading the whole file.
+
+    A missing ``x.json`` falls back to ``x.ndjson`` or ``x.ndjson.gz`` when the
+    collection was last written in another format; ``.gz`` files are read
+    through gzip.
+    """
+    path = existing_variant(path)
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as fh:
+        yield from iter_stream(fh, str(path), chunk_size, compact)
+
+
+def _open_at(raw: io.BufferedReader, offset: int) -> TextIO:
+    raw.seek(offset)
+    # newline="" keeps "\r\n" as two characters, so text and byte offsets agree.
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+def iter_offsets(
+    path: Path, start: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE, compact: bool = False
+) -> Iterator[Tuple[int, int, Any]]:
+    """Yield ``(start, end, document)`` byte spans from an uncompressed ``path``.
+
+    ``start`` may be 0 or the offset of (or just past) any document, so a scan
+    can resume after the documents it has already seen. Both the JSON array
+    and the NDJSON layouts are accepted.
+    """
+    path = existing_variant(path)
+    if path.suffix == ".gz":
+        raise ValueError(f"{path}: byte offsets need an uncompressed file")
+    with path.open("rb") as raw:
+        buf = _Buffer(_open_at(raw, start), chunk_size, _compact_decoder if compact else _decoder, start, str(path))
+        token = buf.skip_whitespace()
+        if start == 0 and token == "[":
+            buf.pos += 1
+            token = buf.skip_whitespace()
+        while token and token != "]":
+            if token == ",":
+                buf.pos += 1
+            else:
+                begin = buf.tell_bytes()
+                doc = buf.decode()
+                yield begin, buf.tell_bytes(), doc
+            token = buf.skip_whitespace()
+
+
+def read_document(path: Path, offset: int, compact: bool = False) -> Any:
+    """The document starting at byte ``offset`` of an uncompressed ``path``."""
+    with existing_variant(path).open("rb") as raw:
+        buf = _Buffer(_open_at(raw, offset), 1 << 16, _compact_decoder if compact else _decoder, offset, str(path))
+        if buf.skip_whitespace() != "{":
+            raise ValueError(f"{path}: no document at byte {offset}")
+        return buf.decode()
+
+
+def load_documents(path: Path, compact: bool = False) -> list[Any]:
+    """Materialise every document in ``path`` as a list."""
+    return list(iter_documents(path, compact=compact))
@@ -0,0 +1,43 @@
+"""Lazy, index-addressable views over generated collections."""
+from __future__ import annotations
+
+from typing import Any, Callable, Iterator, Sequence, Union, overload
+
+
+class LazyCollection(Sequence):
+    """A read-only sequence that builds each document on access.
+
+    ``build(index)`` must be a pure function of ``index``; slicing returns
+    another lazy view, so ``pins[734000:735000]`` costs nothing until iterated.
+    """
+
+    def __init__(self, name: str, build: Callable[[int], Any], indexes: Union[int, range]) -> None:
+        self.name = name
+        self._build = build
+        self._indexes = range(indexes) if isinstance(indexes, int) else indexes
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    @overload
+    def __getitem__(self, item: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, item: slice) -> "LazyCollection": ...
+
+    def __getitem__(self, item: Union[int, slice]) -> Any:
+        if isinstance(item, slice):
+            return LazyCollection(self.name, self._build, self._indexes[item])
+        return self._build(self._indexes[item])
+
+    def __iter__(self) -> Iterator[Any]:
+        build = self._build
+        for index in self._indexes:
+            yield build(index)
+
+    @property
+    def indexes(self) -> range:
+        return self._indexes
+
+    def __repr__(self) -> str:
+        return f"<LazyCollection {self.name} {self._indexes.start}:{self._indexes.stop}:{self._indexes.step}>"
@@ -0,0 +1,354 @@
+"""Write the fixtures as a ``mongodump`` directory for ``mongorestore``.
+
+``load-sample-data.js`` and ``mongoimport`` parse Extended JSON one document
+at a time, which is most of the time spent seeding a large fixture set. A dump
+is already BSON: ``mongorestore`` streams it straight into the server and
+restores several collections at once::
+
+    <out>/<db>/<collection>.bson           the documents, back to back
+    <out>/<db>/<collection>.metadata.json  the collection's indexes
+
+Collections take the names the Mongoose models give them (``ProximityChatPresence``
+is stored in ``proximitychatpresences``), and the metadata lists the indexes the
+models in ``server/models`` declare, so the server finds them in place instead
+of building them on first start. :func:`verify_dump` decodes a dump again,
+compares it document by document with the fixtures it came from, and checks
+that no two documents share a key of a unique index, which would make
+``mongorestore`` fail while building it.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .bsoncodec import BSONError, encode_document, iter_bson, same_value
+from .collections import COLLECTION_FILES, DATA_DIR, existing_variant
+from .jsonstream import iter_documents
+from .output import commit_all
+from .sharding import default_workers, run_tasks
+
+DUMP_DIR_NAME = ".mongodump"
+# The database server/config/runtime.js connects to by default.
+DEFAULT_DB = "pinpoint"
+EXAMPLES = 3
+
+# Fixture collection -> the collection Mongoose stores the model in.
+MONGO_COLLECTIONS = {
+    "users": "users",
+    "pins": "pins",
+    "bookmarks": "bookmarks",
+    "replies": "replies",
+    "proximityChatRooms": "proximitychatrooms",
+    "proximityChatMessages": "proximitychatmessages",
+    "proximityChatPresence": "proximitychatpresences",
+    "locations": "locations",
+}
+
+Keys = Sequence[Tuple[str, Any]]
+
+# (keys, options) for every index the models declare, besides ``_id``.
+INDEXES: Dict[str, List[Tuple[Keys, Dict[str, Any]]]] = {
+    # server/models/User.js
+    "users": [
+        ((("firebaseUid", 1),), {"unique": True, "sparse": True}),
+        ((("username", 1),), {"unique": True}),
+    ],
+    # server/models/Pin.js
+    "pins": [
+        ((("coordinates", "2dsphere"),), {}),
+        ((("creatorId", 1), ("updatedAt", -1)), {}),
+    ],
+    # server/models/Bookmark.js
+    "bookmarks": [((("userId", 1), ("pinId", 1)), {"unique": True})],
+    # server/models/Reply.js
+    "replies": [((("pinId", 1), ("createdAt", 1)), {})],
+    # server/models/ProximityChat.js
+    "proximityChatRooms": [
+        ((("coordinates", "2dsphere"),), {}),
+        ((("pinId", 1),), {"unique": True, "sparse": True}),
+    ],
+    "proximityChatMessages": [],
+    "proximityChatPresence": [((("roomId", 1), ("userId", 1)), {"unique": True})],
+    # server/models/Location.js
+    "locations": [
+        ((("userId", 1),), {}),
+        ((("sessionId", 1),), {}),
+        ((("lastSeenAt", 1),), {}),
+        ((("coordinates", "2dsphere"),), {}),
+        ((("lastSeenAt", -1),), {}),
+        ((("userId", 1), ("sessionId", 1)), {}),
+    ],
+}
+
+
+def _number(value: Any) -> Any:
+    # Canonical Extended JSON, as mongodump writes its metadata.
+    if isinstance(value, bool) or not isinstance(value, int):
+        return value
+    return {"$numberInt": str(value)}
+
+
+def index_spec(keys: Keys, options: Dict[str, Any]) -> Dict[str, Any]:
+    """One ``indexes`` entry, named the way Mongoose names the index it creates."""
+    spec: Dict[str, Any] = {
+        "v": _number(2),
+        "key": {name: _number(direction) for name, direction in keys},
+        "name": "_".join(f"{name}_{direction}" for name, direction in keys),
+    }
+    spec.update(options)
+    if any(direction == "2dsphere" for _, direction in keys):
+        spec["2dsphereIndexVersion"] = _number(3)
+    return spec
+
+
+def collection_metadata(name: str) -> Dict[str, Any]:
+    indexes = [index_spec((("_id", 1),), {})]
+    indexes[0]["name"] = "_id_"
+    indexes.extend(index_spec(keys, options) for keys, options in INDEXES.get(name, []))
+    return {
+        "indexes": indexes,
+        "collectionName": MONGO_COLLECTIONS[name],
+        "type": "collection",
+        "options": {},
+    }
+
+
+@dataclass
+class DumpedCollection:
+    name: str
+    documents: int
+    bytes: int
+
+
+@dataclass
+class DumpReport:
+    directory: Path
+    collections: List[DumpedCollection] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    # Round-trip mismatches and unique-index violations found by verify_dump,
+    # as "collection: detail".
+    problems: List[str] = field(default_factory=list)
+    verified: bool = False
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    def lines(self) -> List[str]:
+        total = sum(entry.documents for entry in self.collections)
+        size = sum(entry.bytes for entry in self.collections)
+        out = [
+            f"Dumped {total:,} documents ({size / 1e6:.1f} MB of BSON) from {len(self.collections)} "
+            f"collections to {self.directory} in {self.elapsed:.2f}s."
+        ]
+        out.extend(f"  {entry.name}: {entry.documents:,} documents" for entry in self.collections)
+        if self.skipped:
+            out.append(f"  skipped (collection file missing): {', '.join(self.skipped)}")
+        if self.verified:
+            verdict = "every document decodes to its fixture." if self.ok else f"{len(self.problems)} problem(s)."
+            out.append(f"Round trip: {verdict}")
+            out.extend(f"  {problem}" for problem in self.problems)
+        return out
+
+
+def _temp(path: Path, mode: str) -> Tuple[Any, Path]:
+    fd, name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    return os.fdopen(fd, mode), Path(name)
+
+
+def _dump_collection(source: Path, target: Path, name: str) -> Tuple[int, int, str, str]:
+    """Worker task: write ``name`` as ``target.bson`` plus metadata, to temporary files.
+
+    Returns the document and byte counts and the two temporary paths, for the
+    caller to move into place together with the other collections.
+    """
+    bson_path = target.with_name(target.name + ".bson")
+    meta_path = target.with_name(target.name + ".metadata.json")
+    fh, bson_temp = _temp(bson_path, "wb")
+    meta_temp: Optional[Path] = None
+    try:
+        count = 0
+        with fh:
+            for doc in iter_documents(source, compact=True):
+                fh.write(encode_document(doc))
+                count += 1
+            size = fh.tell()
+        meta, meta_temp = _temp(meta_path, "w")
+        with meta:
+            meta.write(json.dumps(collection_metadata(name), separators=(",", ":")) + "\n")
+    except BaseException:
+        bson_temp.unlink(missing_ok=True)
+        if meta_temp is not None:
+            meta_temp.unlink(missing_ok=True)
+        raise
+    return count, size, str(bson_temp), str(meta_temp)
+
+
+def _sources(data_dir: Path, collections: Optional[Sequence[str]]) -> Tuple[Dict[str, Path], List[str]]:
+    found, missing = {}, []
+    for name in collections or COLLECTION_FILES:
+        path = existing_variant(data_dir / COLLECTION_FILES[name])
+        if path.exists():
+            found[name] = path
+        else:
+            missing.append(name)
+    return found, missing
+
+
+def write_dump(
+    data_dir: Path = DATA_DIR,
+    out_dir: Optional[Path] = None,
+    db: str = DEFAULT_DB,
+    workers: Optional[int] = None,
+    collections: Optional[Sequence[str]] = None,
+) -> DumpReport:
+    """Dump the fixture collections in ``data_dir`` to ``out_dir/db``.
+
+    The files of every collection replace the previous dump together, or not
+    at all if any collection fails to encode.
+    """
+    started = time.perf_counter()
+    out_dir = out_dir or data_dir / DUMP_DIR_NAME
+    db_dir = out_dir / db
+    db_dir.mkdir(parents=True, exist_ok=True)
+    sources, skipped = _sources(data_dir, collections)
+    report = DumpReport(db_dir, skipped=skipped)
+    tasks = [(_dump_collection, (path, db_dir / MONGO_COLLECTIONS[name], name)) for name, path in sources.items()]
+    workers = min(workers or default_workers(), len(tasks)) if tasks else 1
+    pending: List[Tuple[Path, Path]] = []
+    try:
+        for name, (count, size, bson_temp, meta_temp) in zip(sources, run_tasks(tasks, workers)):
+            target = db_dir / MONGO_COLLECTIONS[name]
+            pending.append((Path(bson_temp), target.with_name(target.name + ".bson")))
+            pending.append((Path(meta_temp), target.with_name(target.name + ".metadata.json")))
+            report.collections.append(DumpedCollection(name, count, size))
+    except BaseException:
+        for temp, _ in pending:
+            temp.unlink(missing_ok=True)
+        raise
+    commit_all(pending)
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+class _UniqueIndex:
+    """Keys seen so far for one unique index, and the documents that repeat one."""
+
+    def __init__(self, keys: Keys, options: Dict[str, Any]) -> None:
+        self.name = index_spec(keys, options)["name"]
+        self.fields = [name for name, _ in keys]
+        self.sparse = bool(options.get("sparse"))
+        self.seen: set = set()
+        self.repeats = 0
+        self.examples: List[str] = []
+
+    def add(self, doc: Dict[str, Any]) -> None:
+        if self.sparse and not any(name in doc for name in self.fields):
+            return
+        # An absent field is indexed as null, like an explicit null.
+        key = tuple(doc.get(name) for name in self.fields)
+        if key not in self.seen:
+            self.seen.add(key)
+            return
+        self.repeats += 1
+        if len(self.examples) < EXAMPLES:
+            self.examples.append(", ".join("null" if value is None else str(value) for value in key))
+
+    def problem(self, collection: str) -> Optional[str]:
+        if not self.repeats:
+            return None
+        return (
+            f"{collection}: {self.repeats:,} document(s) repeat a key of unique index {self.name} "
+            f"(e.g. {'; '.join(self.examples)}); mongorestore cannot build it"
+        )
+
+
+def _unique_indexes(name: str) -> List[_UniqueIndex]:
+    return [_UniqueIndex(keys, options) for keys, options in INDEXES.get(name, []) if options.get("unique")]
+
+
+def _verify_collection(source: Path, dumped: Path, name: str) -> List[str]:
+    """Worker task: compare a dumped collection with its fixture and check its unique indexes.
+
+    Returns up to :data:`EXAMPLES` mismatches, plus one problem per violated unique index.
+    """
+    problems: List[str] = []
+    unique = _unique_indexes(name)
+    expected = iter_documents(source, compact=True)
+    index = 0
+    try:
+        for index, actual in enumerate(iter_bson(dumped)):
+            for constraint in unique:
+                constraint.add(actual)
+            doc = next(expected, None)
+            if doc is None:
+                problems.append(f"{name}: the dump has more documents than the fixture")
+                break
+            if not same_value(doc, actual):
+                problems.append(f"{name}: document {index} ({doc.get('_id')}) does not decode to the fixture")
+                if len(problems) >= EXAMPLES:
+                    break
+        else:
+            if next(expected, None) is not None:
+                problems.append(f"{name}: the dump has fewer documents than the fixture")
+    except BSONError as exc:
+        problems.append(f"{name}: {exc}")
+    problems.extend(problem for problem in (constraint.problem(name) for constraint in unique) if problem)
+    try:
+        metadata = json.loads(dumped.with_name(dumped.name[: -len(".bson")] + ".metadata.json").read_text("utf-8"))
+        if metadata != json.loads(json.dumps(collection_metadata(name))):
+            problems.append(f"{name}: metadata does not list the model's indexes")
+    except (OSError, ValueError) as exc:
+        problems.append(f"{name}: unreadable metadata ({exc})")
+    return problems
+
+
+def verify_dump(
+    data_dir: Path = DATA_DIR,
+    out_dir: Optional[Path] = None,
+    db: str = DEFAULT_DB,
+    workers: Optional[int] = None,
+    report: Optional[DumpReport] = None,
+) -> DumpReport:
+    """Decode the dump in ``out_dir/db`` and compare it with the fixtures in ``data_dir``.
+
+    Adds the findings to ``report`` (a fresh one if ``None``).
+    """
+    started = time.perf_counter()
+    out_dir = out_dir or data_dir / DUMP_DIR_NAME
+    db_dir = out_dir / db
+    sources, skipped = _sources(data_dir, [entry.name for entry in report.collections] if report else None)
+    if report is None:
+        report = DumpReport(db_dir, skipped=skipped)
+    tasks = []
+    for name, path in sources.items():
+        dumped = db_dir / f"{MONGO_COLLECTIONS[name]}.bson"
+        if not dumped.exists():
+            report.problems.append(f"{name}: {dumped.name} is missing")
+            continue
+        tasks.append((_verify_collection, (path, dumped, name)))
+    workers = min(workers or default_workers(), len(tasks)) if tasks else 1
+    for problems in run_tasks(tasks, workers):
+        report.problems.extend(problems)
+    report.verified = True
+    report.elapsed += time.perf_counter() - started
+    return report
+
+
+def add_dump_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--bson-dump",
+        type=Path,
+        nargs="?",
+        const=DATA_DIR / DUMP_DIR_NAME,
+        metavar="DIR",
+        help="Also write the fixtures as a mongodump directory (BSON plus index metadata) in DIR "
+        f"(default: <data dir>/{DUMP_DIR_NAME}), for mongorestore",
+    )
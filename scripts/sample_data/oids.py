@@ -0,0 +1,64 @@
+"""ObjectId construction in MongoDB's 4 + 5 + 3 byte layout.
+
+An id is ``timestamp (4 bytes) | process (5 bytes) | counter (3 bytes)``. The
+process field is split into a 3-byte per-run process id and a 2-byte shard id,
+and each factory hands out counter values sequentially. Within a run, ids are
+therefore unique by construction whatever timestamps they carry, without a set
+of used ids or a scan of the existing fixtures. Across runs, uniqueness rests on
+the random per-run process id, exactly as with the MongoDB drivers.
+"""
+from __future__ import annotations
+
+import secrets
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from .codec import ObjectId
+
+COUNTER_BITS = 24
+COUNTER_MASK = (1 << COUNTER_BITS) - 1
+SHARD_BITS = 16
+
+
+def compose_oid(timestamp: int, process: int, counter: int) -> ObjectId:
+    """ObjectId from its three fields."""
+    if not 0 <= timestamp <= 0xFFFFFFFF:
+        raise ValueError(f"timestamp {timestamp} does not fit in an ObjectId")
+    return ObjectId.from_int(timestamp << 64 | (process & 0xFFFFFFFFFF) << COUNTER_BITS | counter & COUNTER_MASK)
+
+
+def oid_timestamp(oid: ObjectId) -> int:
+    """Seconds since the epoch encoded in the first four bytes of ``oid``."""
+    return int.from_bytes(oid[:4], "big")
+
+
+class ObjectIdFactory:
+    """Hand out unique ObjectIds, optionally stamped with document times.
+
+    ``new_oid(created)`` puts ``created`` in the timestamp field, so sorting by
+    ``_id`` follows creation time the way it does for documents written by the
+    server. Without ``created`` the current clock is used.
+    """
+
+    def __init__(
+        self,
+        shard: int = 0,
+        process_id: Optional[int] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if not 0 <= shard < (1 << SHARD_BITS):
+            raise ValueError(f"shard {shard} does not fit in {SHARD_BITS} bits")
+        self.shard = shard
+        self.process_id = secrets.randbits(24) if process_id is None else process_id & 0xFFFFFF
+        self.clock = clock
+        self.issued = 0
+
+    def new_oid(self, created: Optional[datetime] = None) -> ObjectId:
+        timestamp = int(created.timestamp()) if created is not None else int(self.clock())
+        rollover, counter = divmod(self.issued, 1 << COUNTER_BITS)
+        self.issued += 1
+        # After 2**24 ids the process id advances instead of the counter
+        # wrapping, so a long run never repeats its own (process, counter) pair.
+        process = (((self.process_id + rollover) & 0xFFFFFF) << SHARD_BITS) | self.shard
+        return compose_oid(timestamp, process, counter)
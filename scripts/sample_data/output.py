@@ -0,0 +1,424 @@
+"""Write fixture collections incrementally and atomically.
+
+A collection is written in one of :data:`FORMATS`:
+
+``pretty``     the checked-in layout, an ``indent=2`` JSON array
+``compact``    a JSON array without whitespace
+``ndjson``     one compact document per line
+``ndjson.gz``  gzip'd NDJSON (reproducible: no timestamp or name in the header)
+
+:class:`DocumentWriter` streams documents from any iterable into a temporary
+file next to the target and renames it into place only once the collection is
+complete, so an interrupted run leaves the previous fixture untouched rather
+than a truncated one.
+
+Pretty documents are rendered by a small ``indent=2`` encoder whose output is
+exactly ``json.dumps(codec.encode(doc), indent=2)``. The standard library
+switches to its pure-Python encoder whenever ``indent`` is set anyway; doing
+the work here lets compact ids and dates be written without first expanding
+them into dicts, and lets interned subdocuments reuse their encoded text (see
+:mod:`sample_data.interning`).
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from json.encoder import encode_basestring_ascii as _quote
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, TextIO, Tuple
+
+from .codec import _RECORD_TYPES, Date, DateSeconds, ObjectId, encode
+from .collections import DATA_DIR, DEFAULT_FORMAT, FORMATS, format_path, format_variants
+from .interning import SUBDOCUMENTS
+
+# Formats the checked-in fixtures may be written in: the seed loader
+# (server/scripts/utils/sampleDataLoader.js) only reads ``<collection>.json``.
+CHECKED_IN_FORMATS = ("pretty", "compact")
+
+_PADS = ["\n" + "  " * level for level in range(32)]
+_INFINITY = float("inf")
+
+
+def _pad(level: int) -> str:
+    return _PADS[level] if level < len(_PADS) else "\n" + "  " * level
+
+
+def _key(key: Any) -> str:
+    if isinstance(key, str):
+        return _quote(key)
+    if key is True or key is False or key is None:
+        return _quote(json.dumps(key))
+    if isinstance(key, float):
+        return _quote(_float(key))
+    if isinstance(key, int):
+        return _quote(int.__repr__(key))
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def _float(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value == _INFINITY:
+        return "Infinity"
+    if value == -_INFINITY:
+        return "-Infinity"
+    return float.__repr__(value)
+
+
+def _render_pairs(pairs: Iterable[Any], level: int) -> str:
+    parts = [_key(key) + ": " + _render(value, level + 1) for key, value in pairs]
+    if not parts:
+        return "{}"
+    inner = _pad(level + 1)
+    return "{" + inner + ("," + inner).join(parts) + _pad(level) + "}"
+
+
+def _render_dict(node: dict, level: int) -> str:
+    return _render_pairs(node.items(), level)
+
+
+def _render_list(node: Any, level: int) -> str:
+    if not node:
+        return "[]"
+    inner = _pad(level + 1)
+    return "[" + inner + ("," + inner).join([_render(value, level + 1) for value in node]) + _pad(level) + "]"
+
+
+def _render(node: Any, level: int) -> str:
+    kind = type(node)
+    if kind is str:
+        return _quote(node)
+    if kind is dict:
+        text = SUBDOCUMENTS.encoded(node, level, _render_dict)
+        return text if text is not None else _render_dict(node, level)
+    if kind is list:
+        text = SUBDOCUMENTS.encoded(node, level, _render_list)
+        return text if text is not None else _render_list(node, level)
+    if kind is ObjectId:
+        return "{" + _pad(level + 1) + '"$oid": "' + node.hex() + '"' + _pad(level) + "}"
+    if kind is Date or kind is DateSeconds:
+        return "{" + _pad(level + 1) + '"$date": "' + node.isoformat() + '"' + _pad(level) + "}"
+    if node is None:
+        return "null"
+    if node is True:
+        return "true"
+    if node is False:
+        return "false"
+    if kind is int:
+        return int.__repr__(node)
+    if kind is float:
+        return _float(node)
+    if kind in _RECORD_TYPES:
+        return _render_pairs(node.pairs(), level)
+    # Subclasses, checked in the same order json.dumps checks them.
+    if isinstance(node, str):
+        return _quote(node)
+    if isinstance(node, int):
+        return int.__repr__(node)
+    if isinstance(node, float):
+        return _float(node)
+    if isinstance(node, (list, tuple)):
+        return _render_list(node, level)
+    if isinstance(node, dict):
+        return _render_dict(node, level)
+    raise TypeError(f"Object of type {kind.__name__} is not JSON serializable")
+
+
+def dumps(doc: Any) -> str:
+    """``json.dumps(codec.encode(doc), indent=2)`` without the intermediate copy."""
+    return _render(doc, 0)
+
+
+def encode_element(doc: Any) -> str:
+    """Encode ``doc`` as one element of an ``indent=2`` JSON array.
+
+    Compact ids and dates in ``doc`` are written back as Extended JSON.
+    """
+    return "  " + _render(doc, 1)
+
+
+def compact_element(doc: Any) -> str:
+    """Encode ``doc`` as JSON without whitespace (one NDJSON line, sans newline)."""
+    return json.dumps(encode(doc), separators=(",", ":"))
+
+
+class _Layout(NamedTuple):
+    encode: Callable[[Any], str]
+    head: str
+    separator: str
+    tail: str
+    empty: str
+
+
+_LAYOUTS: Dict[str, _Layout] = {
+    "pretty": _Layout(encode_element, "[\n", ",\n", "\n]\n", "[]\n"),
+    "compact": _Layout(compact_element, "[", ",", "]\n", "[]\n"),
+    "ndjson": _Layout(compact_element, "", "\n", "\n", ""),
+    "ndjson.gz": _Layout(compact_element, "", "\n", "\n", ""),
+}
+
+
+def _layout(fmt: str) -> _Layout:
+    try:
+        return _LAYOUTS[fmt]
+    except KeyError:
+        raise ValueError(f"unknown output format {fmt!r}; expected one of {', '.join(FORMATS)}") from None
+
+
+class _Sink:
+    """Text handle on a temporary file that becomes ``path`` on :meth:`commit`."""
+
+    def __init__(self, path: Path, compress: bool) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+        self.temp = Path(name)
+        self._raw: BinaryIO = os.fdopen(fd, "wb")
+        self._gzip: Optional[gzip.GzipFile] = None
+        binary: BinaryIO = self._raw
+        if compress:
+            self._gzip = gzip.GzipFile(filename="", mode="wb", fileobj=self._raw, mtime=0)
+            binary = self._gzip  # type: ignore[assignment]
+        self.fh: TextIO = io.TextIOWrapper(binary, encoding="utf-8", newline="\n")
+        self.bytes = 0
+
+    def finish(self) -> None:
+        """Flush everything to the temporary file; it is complete but not yet in place."""
+        self.fh.flush()
+        self.fh.detach()
+        if self._gzip is not None:
+            self._gzip.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self.bytes = self._raw.tell()
+        self._raw.close()
+
+    def commit(self) -> None:
+        commit_file(self.temp, self.path)
+
+    def abort(self) -> None:
+        for handle in (self.fh, self._gzip, self._raw):
+            try:
+                if handle is not None and not handle.closed:
+                    handle.close()
+            except (ValueError, OSError):
+                pass
+        self.temp.unlink(missing_ok=True)
+
+
+def _drop_other_formats(path: Path) -> None:
+    # A collection lives in exactly one format: drop copies in the others.
+    # Never in the checked-in directory, whose .json files the seed loader reads.
+    if path.parent.resolve() == DATA_DIR.resolve():
+        return
+    for other in format_variants(path):
+        if other != path:
+            other.unlink(missing_ok=True)
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    """Replace ``path`` with ``text`` in one rename (for small side files, not fixtures)."""
+    fd, temp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(temp, path)
+    except BaseException:
+        Path(temp).unlink(missing_ok=True)
+        raise
+
+
+def commit_file(temp: Path, path: Path) -> None:
+    """Move a finished temporary file over ``path``."""
+    # mkstemp creates the file 0600; keep the target's mode, or a normal 0644.
+    mode = path.stat().st_mode & 0o777 if path.exists() else 0o644
+    os.chmod(temp, mode)
+    os.replace(temp, path)
+    _drop_other_formats(path)
+
+
+def commit_all(pending: Sequence[Tuple[Path, Path]]) -> None:
+    """Move every finished ``(temp, path)`` into place, or none of them.
+
+    Existing targets are set aside first; if any rename fails, the ones
+    already made are undone and the originals restored before re-raising.
+    """
+    backups: List[Tuple[Path, Path]] = []
+    placed: List[Path] = []
+    try:
+        for temp, path in pending:
+            mode = path.stat().st_mode & 0o777 if path.exists() else 0o644
+            os.chmod(temp, mode)
+            if path.exists():
+                backup = path.with_name(f".{path.name}.bak")
+                os.replace(path, backup)
+                backups.append((backup, path))
+            os.replace(temp, path)
+            placed.append(path)
+    except BaseException:
+        for path in placed:
+            path.unlink(missing_ok=True)
+        for backup, path in backups:
+            os.replace(backup, path)
+        for temp, _ in pending:
+            temp.unlink(missing_ok=True)
+        raise
+    for backup, _ in backups:
+        backup.unlink(missing_ok=True)
+    for path in placed:
+        _drop_other_formats(path)
+
+
+class DocumentWriter:
+    """Stream documents into one collection file.
+
+    ``pretty`` output is byte-for-byte what ``json.dump(docs, fh, indent=2)``
+    followed by a newline would produce, without holding ``docs`` in memory.
+    The file only appears at ``path`` when the writer closes cleanly; leaving
+    the ``with`` block through an exception discards it. Callers committing
+    several files together can use :meth:`finish` and :meth:`commit` instead.
+
+    With ``fragment=True`` the writer produces a plain, uncompressed run of
+    elements written straight to ``path``, to be stitched into a collection by
+    :func:`merge_fragments`.
+    """
+
+    def __init__(self, path: Path, fmt: str = DEFAULT_FORMAT, fragment: bool = False) -> None:
+        self.path = path
+        self.format = fmt
+        self.fragment = fragment
+        self.layout = _layout(fmt)
+        self.count = 0
+        self.bytes = 0
+        self._sink: Optional[_Sink] = None
+        self._fh: Optional[TextIO] = None
+
+    def __enter__(self) -> "DocumentWriter":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def open(self) -> None:
+        if self.fragment:
+            self._fh = self.path.open("w", encoding="utf-8", newline="\n")
+        else:
+            self._sink = _Sink(self.path, compress=self.format.endswith(".gz"))
+            self._fh = self._sink.fh
+
+    def write(self, doc: Any) -> None:
+        assert self._fh is not None, "writer is not open"
+        if self.count:
+            self._fh.write(self.layout.separator)
+        elif not self.fragment:
+            self._fh.write(self.layout.head)
+        self._fh.write(self.layout.encode(doc))
+        self.count += 1
+
+    def write_all(self, docs: Iterable[Any]) -> None:
+        for doc in docs:
+            self.write(doc)
+
+    def finish(self) -> None:
+        """Complete the file without moving it into place yet."""
+        if self._fh is None:
+            return
+        if self.fragment:
+            self._fh.close()
+        else:
+            assert self._sink is not None
+            self._fh.write(self.layout.tail if self.count else self.layout.empty)
+            self._sink.finish()
+            self.bytes = self._sink.bytes
+        self._fh = None
+
+    @property
+    def temp_path(self) -> Optional[Path]:
+        """Where the file sits between :meth:`finish` and :meth:`commit`."""
+        return self._sink.temp if self._sink is not None else None
+
+    def commit(self) -> None:
+        if self._sink is not None:
+            self._sink.commit()
+            self._sink = None
+
+    def close(self) -> None:
+        self.finish()
+        self.commit()
+
+    def abort(self) -> None:
+        if self._sink is not None:
+            self._sink.abort()
+            self._sink = None
+        elif self._fh is not None:
+            self._fh.close()
+        self._fh = None
+
+
+def dump_documents(path: Path, docs: Iterable[Any], fmt: str = DEFAULT_FORMAT) -> DocumentWriter:
+    """Atomically write ``docs`` as the collection stored at ``path``, in ``fmt``.
+
+    The file name's suffix follows the format (``x.json`` becomes ``x.ndjson``
+    for NDJSON); returns the closed writer.
+    """
+    with DocumentWriter(format_path(path, fmt), fmt) as writer:
+        writer.write_all(docs)
+    return writer
+
+
+def add_format_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default=DEFAULT_FORMAT,
+        help=f"Layout of the fixture files written (default: {DEFAULT_FORMAT})",
+    )
+
+
+def check_checked_in_format(parser: argparse.ArgumentParser, fmt: str) -> None:
+    """Exit with a usage error if ``fmt`` cannot be used for the checked-in fixtures."""
+    if fmt not in CHECKED_IN_FORMATS:
+        parser.error(
+            f"--format {fmt} cannot write the checked-in fixtures (npm run seed:samples only reads .json); "
+            f"use {' or '.join(CHECKED_IN_FORMATS)}"
+        )
+
+
+def merge_fragments(path: Path, fragments: Sequence[Path], fmt: str = DEFAULT_FORMAT, remove: bool = True) -> int:
+    """Concatenate fragment files (in order) into one collection at ``path``.
+
+    Returns the number of bytes written.
+    """
+    layout = _layout(fmt)
+    sink = _Sink(path, compress=fmt.endswith(".gz"))
+    try:
+        out = sink.fh
+        wrote_any = False
+        for fragment in fragments:
+            with fragment.open(encoding="utf-8", newline="\n") as src:
+                first = src.read(1)
+                if not first:
+                    continue
+                out.write(layout.separator if wrote_any else layout.head)
+                out.write(first)
+                shutil.copyfileobj(src, out, 1 << 20)
+                wrote_any = True
+        out.write(layout.tail if wrote_any else layout.empty)
+        sink.finish()
+    except BaseException:
+        sink.abort()
+        raise
+    sink.commit()
+    if remove:
+        for fragment in fragments:
+            fragment.unlink(missing_ok=True)
+    return sink.bytes
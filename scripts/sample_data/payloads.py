@@ -0,0 +1,466 @@
+"""Document builders shared by the fixture generators.
+
+Every builder takes an ``rng`` argument that defaults to the global ``random``
+module, so the hand-tuned ``augment_sample_data`` run keeps drawing from its
+seeded global stream while the scaled generators can pass their own
+``random.Random`` instances.
+"""
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from .codec import Date, ObjectId
+from .interning import SUBDOCUMENTS
+from .records import Bookmark, ChatMessage, ChatPresence, ChatRoom, Pin, Reply, User
+
+OidLike = Union[str, ObjectId]
+
+EVENT_TAGS = ["kayak", "offroad", "scuba", "photo", "debug", "training", "demo", "music"]
+DISCUSSION_TAGS = ["chat", "debug", "design", "surf", "grid", "map", "qa", "coffee"]
+EVENT_GEAR = ["kayaks", "dirt rigs", "reef drones", "camera sleds", "trail beacons"]
+SNIPPET_BANK = ["blip", "swoop", "gloop", "kay-mode", "debug dribble", "calico loop"]
+BOOKMARK_NOTES = {
+    "event": "Stack extras for {}",
+    "discussion": "Clip notes for {}",
+}
+ANCHORS = [
+    ("Marine Stadium Launch", "5255 Paoli Way"),
+    ("CSULB Rec Fields", "1250 N Bellflower Blvd"),
+    ("Bluff Park Meetup", "2500 E Ocean Blvd"),
+    ("Colorado Lagoon Hub", "5119 E Colorado St"),
+    ("Palo Verde Pit Zone", "1800 Palo Verde Ave"),
+    ("Los Altos Lot", "2250 Bellflower Blvd"),
+]
+# Approximate (longitude, latitude) of each anchor; hotspot centres for sample_data.hotspots.
+ANCHOR_POINTS = {
+    "Marine Stadium Launch": (-118.1290, 33.7581),
+    "CSULB Rec Fields": (-118.1110, 33.7870),
+    "Bluff Park Meetup": (-118.1566, 33.7618),
+    "Colorado Lagoon Hub": (-118.1401, 33.7704),
+    "Palo Verde Pit Zone": (-118.0986, 33.7905),
+    "Los Altos Lot": (-118.1245, 33.7972),
+}
+SYLLABLES = ["zor", "bex", "malo", "quin", "riff", "plom", "zeta", "kyu", "vex", "luma"]
+
+CSULB_CENTER = (33.7838, -118.1136)
+# Half-extent, in degrees, of the box random_coordinate draws from.
+LAT_SPAN = 0.012
+LON_SPAN = 0.02
+
+
+def oid_ref(oid: OidLike) -> ObjectId:
+    return ObjectId(oid)
+
+
+def iso_date(dt: datetime) -> Date:
+    return Date.from_datetime(dt)
+
+
+# Builders below whose result depends only on their arguments go through
+# SUBDOCUMENTS, so repeated calls share one (read-only) object.
+
+
+def _photo(path: str) -> Dict[str, Any]:
+    return {
+        "url": path,
+        "thumbnailUrl": path,
+        "width": 512,
+        "height": 512,
+        "mimeType": "image/jpeg",
+    }
+
+
+def photo_payload(path: str) -> Dict[str, Any]:
+    return SUBDOCUMENTS.get(("photo", path), _photo, path)
+
+
+def photo_list(path: str) -> List[Dict[str, Any]]:
+    return SUBDOCUMENTS.get(("photos", path), lambda: [photo_payload(path)])
+
+
+def image_attachment(path: str) -> Dict[str, Any]:
+    return SUBDOCUMENTS.get(("attachment", path), lambda: {"type": "image", **_photo(path)})
+
+
+def _avatar(path: str) -> Dict[str, Any]:
+    return {
+        "url": path,
+        "thumbnailUrl": path,
+        "width": 128,
+        "height": 128,
+        "mimeType": "image/jpeg",
+        "uploadedAt": iso_date(datetime(2026, 8, 1, tzinfo=timezone.utc)),
+    }
+
+
+def default_avatar(path: str = "/images/profile/profile-01") -> Dict[str, Any]:
+    return SUBDOCUMENTS.get(("avatar", path), _avatar, path)
+
+
+def build_titles(
+    prefixes: List[str], subjects: List[str], suffixes: List[str], needed: int, rng: Any = random
+) -> List[str]:
+    combos: List[str] = []
+    for p in prefixes:
+        for s in subjects:
+            for suf in suffixes:
+                combos.append(f"{p} {s} {suf}".strip())
+    rng.shuffle(combos)
+    if len(combos) < needed:
+        raise ValueError("Not enough title combinations")
+    return combos[:needed]
+
+
+def random_coordinate(rng: Any = random) -> Dict[str, Any]:
+    lat = CSULB_CENTER[0] + rng.uniform(-LAT_SPAN, LAT_SPAN)
+    lon = CSULB_CENTER[1] + rng.uniform(-LON_SPAN, LON_SPAN)
+    return {
+        "type": "Point",
+        "coordinates": [round(lon, 6), round(lat, 6)],
+        "accuracy": rng.randint(5, 12),
+    }
+
+
+def _address(label: str, line1: str) -> Dict[str, Any]:
+    return {
+        "precise": label,
+        "components": {
+            "line1": line1,
+            "city": "Long Beach",
+            "state": "CA",
+            "postalCode": "90840",
+            "country": "USA",
+        },
+    }
+
+
+def precise_address(rng: Any = random) -> Dict[str, Any]:
+    label, line1 = rng.choice(ANCHORS)
+    return SUBDOCUMENTS.get(("address", label, line1), _address, label, line1)
+
+
+def _city() -> Dict[str, str]:
+    return {
+        "city": "Long Beach",
+        "state": "CA",
+        "country": "USA",
+        "formatted": "Long Beach, CA",
+    }
+
+
+def approx_city() -> Dict[str, str]:
+    return SUBDOCUMENTS.get(("city",), _city)
+
+
+def _event_options(reminder_minutes: int) -> Dict[str, Any]:
+    return {
+        "allowBookmarks": True,
+        "allowShares": True,
+        "allowReplies": True,
+        "showAttendeeList": True,
+        "featured": False,
+        "visibilityMode": "map-and-list",
+        "reminderMinutesBefore": reminder_minutes,
+    }
+
+
+def event_options(reminder_minutes: int) -> Dict[str, Any]:
+    return SUBDOCUMENTS.get(("event-options", reminder_minutes), _event_options, reminder_minutes)
+
+
+def _discussion_options() -> Dict[str, Any]:
+    return {
+        "allowBookmarks": True,
+        "allowShares": True,
+        "allowReplies": True,
+        "showAttendeeList": False,
+        "visibilityMode": "map-and-list",
+        "featured": False,
+    }
+
+
+def discussion_options() -> Dict[str, Any]:
+    return SUBDOCUMENTS.get(("discussion-options",), _discussion_options)
+
+
+def gibberish(rng: Any = random) -> str:
+    words = [rng.choice(SYLLABLES) + rng.choice(["", rng.choice(SYLLABLES)]) for _ in range(rng.randint(3, 7))]
+    return " ".join(words).capitalize() + "!"
+
+
+def event_pin_payload(
+    pin_id: OidLike,
+    creator_id: OidLike,
+    title: str,
+    photo_path: str,
+    attendees: Sequence[OidLike],
+    start_dt: datetime,
+    end_dt: datetime,
+    tags: List[str],
+    linked_location: Optional[ObjectId],
+    rng: Any = random,
+) -> Pin:
+    expires_dt = end_dt + timedelta(days=30)
+    return Pin(
+        _id=oid_ref(pin_id),
+        type="event",
+        creatorId=oid_ref(creator_id),
+        title=title,
+        description=(
+            "Hands-on session featuring "
+            + rng.choice(EVENT_GEAR)
+            + ". Expect ridiculous banter and impromptu challenges."
+        ),
+        coordinates=random_coordinate(rng),
+        address=precise_address(rng),
+        proximityRadiusMeters=rng.choice([800, 1000, 1200]),
+        photos=photo_list(photo_path),
+        coverPhoto=photo_payload(photo_path),
+        tagIds=[],
+        tags=tags,
+        options=event_options(rng.choice([30, 45, 60])),
+        relatedPinIds=[],
+        linkedLocationId=linked_location,
+        linkedChatRoomId=None,
+        visibility="public",
+        isActive=True,
+        attendingUserIds=[oid_ref(uid) for uid in attendees],
+        attendeeWaitlistIds=[],
+        attendable=True,
+        participantLimit=rng.choice([40, 60, 80, 120]),
+        participantCount=len(attendees),
+        startDate=iso_date(start_dt),
+        endDate=iso_date(end_dt),
+        stats={
+            "bookmarkCount": 0,
+            "replyCount": 0,
+            "shareCount": rng.randint(0, 5),
+            "viewCount": rng.randint(120, 800),
+        },
+        bookmarkCount=0,
+        replyCount=0,
+        descriptionHasMarkdown=False,
+        createdAt=iso_date(start_dt - timedelta(days=5)),
+        updatedAt=iso_date(start_dt - timedelta(days=5)),
+        expiresAt=iso_date(expires_dt),
+    )
+
+
+def discussion_pin_payload(
+    pin_id: OidLike,
+    creator_id: OidLike,
+    title: str,
+    photo_path: str,
+    start_dt: datetime,
+    tags: List[str],
+    linked_location: Optional[ObjectId],
+    rng: Any = random,
+) -> Pin:
+    expires_dt = start_dt + timedelta(days=90)
+    return Pin(
+        _id=oid_ref(pin_id),
+        type="discussion",
+        creatorId=oid_ref(creator_id),
+        title=title,
+        description="Open mic for nonsense theories, waypoint lore, and snack trades.",
+        coordinates=random_coordinate(rng),
+        approximateAddress=approx_city(),
+        proximityRadiusMeters=rng.choice([400, 600, 800]),
+        photos=photo_list(photo_path),
+        coverPhoto=photo_payload(photo_path),
+        tagIds=[],
+        tags=tags,
+        options=discussion_options(),
+        relatedPinIds=[],
+        linkedLocationId=linked_location,
+        linkedChatRoomId=None,
+        visibility="public",
+        isActive=True,
+        participantCount=0,
+        autoDelete=False,
+        stats={
+            "bookmarkCount": 0,
+            "replyCount": 0,
+            "shareCount": rng.randint(0, 3),
+            "viewCount": rng.randint(60, 420),
+        },
+        bookmarkCount=0,
+        replyCount=0,
+        createdAt=iso_date(start_dt - timedelta(days=3)),
+        updatedAt=iso_date(start_dt - timedelta(days=3)),
+        expiresAt=iso_date(expires_dt),
+        replyLimit=rng.choice([50, 75, 100, 150, 200]),
+    )
+
+
+def reply_payload(
+    reply_id: OidLike,
+    pin_id: OidLike,
+    parent_id: Optional[OidLike],
+    author_id: OidLike,
+    message: str,
+    created: datetime,
+    updated: Optional[datetime] = None,
+) -> Reply:
+    return Reply(
+        _id=oid_ref(reply_id),
+        pinId=oid_ref(pin_id),
+        parentReplyId=oid_ref(parent_id) if parent_id else None,
+        authorId=oid_ref(author_id),
+        message=message,
+        attachments=[],
+        reactions=[],
+        mentionedUserIds=[],
+        audit={"createdBy": oid_ref(author_id)},
+        createdAt=iso_date(created),
+        updatedAt=iso_date(updated or created),
+    )
+
+
+def bookmark_payload(
+    bookmark_id: OidLike, user_id: OidLike, pin_id: OidLike, notes: str, stamp: datetime
+) -> Bookmark:
+    return Bookmark(
+        _id=oid_ref(bookmark_id),
+        userId=oid_ref(user_id),
+        pinId=oid_ref(pin_id),
+        collectionId=None,
+        notes=notes,
+        reminderAt=None,
+        tagIds=[],
+        audit={
+            "createdBy": oid_ref(user_id),
+            "updatedBy": oid_ref(user_id),
+        },
+        createdAt=iso_date(stamp),
+        updatedAt=iso_date(stamp),
+    )
+
+
+def chat_message_payload(
+    msg_id: OidLike,
+    room_id: OidLike,
+    author_id: OidLike,
+    username: str,
+    display_name: str,
+    avatar: Dict[str, Any],
+    author_avatar: Dict[str, Any],
+    message: str,
+    coordinates: Dict[str, Any],
+    attachments: List[Dict[str, Any]],
+    dt: datetime,
+) -> ChatMessage:
+    return ChatMessage(
+        _id=oid_ref(msg_id),
+        roomId=oid_ref(room_id),
+        pinId=None,
+        authorId=oid_ref(author_id),
+        replyToMessageId=None,
+        message=message,
+        coordinates=coordinates,
+        attachments=attachments,
+        audit={"createdBy": oid_ref(author_id)},
+        createdAt=iso_date(dt),
+        updatedAt=iso_date(dt),
+        author={
+            "_id": oid_ref(author_id),
+            "username": username,
+            "displayName": display_name,
+            "avatar": avatar,
+        },
+        authorAvatar=author_avatar,
+    )
+
+
+def presence_payload(
+    presence_id: OidLike,
+    room_id: OidLike,
+    user_id: OidLike,
+    session_id: OidLike,
+    joined: datetime,
+    last_active: datetime,
+) -> ChatPresence:
+    return ChatPresence(
+        _id=oid_ref(presence_id),
+        roomId=oid_ref(room_id),
+        userId=oid_ref(user_id),
+        sessionId=oid_ref(session_id),
+        joinedAt=iso_date(joined),
+        lastActiveAt=iso_date(last_active),
+    )
+
+
+def user_payload(
+    user_id: OidLike,
+    username: str,
+    display_name: str,
+    avatar: Dict[str, Any],
+    stats: Dict[str, int],
+    created: datetime,
+) -> User:
+    return User(
+        _id=oid_ref(user_id),
+        username=username,
+        displayName=display_name,
+        email=f"{username}@pinpoint.dev",
+        bio="Generated load-test account.",
+        avatar=avatar,
+        roles=["user"],
+        accountStatus="active",
+        preferences={
+            "theme": "system",
+            "notifications": {"proximity": True, "updates": True, "marketing": False},
+            "radiusPreferenceMeters": 16093,
+        },
+        stats=stats,
+        relationships={
+            "followerIds": [],
+            "followingIds": [],
+            "friendIds": [],
+            "mutedUserIds": [],
+            "blockedUserIds": [],
+        },
+        pinnedPinIds=[],
+        ownedPinIds=[],
+        bookmarkCollectionIds=[],
+        proximityChatRoomIds=[],
+        recentLocationIds=[],
+        createdAt=iso_date(created),
+        updatedAt=iso_date(created),
+    )
+
+
+def room_payload(
+    room_id: OidLike,
+    owner_id: OidLike,
+    name: str,
+    lon: float,
+    lat: float,
+    radius_meters: int,
+    participant_count: int,
+    created: datetime,
+) -> ChatRoom:
+    """Proximity chat room in the layout emitted by ``scripts/generate-proximity-grid.js``."""
+    return ChatRoom(
+        _id=oid_ref(room_id),
+        ownerId=oid_ref(owner_id),
+        name=name,
+        description="Autogenerated overlap grid cell for CSULB proximity demos.",
+        coordinates={
+            "type": "Point",
+            "coordinates": [round(lon, 6), round(lat, 6)],
+            "accuracy": 6,
+        },
+        radiusMeters=radius_meters,
+        participantCount=participant_count,
+        participantIds=[oid_ref(owner_id)],
+        moderatorIds=[oid_ref(owner_id)],
+        audit={
+            "createdBy": oid_ref(owner_id),
+            "updatedBy": oid_ref(owner_id),
+        },
+        createdAt=iso_date(created),
+        updatedAt=iso_date(created),
+    )
@@ -0,0 +1,132 @@
+"""Write several collections concurrently and commit them as one set.
+
+Each collection is encoded and written to a temporary file by its own task on
+a process pool (encoding is CPU-bound Python, so threads would serialise on
+the GIL), which also overlaps one collection's disk writes with another's
+encoding. Only when every task has succeeded are the files moved into place
+together with :func:`sample_data.output.commit_all`; a failure in any of them
+discards all the temporary files and leaves the existing fixtures untouched.
+
+Where the platform can fork, a task is handed only the index of its
+collection: the forked worker renders the parent's own objects, so interned
+subdocuments are still recognised and encoded once (see
+:mod:`sample_data.interning`). Elsewhere the documents are pickled over.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple
+
+from .collections import DEFAULT_FORMAT, format_path
+from .output import DocumentWriter, commit_all
+from .sharding import default_workers
+
+
+# The jobs of the running persist_collections call, inherited by forked workers.
+_JOBS: Sequence[Tuple[Path, Sequence[Any]]] = ()
+
+
+@dataclass
+class WrittenCollection:
+    path: Path
+    temp: Path
+    documents: int
+    bytes: int
+    seconds: float
+
+
+@dataclass
+class PersistReport:
+    written: List[WrittenCollection] = field(default_factory=list)
+    elapsed: float = 0.0
+    workers: int = 1
+
+    def lines(self) -> List[str]:
+        out = []
+        for item in self.written:
+            out.append(
+                f"  {item.path.name:<44}{item.documents:>9,} docs {item.bytes:>13,} bytes  {item.seconds:7.2f}s"
+            )
+        total_docs = sum(item.documents for item in self.written)
+        total_bytes = sum(item.bytes for item in self.written)
+        out.append(
+            f"  {'total':<44}{total_docs:>9,} docs {total_bytes:>13,} bytes  {self.elapsed:7.2f}s"
+            f"  ({self.workers} worker{'s' if self.workers != 1 else ''})"
+        )
+        return out
+
+
+def write_collection(path: Path, docs: Sequence[Any], fmt: str) -> WrittenCollection:
+    """Encode ``docs`` into a finished, not yet committed, temporary file for ``path``."""
+    started = time.perf_counter()
+    writer = DocumentWriter(path, fmt)
+    writer.open()
+    try:
+        writer.write_all(docs)
+        writer.finish()
+    except BaseException:
+        writer.abort()
+        raise
+    assert writer.temp_path is not None
+    return WrittenCollection(path, writer.temp_path, writer.count, writer.bytes, time.perf_counter() - started)
+
+
+def _write_job(index: int, fmt: str) -> WrittenCollection:
+    path, docs = _JOBS[index]
+    return write_collection(path, docs, fmt)
+
+
+def persist_collections(
+    collections: Sequence[Tuple[Path, Sequence[Any]]],
+    fmt: str = DEFAULT_FORMAT,
+    workers: Optional[int] = None,
+) -> PersistReport:
+    """Write every ``(path, docs)`` pair in ``fmt``; all files land, or none do.
+
+    ``path`` names the collection as in :func:`sample_data.output.dump_documents`
+    (its suffix follows ``fmt``). ``workers <= 1`` writes in-process.
+    """
+    started = time.perf_counter()
+    jobs = [(format_path(path, fmt), docs) for path, docs in collections]
+    workers = max(1, min(workers or default_workers(), len(jobs)))
+    written: List[WrittenCollection] = []
+    errors: List[BaseException] = []
+
+    if workers <= 1:
+        for path, docs in jobs:
+            try:
+                written.append(write_collection(path, docs, fmt))
+            except Exception as exc:
+                errors.append(exc)
+                break
+    else:
+        global _JOBS
+        forking = "fork" in multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork") if forking else None
+        _JOBS = jobs
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                if forking:
+                    futures: List[Future] = [pool.submit(_write_job, index, fmt) for index in range(len(jobs))]
+                else:
+                    futures = [pool.submit(write_collection, path, docs, fmt) for path, docs in jobs]
+                # Wait for every task, even after a failure, so no temporary
+                # file is left behind by a task still running.
+                for future in futures:
+                    try:
+                        written.append(future.result())
+                    except Exception as exc:
+                        errors.append(exc)
+        finally:
+            _JOBS = ()
+
+    if errors:
+        for item in written:
+            item.temp.unlink(missing_ok=True)
+        raise errors[0]
+    commit_all([(item.temp, item.path) for item in written])
+    return PersistReport(written, time.perf_counter() - started, workers)
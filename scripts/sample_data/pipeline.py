@@ -0,0 +1,190 @@
+"""Shared in-memory state for running the fixture scripts as pipeline stages.
+
+``augment_sample_data``, ``ensure_pin_replies`` and ``recompute_user_stats``
+each expose a stage function taking a :class:`FixtureState`. The state loads a
+collection from disk at most once, hands the same list to every later stage,
+and remembers which collections a stage changed so :meth:`FixtureState.flush`
+writes each of those exactly once, at the end, as one all-or-none set.
+
+Stages also record which documents they inserted or updated
+(:meth:`FixtureState.record_changes`); the flush appends those to the change
+journal (see :mod:`sample_data.journal`) once the files are in place.
+
+Read-only scans that only need the counted fields can use
+:meth:`FixtureState.source`, which serves a collection that is not in memory
+from the column cache (see :mod:`sample_data.columns`). Id and reference
+lookups go through :meth:`FixtureState.references` (see
+:mod:`sample_data.refindex`), which the flush keeps up to date.
+
+With a ``delta_dir`` the flush also writes what changed since the
+collections were loaded as NDJSON patch files (see :mod:`sample_data.delta`).
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from .collections import COLLECTION_FILES, DEFAULT_FORMAT
+from .codec import oid_value
+from .columns import CACHE_DIR_NAME, ColumnCache, ColumnSet
+from .delta import Digests, diff_collection, document_digests, write_delta
+from .refindex import ReferenceIndex, open_index
+from .journal import Change, ChangeJournal, UserStatsSnapshot, fingerprint
+from .jsonstream import iter_documents
+from .persist import PersistReport, persist_collections
+from .records import RECORD_TYPES, load_records
+
+
+class FixtureState:
+    def __init__(
+        self,
+        data_dir: Path,
+        fmt: str = DEFAULT_FORMAT,
+        memory_budget: Optional[int] = None,
+        spill_dir: Optional[Path] = None,
+        column_cache: bool = True,
+        delta_dir: Optional[Path] = None,
+    ) -> None:
+        self.data_dir = data_dir
+        self.format = fmt
+        # Passed on to compute_stats by the stages (see sample_data.spill).
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.column_cache = ColumnCache(data_dir / CACHE_DIR_NAME) if column_cache else None
+        self.collections: Dict[str, List[Any]] = {}
+        self.dirty: Set[str] = set()
+        self.journal = ChangeJournal(data_dir)
+        # Changes recorded since the last flush (or since a stage consumed them).
+        self.changes: List[Change] = []
+        # Set by a stage that has brought the user-counter snapshot up to date.
+        self.snapshot: Optional[UserStatsSnapshot] = None
+        self._references: Optional[ReferenceIndex] = None
+        self.delta_dir = delta_dir
+        # Per loaded collection, a digest of each document as read (delta mode only).
+        self._digests: Dict[str, Digests] = {}
+        # (collection, upserts, deletes) in the delta written by the last flush.
+        self.delta_summary: List[Tuple[str, int, int]] = []
+
+    def path(self, name: str) -> Path:
+        return self.data_dir / COLLECTION_FILES[name]
+
+    def load(self, name: str) -> List[Any]:
+        """The collection as a list of records, read from disk on first use."""
+        docs = self.collections.get(name)
+        if docs is None:
+            docs = self.collections[name] = load_records(self.path(name), RECORD_TYPES[name])
+            if self.delta_dir is not None:
+                self._digests[name] = document_digests(docs)
+        return docs
+
+    def iter(self, name: str) -> Iterator[Any]:
+        """Read-only pass over a collection without materialising it if not loaded yet."""
+        docs = self.collections.get(name)
+        if docs is not None:
+            return iter(docs)
+        return iter_documents(self.path(name), compact=True)
+
+    def source(self, name: str) -> Union[Iterator[Any], ColumnSet]:
+        """What to hand compute_stats for ``name``: its cached columns if it is not loaded."""
+        if self.column_cache is not None and name not in self.collections:
+            columns = self.column_cache.columns(self.path(name))
+            if columns is not None:
+                return columns
+        return self.iter(name)
+
+    def references(self) -> ReferenceIndex:
+        """The reference index of the files on disk; unflushed changes are not in it."""
+        if self._references is None:
+            self._references = ReferenceIndex(self.data_dir)
+        return self._references
+
+    def mark_dirty(self, *names: str) -> None:
+        for name in names:
+            if name not in self.collections:
+                raise KeyError(f"{name} was never loaded, so there is nothing to write")
+            self.dirty.add(name)
+
+    def record_changes(
+        self, name: str, op: str, docs: Iterable[Any], fields: Optional[Sequence[str]] = None
+    ) -> None:
+        """Note that ``docs`` of collection ``name`` were inserted or updated, and mark it dirty.
+
+        ``fields`` lists the top-level fields an update touched (default: any).
+        """
+        ids = [oid for oid in (oid_value(doc.get("_id")) for doc in docs) if oid is not None]
+        self.mark_dirty(name)
+        # Kept even without ids: the journal entry vouches for the rewritten file.
+        self.changes.append(Change(name, op, ids, None if fields is None else list(fields)))
+
+    def take_changes(self) -> List[Change]:
+        """Journalled changes followed by this run's, which the caller now accounts for."""
+        pending, self.changes = self.changes, []
+        return self.journal.read() + pending
+
+    def flush(self, workers: Optional[int] = None) -> Optional[PersistReport]:
+        """Write every dirty collection once, then journal the recorded changes.
+
+        Returns ``None`` if no collection changed.
+        """
+        report = None
+        names: List[str] = []
+        if self.dirty:
+            # COLLECTION_FILES order keeps the report stable across runs.
+            names = [name for name in COLLECTION_FILES if name in self.dirty]
+            jobs = [(self.path(name), self.collections[name]) for name in names]
+            report = persist_collections(jobs, self.format, workers)
+            self.dirty.clear()
+            if self.delta_dir is not None:
+                deltas = {name: diff_collection(self.collections[name], self._digests[name]) for name in names}
+                self.delta_summary = write_delta(self.delta_dir, deltas)
+                for name in names:
+                    self._digests[name] = document_digests(self.collections[name])
+
+        for change in self.changes:
+            change.file = fingerprint(self.path(change.collection))
+        if self.snapshot is not None:
+            # Journal first: if the snapshot write is then lost, the files no
+            # longer match the old snapshot and the next recompute starts over.
+            self.journal.replace(self.changes)
+            self.snapshot.files = {name: fingerprint(self.path(name)) for name in COLLECTION_FILES}
+            self.snapshot.save(self.data_dir)
+            self.snapshot = None
+        else:
+            self.journal.append(self.changes)
+        self.changes = []
+
+        if report is not None:
+            # Only collections indexed before are kept up to date; appends are
+            # indexed incrementally, rewrites from scratch.
+            index = self._references or open_index(self.data_dir)
+            if index is not None:
+                for name in names:
+                    if name in index.indexed():
+                        index.refresh(name)
+        return report
+
+
+Stage = Callable[[FixtureState], None]
+
+
+def run_stages(stages: Sequence[Tuple[str, Stage]], state: FixtureState, workers: Optional[int] = None) -> None:
+    """Run ``stages`` in order over ``state``, then write what they changed."""
+    for name, stage in stages:
+        if len(stages) > 1:
+            print(f"== {name}")
+        stage(state)
+    report = state.flush(workers)
+    if report is None:
+        print("No collections changed.")
+        return
+    count = len(report.written)
+    print(f"Wrote {count} collection{'s' if count != 1 else ''} to {state.data_dir}:")
+    for line in report.lines():
+        print(line)
+    if state.delta_dir is not None:
+        if not state.delta_summary:
+            print(f"Delta in {state.delta_dir} unchanged: no document differs from what was loaded.")
+            return
+        print(f"Updated the delta in {state.delta_dir}:")
+        for name, upserts, deletes in state.delta_summary:
+            print(f"  {name:<44}{upserts:>9,} upserts {deletes:>9,} deletes")
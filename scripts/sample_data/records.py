@@ -0,0 +1,178 @@
+"""Slotted record types for the fixture collections the scripts rewrite.
+
+A loaded or generated document is otherwise a dict with 10-40 keys, each one
+paying for a hash table sized for growth. :class:`Record` subclasses store the
+known top-level fields in ``__slots__`` instead and remember the key order in a
+tuple shared by every document with the same layout, so a pin costs one small
+object plus its values. Unknown keys go to a per-record ``_extra`` dict.
+
+Records behave as mutable mappings (``pin["replyCount"] = 3``,
+``pin.get("stats")``, ``pin.setdefault(...)``), so code written against the
+dict form keeps working, and :func:`sample_data.codec.encode` writes them out
+with the same keys in the same order as the document they came from.
+"""
+from __future__ import annotations
+
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, ClassVar, Dict, FrozenSet, Iterator, List, Optional, Tuple, Type, TypeVar
+
+from .codec import register_record
+from .jsonstream import iter_documents
+
+R = TypeVar("R", bound="Record")
+Layout = Tuple[str, ...]
+
+
+class Record(MutableMapping):
+    __slots__ = ("_layout", "_extra")
+
+    COLLECTION: ClassVar[str] = ""
+    FIELDS: ClassVar[FrozenSet[str]] = frozenset()
+    _layouts: ClassVar[Dict[Layout, Layout]]
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.FIELDS = frozenset(cls.__dict__.get("__slots__", ()))
+        cls._layouts = {}
+        register_record(cls)
+
+    def __init__(self, /, **fields: Any) -> None:
+        self._extra: Optional[Dict[str, Any]] = None
+        known = self.FIELDS
+        for key, value in fields.items():
+            if key in known:
+                object.__setattr__(self, key, value)
+            else:
+                if self._extra is None:
+                    self._extra = {}
+                self._extra[key] = value
+        self._layout = self._intern(tuple(fields))
+
+    @classmethod
+    def _intern(cls, layout: Layout) -> Layout:
+        return cls._layouts.setdefault(layout, layout)
+
+    @classmethod
+    def from_document(cls: Type[R], doc: Dict[str, Any]) -> R:
+        return cls(**doc)
+
+    def to_document(self) -> Dict[str, Any]:
+        """Plain dict with the record's keys in their original order."""
+        return dict(self.pairs())
+
+    def pairs(self) -> Iterator[Tuple[str, Any]]:
+        """``(key, value)`` in layout order; faster than ``items()``."""
+        known = self.FIELDS
+        for key in self._layout:
+            yield key, getattr(self, key) if key in known else self._extra[key]  # type: ignore[index]
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self:
+            self._layout = self._intern(self._layout + (key,))
+        if key in self.FIELDS:
+            object.__setattr__(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+        if key in self.FIELDS:
+            object.__delattr__(self, key)
+        else:
+            del self._extra[key]  # type: ignore[union-attr]
+        self._layout = self._intern(tuple(k for k in self._layout if k != key))
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._layout
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout)
+
+    def __len__(self) -> int:
+        return len(self._layout)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_document()!r})"
+
+
+class User(Record):
+    COLLECTION = "users"
+    __slots__ = (
+        "_id", "username", "displayName", "email", "bio", "avatar", "banner", "roles", "accountStatus",
+        "preferences", "stats", "relationships", "primaryLocationId", "pinnedPinIds", "ownedPinIds",
+        "bookmarkCollectionIds", "proximityChatRoomIds", "recentLocationIds", "createdAt", "updatedAt",
+        "firebaseUid",
+    )
+
+
+class Pin(Record):
+    COLLECTION = "pins"
+    __slots__ = (
+        "_id", "type", "creatorId", "title", "description", "coordinates", "address", "approximateAddress",
+        "proximityRadiusMeters", "photos", "coverPhoto", "tagIds", "tags", "options", "relatedPinIds",
+        "linkedLocationId", "linkedChatRoomId", "visibility", "isActive", "attendingUserIds",
+        "attendeeWaitlistIds", "attendable", "participantLimit", "participantCount", "autoDelete", "startDate",
+        "endDate", "stats", "bookmarkCount", "replyCount", "descriptionHasMarkdown", "createdAt", "updatedAt",
+        "expiresAt", "replyLimit",
+    )
+
+
+class Reply(Record):
+    COLLECTION = "replies"
+    __slots__ = (
+        "_id", "pinId", "parentReplyId", "authorId", "message", "attachments", "reactions", "mentionedUserIds",
+        "audit", "createdAt", "updatedAt",
+    )
+
+
+class Bookmark(Record):
+    COLLECTION = "bookmarks"
+    __slots__ = (
+        "_id", "userId", "pinId", "collectionId", "notes", "reminderAt", "tagIds", "audit", "createdAt",
+        "updatedAt",
+    )
+
+
+class ChatMessage(Record):
+    COLLECTION = "proximityChatMessages"
+    __slots__ = (
+        "_id", "roomId", "pinId", "authorId", "replyToMessageId", "message", "coordinates", "attachments",
+        "audit", "createdAt", "updatedAt", "author", "authorAvatar",
+    )
+
+
+class ChatPresence(Record):
+    COLLECTION = "proximityChatPresence"
+    __slots__ = ("_id", "roomId", "userId", "sessionId", "joinedAt", "lastActiveAt")
+
+
+class ChatRoom(Record):
+    COLLECTION = "proximityChatRooms"
+    __slots__ = (
+        "_id", "ownerId", "name", "description", "coordinates", "radiusMeters", "participantCount",
+        "participantIds", "moderatorIds", "audit", "createdAt", "updatedAt",
+    )
+
+
+RECORD_TYPES: Dict[str, Type[Record]] = {
+    cls.COLLECTION: cls for cls in (User, Pin, Reply, Bookmark, ChatMessage, ChatPresence, ChatRoom)
+}
+
+
+def load_records(path: Path, record: Type[R]) -> List[R]:
+    """Load ``path`` in compact form with every document as a ``record``."""
+    return [record.from_document(doc) for doc in iter_documents(path, compact=True)]
@@ -0,0 +1,343 @@
+"""Persisted cross-collection reference index of the fixture files.
+
+``.ref-index/`` next to the fixtures records, for each indexed collection and
+by ordinal (a document's position in its file), in files named after the
+collection and a generation that changes with every rebuild:
+
+* ``.ids``: the document's ``_id``, 12 bytes (zeros when it has none);
+* ``.offsets``: where the document starts in the file, as a ``uint64``
+  (only for uncompressed files);
+* ``.<field>.refs``: the id in each :data:`REFERENCE_FIELDS` field
+  (``pinId``, ``authorId``, ``roomId``, ...), 12 bytes per document.
+
+From those :class:`ReferenceIndex` answers "where is the document with this
+id" (:meth:`~ReferenceIndex.ordinal`) and "which replies point at this pin"
+(:meth:`~ReferenceIndex.referrers`) with dict lookups built from the arrays,
+and reads just those documents back by offset (:meth:`~ReferenceIndex.documents`)
+instead of parsing the collection.
+
+A collection is (re)indexed the first time it is used after its file changed.
+If the file only gained documents at the end, which is what the generators
+do, the bytes up to the last indexed document still hash the same and only
+the new documents are scanned and appended. Anything else re-indexes the
+collection from scratch. ``index.json`` is replaced last, so an interrupted
+update leaves the previous index in force.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import uuid
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .codec import ObjectId, oid_value
+from .collections import COLLECTION_FILES, existing_variant
+from .journal import Fingerprint, fingerprint
+from .jsonstream import iter_documents, iter_offsets, read_document
+from .output import write_text_atomic
+
+INDEX_DIR_NAME = ".ref-index"
+INDEX_VERSION = 1
+
+# Reference fields indexed per collection; each gives the reverse edges
+# target -> referring documents (pin -> replies, room -> messages, ...).
+REFERENCE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "pins": ("creatorId",),
+    "bookmarks": ("pinId", "userId"),
+    "replies": ("pinId", "authorId"),
+    "proximityChatMessages": ("roomId", "authorId"),
+    "proximityChatPresence": ("roomId", "userId"),
+}
+
+_OID_BYTES = 12
+_NO_OID = bytes(_OID_BYTES)
+_HASH_CHUNK = 1 << 20
+_MANIFEST_NAME = "index.json"
+
+
+def _oid_bytes(value: Any) -> bytes:
+    oid = oid_value(value)
+    return _NO_OID if oid is None else bytes(oid)
+
+
+def _hash_range(digest: Any, path: Path, start: int, end: int) -> bool:
+    """Feed bytes ``start:end`` of ``path`` to ``digest``; ``False`` if the file is shorter."""
+    remaining = end - start
+    with path.open("rb") as fh:
+        fh.seek(start)
+        while remaining:
+            chunk = fh.read(min(_HASH_CHUNK, remaining))
+            if not chunk:
+                return False
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return True
+
+
+def _prefix_digest(path: Path, end: int) -> Any:
+    """A SHA-256 object over the first ``end`` bytes of ``path``, ``None`` if it is shorter."""
+    digest = hashlib.sha256()
+    return digest if _hash_range(digest, path, 0, end) else None
+
+
+@dataclass
+class _Scan:
+    """Index rows gathered from (part of) a collection file."""
+
+    ids: List[bytes] = field(default_factory=list)
+    offsets: array = field(default_factory=lambda: array("Q"))
+    refs: Dict[str, List[bytes]] = field(default_factory=dict)
+    end: int = 0
+
+    def add(self, doc: Any, fields: Sequence[str]) -> None:
+        self.ids.append(_oid_bytes(doc.get("_id")))
+        for name in fields:
+            self.refs.setdefault(name, []).append(_oid_bytes(doc.get(name)))
+
+
+def _scan(path: Path, fields: Sequence[str], start: int = 0) -> Tuple[_Scan, bool]:
+    """Rows for the documents of ``path`` from byte ``start`` on, and whether offsets were recorded."""
+    scan = _Scan(refs={name: [] for name in fields}, end=start)
+    if existing_variant(path).suffix == ".gz":
+        for doc in iter_documents(path, compact=True):
+            scan.add(doc, fields)
+        return scan, False
+    for begin, end, doc in iter_offsets(path, start, compact=True):
+        scan.add(doc, fields)
+        scan.offsets.append(begin)
+        scan.end = end
+    return scan, True
+
+
+class IndexedCollection:
+    """The index arrays of one collection, plus lookups built from them on first use."""
+
+    def __init__(self, name: str, ids: bytes, offsets: Optional[array], refs: Dict[str, bytes]) -> None:
+        self.name = name
+        self._ids = ids
+        self.offsets = offsets
+        self._refs = refs
+        self._ordinals: Optional[Dict[ObjectId, int]] = None
+        self._referrers: Dict[str, Dict[ObjectId, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids) // _OID_BYTES
+
+    @staticmethod
+    def _split(raw: bytes) -> List[Optional[ObjectId]]:
+        return [
+            None if raw[i : i + _OID_BYTES] == _NO_OID else ObjectId(raw[i : i + _OID_BYTES])
+            for i in range(0, len(raw), _OID_BYTES)
+        ]
+
+    def ids(self) -> List[Optional[ObjectId]]:
+        """Each document's ``_id`` in file order (``None`` where it has none)."""
+        return self._split(self._ids)
+
+    def ordinals(self) -> Dict[ObjectId, int]:
+        """``_id`` -> ordinal; a repeated id maps to its last document."""
+        if self._ordinals is None:
+            self._ordinals = {oid: row for row, oid in enumerate(self.ids()) if oid is not None}
+        return self._ordinals
+
+    def referrers(self, field: str) -> Dict[ObjectId, List[int]]:
+        """Referenced id -> ordinals of the documents whose ``field`` holds it."""
+        edges = self._referrers.get(field)
+        if edges is None:
+            if field not in self._refs:
+                raise KeyError(f"{self.name}.{field} is not indexed")
+            edges = self._referrers[field] = {}
+            for row, oid in enumerate(self._split(self._refs[field])):
+                if oid is not None:
+                    edges.setdefault(oid, []).append(row)
+        return edges
+
+
+class ReferenceIndex:
+    def __init__(self, data_dir: Path, index_dir: Optional[Path] = None) -> None:
+        self.data_dir = data_dir
+        self.index_dir = index_dir or data_dir / INDEX_DIR_NAME
+        self.manifest = self._read_manifest()
+        self._loaded: Dict[str, IndexedCollection] = {}
+        # What refresh() last did per collection, for reporting.
+        self.actions: Dict[str, str] = {}
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            manifest = json.loads((self.index_dir / _MANIFEST_NAME).read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return {}
+        if manifest.get("version") != INDEX_VERSION:
+            return {}
+        return manifest.get("collections", {})
+
+    def _write_manifest(self) -> None:
+        data = {"version": INDEX_VERSION, "collections": self.manifest}
+        write_text_atomic(self.index_dir / _MANIFEST_NAME, json.dumps(data, indent=2, sort_keys=True) + "\n")
+
+    def path(self, name: str) -> Path:
+        return self.data_dir / COLLECTION_FILES[name]
+
+    def indexed(self) -> List[str]:
+        """Collections that have an index on disk (up to date or not)."""
+        return [name for name in COLLECTION_FILES if name in self.manifest]
+
+    def _file(self, entry: Dict[str, Any], suffix: str) -> Path:
+        return self.index_dir / f"{entry['generation']}{suffix}"
+
+    def _files(self, entry: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Tuple[Path, int]]:
+        """Index file -> (path, bytes per row) for ``entry``."""
+        files = {"ids": (self._file(entry, ".ids"), _OID_BYTES)}
+        if entry["offsets"]:
+            files["offsets"] = (self._file(entry, ".offsets"), 8)
+        for name in fields:
+            files[name] = (self._file(entry, f".{name}.refs"), _OID_BYTES)
+        return files
+
+    @staticmethod
+    def _rows(scan: _Scan, key: str) -> bytes:
+        if key == "ids":
+            return b"".join(scan.ids)
+        if key == "offsets":
+            return scan.offsets.tobytes()
+        return b"".join(scan.refs[key])
+
+    def _entry_valid(self, entry: Dict[str, Any], fields: Sequence[str]) -> bool:
+        if entry.get("fields") != list(fields):
+            return False
+        for path, width in self._files(entry, fields).values():
+            try:
+                if path.stat().st_size < entry["count"] * width:
+                    return False
+            except FileNotFoundError:
+                return False
+        return True
+
+    def refresh(self, name: str) -> str:
+        """Bring ``name``'s index in line with its file: ``"unchanged"``, ``"appended N"`` or ``"rebuilt"``."""
+        path = self.path(name)
+        fields = REFERENCE_FIELDS.get(name, ())
+        current = fingerprint(path)
+        entry = self.manifest.get(name)
+        if entry is not None and not self._entry_valid(entry, fields):
+            entry = None
+        if current is None:
+            action = "missing"
+            if entry is not None:
+                self._drop(name)
+        elif entry is not None and entry["file"] == current:
+            action = "unchanged"
+        else:
+            prefix = None
+            if entry is not None and entry["offsets"] and entry["file"]["file"] == current["file"]:
+                prefix = _prefix_digest(existing_variant(path), entry["end"])
+            if prefix is not None and prefix.hexdigest() == entry["prefix"]:
+                action = self._append(name, entry, fields, current, prefix)
+            else:
+                self._rebuild(name, fields, current)
+                action = "rebuilt"
+        self._loaded.pop(name, None)
+        self.actions[name] = action
+        return action
+
+    def _append(
+        self, name: str, entry: Dict[str, Any], fields: Sequence[str], current: Fingerprint, prefix: Any
+    ) -> str:
+        scan, _ = _scan(self.path(name), fields, entry["end"])
+        for key, (file_path, width) in self._files(entry, fields).items():
+            with file_path.open("r+b") as fh:
+                # Anything past ``count`` rows is left over from an interrupted update.
+                fh.seek(entry["count"] * width)
+                fh.write(self._rows(scan, key))
+                fh.truncate()
+        if scan.ids:
+            _hash_range(prefix, existing_variant(self.path(name)), entry["end"], scan.end)
+            entry["prefix"] = prefix.hexdigest()
+            entry["end"] = scan.end
+        entry["count"] += len(scan.ids)
+        entry["file"] = current
+        self._write_manifest()
+        return f"appended {len(scan.ids)}"
+
+    def _rebuild(self, name: str, fields: Sequence[str], current: Fingerprint) -> None:
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        scan, offsets = _scan(self.path(name), fields)
+        prefix = _prefix_digest(existing_variant(self.path(name)), scan.end) if offsets else None
+        entry = {
+            # A fresh file set per rebuild; the manifest switches to it atomically.
+            "generation": f"{name}-{uuid.uuid4().hex[:12]}",
+            "file": current,
+            "fields": list(fields),
+            "count": len(scan.ids),
+            "offsets": offsets,
+            "end": scan.end,
+            "prefix": prefix and prefix.hexdigest(),
+        }
+        for key, (file_path, _) in self._files(entry, fields).items():
+            file_path.write_bytes(self._rows(scan, key))
+        self.manifest[name] = entry
+        self._write_manifest()
+        self._remove_files(name, keep=entry["generation"])
+
+    def _drop(self, name: str) -> None:
+        del self.manifest[name]
+        self._write_manifest()
+        self._remove_files(name)
+
+    def _remove_files(self, name: str, keep: Optional[str] = None) -> None:
+        for stale in self.index_dir.glob(f"{name}-*"):
+            if keep is None or not stale.name.startswith(keep + "."):
+                stale.unlink(missing_ok=True)
+
+    def collection(self, name: str) -> IndexedCollection:
+        """The up-to-date index of ``name``, refreshed first if its file changed."""
+        loaded = self._loaded.get(name)
+        if loaded is not None:
+            return loaded
+        if self.refresh(name) == "missing":
+            raise FileNotFoundError(f"{self.path(name)}: no such collection file")
+        entry = self.manifest[name]
+        fields = REFERENCE_FIELDS.get(name, ())
+        files = self._files(entry, fields)
+        count = entry["count"]
+
+        def read(key: str) -> bytes:
+            file_path, width = files[key]
+            with file_path.open("rb") as fh:
+                return fh.read(count * width)
+
+        offsets = None
+        if entry["offsets"]:
+            offsets = array("Q")
+            offsets.frombytes(read("offsets"))
+        loaded = IndexedCollection(name, read("ids"), offsets, {key: read(key) for key in fields})
+        self._loaded[name] = loaded
+        return loaded
+
+    def ordinal(self, name: str, oid: Any) -> Optional[int]:
+        return self.collection(name).ordinals().get(oid_value(oid))
+
+    def referrers(self, name: str, field: str, oid: Any) -> List[int]:
+        """Ordinals of the ``name`` documents whose ``field`` is ``oid`` (e.g. replies of a pin)."""
+        return self.collection(name).referrers(field).get(oid_value(oid), [])
+
+    def documents(self, name: str, ordinals: Iterable[int]) -> List[Any]:
+        """The documents at ``ordinals``, read by offset when the file is uncompressed."""
+        wanted = list(ordinals)
+        indexed = self.collection(name)
+        path = self.path(name)
+        if indexed.offsets is not None:
+            return [read_document(path, indexed.offsets[row], compact=True) for row in wanted]
+        rows = set(wanted)
+        found = {row: doc for row, doc in enumerate(iter_documents(path, compact=True)) if row in rows}
+        return [found[row] for row in wanted]
+
+
+def open_index(data_dir: Path) -> Optional[ReferenceIndex]:
+    """The index of ``data_dir`` if one was ever built there, else ``None``."""
+    if not (data_dir / INDEX_DIR_NAME / _MANIFEST_NAME).exists():
+        return None
+    return ReferenceIndex(data_dir)
@@ -0,0 +1,264 @@
+"""Heavy-tailed reply counts and threaded reply trees, drawn in batches.
+
+Reply counts per pin follow a Lomax (shifted Pareto) distribution with shape
+``tail`` and median ``median``: most pins get a handful of replies and a few
+get thousands. A count never exceeds the pin's limit -- its ``replyLimit`` for
+a discussion, ``max_replies`` otherwise.
+
+Within a pin, reply ``k`` (in time order) answers an earlier reply with
+probability ``reply_share`` and is top-level otherwise. The reply it answers
+lies a geometric number of replies back, ``recency`` on average: ``1`` makes
+every answer go to the reply just before it (deep chains), larger values
+spread answers over the thread (bushy trees). A reply that would sit deeper
+than ``max_depth`` (top level being 1) answers its ancestor at depth
+``max_depth - 1`` instead.
+
+Authors of event replies are drawn from the pin's author pool (its attendees),
+other replies from every user. Reply times are sorted uniform draws over the
+first ``window_days`` after the pin, squared so that threads are busiest
+early.
+
+Every draw is a SplitMix64 output keyed by the pin (counts) or by
+``(pin, k)`` (replies), as in :mod:`sample_data.hotspots`, so a pin's replies
+do not depend on the other pins of its batch. :meth:`ReplyTrees.build` draws a
+whole batch of pins with NumPy and caps depths by binary lifting over the
+batch; without NumPy the same values are computed one pin at a time.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, List, NamedTuple, Sequence
+
+from .counter_rng import MASK64, keyed_uniform, keyed_uniforms
+from .sharding import derive_seed
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+# Replies per pin fit in the low bits of a reply's draw index.
+REPLY_BITS = 16
+MAX_REPLIES = (1 << REPLY_BITS) - 1
+# Uniforms drawn per reply: thread coin, distance back, author, time.
+DRAWS = 4
+DAY_SECONDS = 86400
+
+
+@dataclass
+class ReplyTreeConfig:
+    median: float = 3.0
+    # Lomax shape; smaller is heavier-tailed (below 1 the uncapped mean is infinite).
+    tail: float = 1.2
+    # Cap for pins without a replyLimit.
+    max_replies: int = 5000
+    # Share of replies (after the first) answering an earlier reply.
+    reply_share: float = 0.6
+    # Mean distance, in replies, back to the reply answered.
+    recency: float = 3.0
+    max_depth: int = 6
+    window_days: float = 30.0
+    seed: int = 99
+
+    def validate(self) -> None:
+        if self.median < 0:
+            raise ValueError("median replies must be non-negative")
+        if self.tail <= 0:
+            raise ValueError("reply tail must be positive")
+        if not 0 <= self.max_replies <= MAX_REPLIES:
+            raise ValueError(f"max replies must be between 0 and {MAX_REPLIES}")
+        if not 0.0 <= self.reply_share <= 1.0:
+            raise ValueError("reply share must be between 0 and 1")
+        if self.recency < 1:
+            raise ValueError("reply recency must be at least 1")
+        if self.max_depth < 1:
+            raise ValueError("reply depth must be at least 1")
+        if self.window_days <= 0:
+            raise ValueError("reply window must be positive")
+
+
+class ReplyBatch(NamedTuple):
+    """Replies of a batch of pins, pin by pin and in time order within a pin.
+
+    ``starts[i]:starts[i + 1]`` are the replies of the batch's pin ``i``;
+    ``parent`` holds batch positions (``-1`` for top-level replies) and
+    ``author`` user indexes. NumPy arrays with NumPy, lists without.
+    """
+
+    starts: Any
+    position: Any
+    parent: Any
+    depth: Any
+    author: Any
+    offset: Any
+
+    def __len__(self) -> int:
+        return int(self.starts[-1])
+
+    def lists(self) -> "ReplyBatch":
+        """The batch with plain lists, which index faster one item at a time."""
+        return ReplyBatch(*(field if isinstance(field, list) else field.tolist() for field in self))
+
+
+def _uniform(key: int, index: int, draw: int) -> float:
+    return keyed_uniform(key, index * DRAWS + draw + 1)
+
+
+def _uniforms_np(key: int, indexes: Any, draw: int) -> Any:
+    return keyed_uniforms(key, indexes.astype(np.uint64) * np.uint64(DRAWS) + np.uint64(draw + 1))
+
+
+class ReplyTrees:
+    """Draws reply counts and trees for ``config``; see the module docstring."""
+
+    def __init__(self, config: ReplyTreeConfig) -> None:
+        config.validate()
+        self.config = config
+        self.count_key = derive_seed(config.seed, "reply-counts", 0) & MASK64
+        self.reply_key = derive_seed(config.seed, "reply-trees", 0) & MASK64
+        # Lomax scale that puts the median at config.median.
+        self.scale = config.median / (2 ** (1 / config.tail) - 1)
+        # log(1 - 1/recency): geometric distance back (0 for recency 1, always one back).
+        self.log_stay = math.log(1 - 1 / config.recency) if config.recency > 1 else 0.0
+        self.window = config.window_days * DAY_SECONDS
+
+    def _limit(self, limit: int) -> int:
+        return min(limit, MAX_REPLIES) if limit > 0 else self.config.max_replies
+
+    def count(self, pin: int, limit: int = 0) -> int:
+        """Replies for pin key ``pin`` with reply limit ``limit`` (``0``: none)."""
+        cap = self._limit(limit)
+        u = _uniform(self.count_key, pin, 0)
+        return math.floor(min(self.scale * ((1.0 - u) ** (-1 / self.config.tail) - 1.0), cap) + 0.5) if cap else 0
+
+    def counts(self, pins: Sequence[int], limits: Sequence[int]) -> Any:
+        """:meth:`count` for every pin, as an ``int64`` array (a list without NumPy)."""
+        if np is None:
+            return [self.count(pin, limit) for pin, limit in zip(pins, limits)]
+        limits = np.asarray(limits, dtype=np.int64)
+        caps = np.where(limits > 0, np.minimum(limits, MAX_REPLIES), self.config.max_replies).astype(np.float64)
+        u = _uniforms_np(self.count_key, np.asarray(pins, dtype=np.uint64), 0)
+        with np.errstate(over="ignore"):
+            drawn = self.scale * (np.power(1.0 - u, -1 / self.config.tail) - 1.0)
+        return np.floor(np.minimum(drawn, caps) + 0.5).astype(np.int64)
+
+    def _distance_back(self, u: float) -> int:
+        return 1 + int(math.log(1.0 - u) / self.log_stay) if self.log_stay else 1
+
+    def build(
+        self, pins: Sequence[int], counts: Sequence[int], pools: Sequence[Sequence[int]], users: int
+    ) -> ReplyBatch:
+        """Replies of pin keys ``pins``, ``counts[i]`` for pin ``i``.
+
+        Authors of pin ``i`` come from ``pools[i]``, or from ``range(users)``
+        when that pool is empty.
+        """
+        if np is None:
+            return self._build_py(pins, counts, pools, users)
+        cfg = self.config
+        pins = np.asarray(pins, dtype=np.uint64)
+        counts = np.asarray(counts, dtype=np.int64)
+        starts = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+        total = int(starts[-1])
+        pin_of = np.repeat(np.arange(len(counts)), counts)
+        position = np.arange(total, dtype=np.int64) - starts[pin_of]
+        index = (pins[pin_of] << np.uint64(REPLY_BITS)) | position.astype(np.uint64)
+
+        threaded = (position > 0) & (_uniforms_np(self.reply_key, index, 0) < cfg.reply_share)
+        if self.log_stay:
+            back = 1 + (np.log(1.0 - _uniforms_np(self.reply_key, index, 1)) / self.log_stay).astype(np.int64)
+        else:
+            back = np.ones(total, dtype=np.int64)
+        parent = np.where(threaded, starts[pin_of] + np.maximum(position - back, 0), -1)
+        parent, depth = _cap_depth(parent, cfg.max_depth)
+
+        sizes = np.array([len(pool) for pool in pools], dtype=np.int64)
+        pool_starts = np.zeros(len(pools) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=pool_starts[1:])
+        flat = np.fromiter((uid for pool in pools for uid in pool), dtype=np.int64, count=int(pool_starts[-1]))
+        u = _uniforms_np(self.reply_key, index, 2)
+        size = sizes[pin_of]
+        author = (u * users).astype(np.int64)
+        pooled = size > 0
+        author[pooled] = flat[pool_starts[pin_of[pooled]] + (u[pooled] * size[pooled]).astype(np.int64)]
+
+        # Sorted within each pin, so position k gets the k-th earliest time.
+        late = _uniforms_np(self.reply_key, index, 3)
+        times = self.window * (late * late)
+        offset = times[np.lexsort((times, pin_of))]
+        return ReplyBatch(starts, position, parent, depth, author, offset)
+
+    def _build_py(
+        self, pins: Sequence[int], counts: Sequence[int], pools: Sequence[Sequence[int]], users: int
+    ) -> ReplyBatch:
+        cfg = self.config
+        key = self.reply_key
+        starts: List[int] = [0]
+        position: List[int] = []
+        parent: List[int] = []
+        depth: List[int] = []
+        author: List[int] = []
+        offset: List[float] = []
+        for pin, n, pool in zip(pins, counts, pools):
+            first = starts[-1]
+            times = []
+            for k in range(n):
+                index = pin << REPLY_BITS | k
+                up = -1
+                if k > 0 and _uniform(key, index, 0) < cfg.reply_share:
+                    up = first + max(k - self._distance_back(_uniform(key, index, 1)), 0)
+                    # Parents are already capped, so one step up suffices.
+                    if depth[up] >= cfg.max_depth:
+                        up = parent[up]
+                position.append(k)
+                parent.append(up)
+                depth.append(depth[up] + 1 if up >= 0 else 1)
+                u = _uniform(key, index, 2)
+                author.append(pool[int(u * len(pool))] if pool else int(u * users))
+                late = _uniform(key, index, 3)
+                times.append(self.window * (late * late))
+            offset.extend(sorted(times))
+            starts.append(first + n)
+        return ReplyBatch(starts, position, parent, depth, author, offset)
+
+
+def _cap_depth(parent: Any, max_depth: int) -> Any:
+    """Depths of a forest given by ``parent`` (``-1`` at roots), re-parenting
+    nodes deeper than ``max_depth`` to their ancestor at ``max_depth - 1``.
+
+    Parents precede their children, as the module's draws guarantee. Returns
+    ``(parent, depth)`` as new arrays.
+    """
+    n = len(parent)
+    # Node n stands for "no parent" and is its own parent.
+    up = np.where(parent >= 0, parent, n)
+    up = np.append(up, n)
+    # Pointer jumping: distance from each node to the root sentinel.
+    jump, dist = up.copy(), (up != n).astype(np.int64)
+    dist[n] = 0
+    while True:
+        live = np.flatnonzero(jump != n)
+        if not len(live):
+            break
+        targets = jump[live]
+        dist[live] += dist[targets]
+        jump[live] = jump[targets]
+    depth = dist[:n] + 1
+    deep = np.flatnonzero(depth > max_depth)
+    parent = parent.copy()
+    if len(deep):
+        # Binary lifting: walk each deep node up to its ancestor at max_depth - 1.
+        steps = depth[deep] - (max_depth - 1)
+        node = deep.copy()
+        ancestor = up
+        bit = 0
+        while (steps >> bit).any():
+            take = ((steps >> bit) & 1).astype(bool)
+            node[take] = ancestor[node[take]]
+            ancestor = ancestor[ancestor]
+            bit += 1
+        parent[deep] = np.where(node == n, -1, node)
+        depth[deep] = max_depth
+    return parent, depth
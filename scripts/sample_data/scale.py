@@ -0,0 +1,895 @@
+"""Generate load-test fixtures with caller-chosen cardinalities.
+
+Unlike ``augment_sample_data.main``, which grows the hand-made dataset in
+place, this builds every collection from scratch and streams each document
+straight to disk. Object ids are derived from (collection, index), so
+references never require holding earlier documents; the only state that grows
+with the dataset is a handful of compact per-user and per-room counter arrays.
+
+Every document is a pure function of ``(seed, collection, index)``: it draws
+from its own :class:`~sample_data.counter_rng.CounterRandom`, so
+:class:`ScaledDataset` can expose each collection as a lazy sequence
+(``dataset.pins[734512]``, ``dataset.replies_for_pin(734512)``, slices) without
+generating anything else. Only users and rooms carry aggregate counters, which
+need one pass over the plans of the other collections.
+
+For full runs, pins (with their replies and bookmarks), chat messages and
+presence records are produced in shards on a process pool. Each shard writes an
+array fragment and the fragments are stitched together in index order, so the
+output is byte-identical for any ``--workers`` or ``--shard-size`` value.
+
+With ``reply_tail`` set, reply counts per pin are heavy-tailed and replies are
+threaded (see :mod:`sample_data.replytree`). Replies are then addressed by
+``(pin, k)``: their ids carry ``pin << REPLY_BITS | k`` as the index, and
+``replies_for_pin`` is the only way to reach them without a full run.
+
+With ``vocabulary`` set, message, reply and pin description text comes from
+:class:`~sample_data.corpus.TextEngine` instead of ``gibberish()``.
+
+Chat rooms form a grid of overlapping circles (:func:`room_center`). A message
+is posted from a point inside its room's circle, and each shard of pins is
+matched against the grid with :class:`~sample_data.geo.RoomIndex` to set its
+``linkedChatRoomId``, as ``augment_sample_data.py`` does for the checked-in set.
+
+With ``chat_days`` set, chat messages and presence come from a
+:class:`~sample_data.traffic.TrafficSimulator` run over that many days instead.
+The simulation is sequential; it runs as one more task next to the pin shards
+and streams both collections straight to their files.
+"""
+from __future__ import annotations
+
+import math
+import shutil
+import tempfile
+import time
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from . import payloads
+from .collections import COLLECTION_FILES, DEFAULT_FORMAT, format_path
+from .codec import ObjectId
+from .counter_rng import CounterRandom, doc_rng
+from .geo import RoomIndex
+from .hotspots import DEGREES_PER_METER, HotspotConfig, HotspotField
+from .lazy import LazyCollection
+from .oids import COUNTER_BITS, COUNTER_MASK, compose_oid
+from .corpus import TextConfig, TextEngine
+from .output import DocumentWriter, merge_fragments
+from .replytree import REPLY_BITS, ReplyBatch, ReplyTreeConfig, ReplyTrees
+from .sharding import default_workers, derive_seed, run_tasks, shard_ranges
+from .traffic import TrafficConfig, TrafficReport, TrafficSimulator
+
+# Leading four bytes of every generated id (2026-10-20T00:00:00Z) followed by a
+# two-byte collection tag and a six-byte index.
+GENERATED_EPOCH = 0x6AD6AF00
+COLLECTION_TAGS = {
+    "users": 0x01,
+    "pins": 0x02,
+    "replies": 0x03,
+    "bookmarks": 0x04,
+    "proximityChatMessages": 0x05,
+    "proximityChatPresence": 0x06,
+    "proximityChatRooms": 0x07,
+    "sessions": 0x08,
+}
+MAX_INDEX = 1 << 48
+
+BASE_START = datetime(2026, 3, 1, 17, 0, tzinfo=timezone.utc)
+CHAT_START = datetime(2026, 10, 21, 18, 0, tzinfo=timezone.utc)
+REPLY_WINDOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+BOOKMARK_WINDOW = datetime(2026, 7, 1, tzinfo=timezone.utc)
+ROOM_CREATED = datetime(2026, 10, 20, tzinfo=timezone.utc)
+USER_CREATED = datetime(2026, 8, 15, tzinfo=timezone.utc)
+YEAR_SECONDS = 365 * 24 * 3600
+GRID_SPACING_MILES = 2
+ROOM_RADIUS_METERS = 2600
+
+EVENT_TITLE_PARTS = (
+    ["Neon", "Sunset", "Retro", "Velocity", "Lagoon", "Cosmic"],
+    ["Kayak", "Trail", "Dive", "Dirt", "Scuba", "Board", "Drone"],
+    ["Sprint", "Mixer", "Derby", "Carnival", "Showcase", "Symposium"],
+)
+DISCUSSION_TITLE_PARTS = (
+    ["Quiet", "Chaotic", "Lo-Fi", "Skyline", "Mesa", "Quantum"],
+    ["Signal", "Thread", "Camp", "Desk", "Idea", "Patch"],
+    ["Circle", "Lab", "Club", "Forum", "Bazaar", "Pocket"],
+)
+ATTACHMENTS_POOL = [
+    "/images/discussion/discussion-05",
+    "/images/event/event-12",
+    "/images/discussion/discussion-33",
+    "/images/event/event-27",
+]
+LINKED_LOCATION = "68e061721329566a22d474c2"
+
+
+def scaled_oid(collection: str, index: int) -> ObjectId:
+    if not 0 <= index < MAX_INDEX:
+        raise ValueError(f"{collection} index {index} does not fit in a generated ObjectId")
+    # Same 4 + 5 + 3 byte layout as ObjectIdFactory: the collection tag leads
+    # the process field and indexes past 2**24 spill from the counter into it.
+    process = (COLLECTION_TAGS[collection] << COUNTER_BITS) | (index >> COUNTER_BITS)
+    return compose_oid(GENERATED_EPOCH, process, index & COUNTER_MASK)
+
+
+def _title_pool(parts: tuple) -> List[str]:
+    return [f"{p} {s} {suf}" for p in parts[0] for s in parts[1] for suf in parts[2]]
+
+
+EVENT_TITLES = _title_pool(EVENT_TITLE_PARTS)
+DISCUSSION_TITLES = _title_pool(DISCUSSION_TITLE_PARTS)
+
+
+def _coprime_stride(modulus: int) -> int:
+    """Return a stride that visits every residue of ``modulus`` exactly once."""
+    stride = int(modulus * 0.6180339887) | 1
+    while math.gcd(stride, modulus) != 1:
+        stride += 2
+    return stride % modulus or 1
+
+
+@dataclass
+class ScaleConfig:
+    users: int = 1_000
+    pins: int = 1_000
+    replies_per_pin: int = 3
+    bookmarks_per_pin: int = 4
+    messages: int = 1_000
+    presence: int = 1_000
+    rooms: int = 25
+    event_share: float = 0.5
+    seed: int = 42
+    shard_size: int = 5_000
+    # Pin coordinates come from a HotspotField with this many hotspots; 0 keeps random_coordinate.
+    hotspots: int = 0
+    hotspot_background: float = 0.1
+    hotspot_radius: float = 250.0
+    hotspot_radius_sigma: float = 0.5
+    hotspot_density: Optional[float] = None
+    hotspot_skew: float = 1.0
+    # Lomax shape of per-pin reply counts (replies_per_pin is then the median); 0 gives every pin replies_per_pin.
+    reply_tail: float = 0.0
+    max_replies: int = 5000
+    reply_share: float = 0.6
+    reply_recency: float = 3.0
+    reply_depth: int = 6
+    # Size of the Zipfian vocabulary for message, reply and description text; 0 keeps gibberish().
+    vocabulary: int = 0
+    zipf: float = 1.1
+    median_words: float = 8.0
+    words_sigma: float = 0.8
+    max_words: int = 60
+    description_words: float = 30.0
+    # Days of simulated chat traffic; 0 keeps the index-based messages and presence.
+    chat_days: float = 0.0
+    sessions_per_day: float = 1.5
+    session_minutes: float = 15.0
+    messages_per_hour: float = 4.0
+    burst_size: float = 3.0
+    diurnal: float = 0.6
+
+    def hotspot_config(self) -> HotspotConfig:
+        return HotspotConfig(
+            self.hotspots,
+            self.hotspot_background,
+            self.hotspot_radius,
+            self.hotspot_radius_sigma,
+            self.hotspot_density,
+            self.hotspot_skew,
+            self.seed,
+        )
+
+    def reply_tree_config(self) -> ReplyTreeConfig:
+        return ReplyTreeConfig(
+            median=self.replies_per_pin,
+            tail=self.reply_tail,
+            max_replies=self.max_replies,
+            reply_share=self.reply_share,
+            recency=self.reply_recency,
+            max_depth=self.reply_depth,
+            seed=self.seed,
+        )
+
+    def text_config(self, median_words: Optional[float] = None) -> TextConfig:
+        return TextConfig(
+            vocabulary=self.vocabulary,
+            zipf=self.zipf,
+            median_words=self.median_words if median_words is None else median_words,
+            words_sigma=self.words_sigma,
+            max_words=self.max_words,
+            seed=self.seed,
+        )
+
+    def traffic_config(self) -> TrafficConfig:
+        return TrafficConfig(
+            days=self.chat_days,
+            sessions_per_user_day=self.sessions_per_day,
+            session_minutes=self.session_minutes,
+            messages_per_hour=self.messages_per_hour,
+            burst_size=self.burst_size,
+            diurnal=self.diurnal,
+            seed=self.seed,
+        )
+
+    def validate(self) -> None:
+        for name in ("users", "pins", "replies_per_pin", "bookmarks_per_pin", "messages", "presence", "rooms"):
+            if getattr(self, name) < 0:
+                raise ValueError(f"{name} must be non-negative")
+        if self.users < 1:
+            raise ValueError("users must be at least 1")
+        if (self.messages or self.presence) and self.rooms < 1:
+            raise ValueError("messages and presence need at least one room")
+        if self.presence > self.rooms * self.users:
+            raise ValueError(
+                f"presence={self.presence} exceeds the {self.rooms * self.users} unique (roomId, userId) pairs"
+            )
+        if not 0.0 <= self.event_share <= 1.0:
+            raise ValueError("event_share must be between 0 and 1")
+        if self.shard_size < 1:
+            raise ValueError("shard_size must be at least 1")
+        if self.hotspots < 0:
+            raise ValueError("hotspots must be non-negative")
+        if self.hotspots:
+            self.hotspot_config().validate()
+        if self.reply_tail < 0:
+            raise ValueError("reply_tail must be non-negative")
+        if self.reply_tail:
+            if self.pins > 1 << (48 - REPLY_BITS):
+                raise ValueError(f"reply_tail supports at most {1 << (48 - REPLY_BITS)} pins")
+            self.reply_tree_config().validate()
+        if self.vocabulary < 0:
+            raise ValueError("vocabulary must be non-negative")
+        if self.vocabulary:
+            self.text_config().validate()
+            self.text_config(self.description_words).validate()
+        if self.chat_days < 0:
+            raise ValueError("chat_days must be non-negative")
+        if self.chat_days:
+            if self.rooms < 1:
+                raise ValueError("simulated chat traffic needs at least one room")
+            self.traffic_config().validate()
+
+    @property
+    def bookmarks_per_pin_effective(self) -> int:
+        return min(self.bookmarks_per_pin, self.users)
+
+
+@dataclass
+class GenerationReport:
+    counts: Dict[str, int] = field(default_factory=dict)
+    phases: List[tuple] = field(default_factory=list)
+    elapsed: float = 0.0
+    workers: int = 1
+    traffic: Optional[TrafficReport] = None
+
+    def phase(self, label: str, docs: int, seconds: float) -> None:
+        self.phases.append((label, docs, seconds))
+
+    def lines(self) -> List[str]:
+        out = []
+        for name, count in self.counts.items():
+            out.append(f"  {name:<24}{count:>12,}")
+        for label, docs, seconds in self.phases:
+            rate = docs / seconds if seconds else float("inf")
+            out.append(f"  {label:<24}{docs:>12,} docs in {seconds:8.2f}s  ({rate:,.0f} docs/sec)")
+        total = sum(self.counts.values())
+        rate = total / self.elapsed if self.elapsed else float("inf")
+        out.append(
+            f"  {'total':<24}{total:>12,} docs in {self.elapsed:8.2f}s  ({rate:,.0f} docs/sec, {self.workers} workers)"
+        )
+        return out
+
+
+# -- identity helpers ---------------------------------------------------------
+def username(index: int) -> str:
+    return f"loaduser{index}"
+
+
+def avatar(index: int) -> Dict[str, Any]:
+    return payloads.default_avatar(f"/images/profile/profile-{index % 10 + 1:02d}")
+
+
+def grid_side(rooms: int) -> int:
+    return max(1, math.ceil(math.sqrt(rooms)))
+
+
+def room_center(index: int, rooms: int) -> Tuple[float, float]:
+    side = grid_side(rooms)
+    row, col = divmod(index, side)
+    offset = (side - 1) / 2
+    lat0, lon0 = payloads.CSULB_CENTER
+    lat_spacing = GRID_SPACING_MILES / 69
+    lon_spacing = GRID_SPACING_MILES / (69 * math.cos(math.radians(lat0)))
+    return lon0 + (col - offset) * lon_spacing, lat0 + (row - offset) * lat_spacing
+
+
+def room_index(rooms: int) -> RoomIndex:
+    """The circles of the ``rooms`` grid rooms, for placing points in them."""
+    centers = [room_center(idx, rooms) for idx in range(rooms)]
+    return RoomIndex(
+        [scaled_oid("proximityChatRooms", idx) for idx in range(rooms)],
+        [lon for lon, _ in centers],
+        [lat for _, lat in centers],
+        [ROOM_RADIUS_METERS] * rooms,
+    )
+
+
+USER_COUNTERS = ("eventsHosted", "eventsAttended", "posts", "bookmarks")
+DocWithUser = Tuple[Dict[str, Any], int]
+
+
+class PinPlan(NamedTuple):
+    """The draws of a pin that other collections depend on."""
+
+    index: int
+    pin_type: str
+    creator: int
+    attendees: List[int]
+    title: str
+    start_dt: datetime
+    end_dt: Optional[datetime]
+    rng: CounterRandom
+
+
+Thread = Tuple[PinPlan, Dict[str, Any], List[DocWithUser], List[DocWithUser]]
+
+
+class ScaledDataset:
+    """Random-access view of a scaled fixture set.
+
+    ``pins``, ``replies``, ``bookmarks``, ``messages`` and ``presence`` are
+    :class:`LazyCollection` objects whose items are rebuilt on demand.
+    ``users`` and ``rooms`` embed counters aggregated over the whole dataset;
+    those come from :meth:`attach_counters` (the full generator does this) or
+    are computed once, on first access, by :meth:`compute_counters`.
+    """
+
+    def __init__(self, config: ScaleConfig) -> None:
+        config.validate()
+        self.config = config
+        self.replies_per_pin = config.replies_per_pin
+        self.bookmarks_per_pin = config.bookmarks_per_pin_effective
+        self.pairs = config.rooms * config.users
+        self.presence_stride = _coprime_stride(self.pairs) if self.pairs else 1
+        self.presence_start = derive_seed(config.seed, "proximityChatPresence", -1) % max(self.pairs, 1)
+        self.linked_location = payloads.oid_ref(LINKED_LOCATION)
+        self.user_stats: Optional[Dict[str, array]] = None
+        self.room_presence: Optional[array] = None
+        self.pin_field = HotspotField.build(config.hotspot_config(), config.pins) if config.hotspots else None
+        self.reply_trees = ReplyTrees(config.reply_tree_config()) if config.reply_tail else None
+        self.text = TextEngine(config.text_config()) if config.vocabulary else None
+        self.descriptions = TextEngine(config.text_config(config.description_words)) if config.vocabulary else None
+        self.room_index = room_index(config.rooms)
+
+        self.pins = LazyCollection("pins", self.pin, config.pins)
+        # Tree replies are addressed by (pin, k), so the flat view is empty.
+        replies = 0 if self.reply_trees is not None else config.pins * self.replies_per_pin
+        self.replies = LazyCollection("replies", self.reply, replies)
+        self.bookmarks = LazyCollection("bookmarks", self.bookmark, config.pins * self.bookmarks_per_pin)
+        # Simulated chat traffic is not index-addressable, so those views are empty.
+        simulated = bool(config.chat_days)
+        self.messages = LazyCollection("proximityChatMessages", self.message, 0 if simulated else config.messages)
+        self.presence = LazyCollection(
+            "proximityChatPresence", self.presence_record, 0 if simulated else config.presence
+        )
+        self.rooms = LazyCollection("proximityChatRooms", self.room, config.rooms)
+        self.users = LazyCollection("users", self.user, config.users)
+
+    def collection(self, name: str) -> LazyCollection:
+        for candidate in (self.pins, self.replies, self.bookmarks, self.messages, self.presence, self.rooms, self.users):
+            if name == candidate.name or name == candidate.name.replace("proximityChat", "").lower():
+                if candidate is self.replies and self.reply_trees is not None:
+                    raise ValueError("with reply_tail, replies are only reachable through their pin (--children)")
+                return candidate
+        raise KeyError(name)
+
+    def replies_for_pin(self, pin_index: int) -> Sequence[Dict[str, Any]]:
+        if self.reply_trees is not None:
+            return [doc for doc, _ in self.thread(pin_index)[2]]
+        rpp = self.replies_per_pin
+        return self.replies[pin_index * rpp : (pin_index + 1) * rpp]
+
+    def bookmarks_for_pin(self, pin_index: int) -> LazyCollection:
+        bpp = self.bookmarks_per_pin
+        return self.bookmarks[pin_index * bpp : (pin_index + 1) * bpp]
+
+    # -- pins, replies, bookmarks -------------------------------------------
+    def pin_plan(self, idx: int) -> PinPlan:
+        cfg = self.config
+        rng = doc_rng(cfg.seed, "pins", idx)
+        creator = rng.randrange(cfg.users)
+        start_dt = BASE_START + timedelta(seconds=rng.randrange(YEAR_SECONDS))
+        if rng.random() < cfg.event_share:
+            attendees = rng.sample(range(cfg.users), min(rng.randint(5, 6), cfg.users))
+            end_dt = start_dt + timedelta(hours=rng.randint(2, 5))
+            title = f"{EVENT_TITLES[idx % len(EVENT_TITLES)]} #{idx}"
+            return PinPlan(idx, "event", creator, attendees, title, start_dt, end_dt, rng)
+        title = f"{DISCUSSION_TITLES[idx % len(DISCUSSION_TITLES)]} #{idx}"
+        return PinPlan(idx, "discussion", creator, [], title, start_dt, None, rng)
+
+    def _pin_doc(self, plan: PinPlan) -> Dict[str, Any]:
+        rng, idx = plan.rng, plan.index
+        if plan.pin_type == "event":
+            pin = payloads.event_pin_payload(
+                scaled_oid("pins", idx),
+                scaled_oid("users", plan.creator),
+                plan.title,
+                f"/images/event/event-{idx % 50 + 21:02d}",
+                [scaled_oid("users", uid) for uid in plan.attendees],
+                plan.start_dt,
+                plan.end_dt,
+                rng.sample(payloads.EVENT_TAGS, 3),
+                self.linked_location,
+                rng,
+            )
+        else:
+            pin = payloads.discussion_pin_payload(
+                scaled_oid("pins", idx),
+                scaled_oid("users", plan.creator),
+                plan.title,
+                f"/images/discussion/discussion-{idx % 50 + 21:02d}",
+                plan.start_dt,
+                rng.sample(payloads.DISCUSSION_TAGS, 3),
+                self.linked_location,
+                rng,
+            )
+        if self.pin_field is not None:
+            pin["coordinates"]["coordinates"] = self.pin_field.coordinates(idx)
+        if self.descriptions is not None:
+            pin["description"] = self.descriptions.text("descriptions", idx)
+        if self.reply_trees is not None:
+            replies = self.reply_trees.count(idx, pin.get("replyLimit") or 0)
+        else:
+            replies = self.replies_per_pin
+        pin["replyCount"] = pin["stats"]["replyCount"] = replies
+        pin["bookmarkCount"] = pin["stats"]["bookmarkCount"] = self.bookmarks_per_pin
+        return pin
+
+    def _reply_author(self, rng: CounterRandom, plan: PinPlan) -> int:
+        if plan.pin_type == "event":
+            return rng.choice(plan.attendees or [plan.creator])
+        return rng.randrange(self.config.users)
+
+    def _reply_doc(self, idx: int, plan: PinPlan) -> DocWithUser:
+        rng = doc_rng(self.config.seed, "replies", idx)
+        author = self._reply_author(rng, plan)
+        if self.text is not None:
+            message = self.text.text("replies", idx)
+        else:
+            message = f"{rng.choice(payloads.SNIPPET_BANK)} : {payloads.gibberish(rng)}"
+        created = REPLY_WINDOW + timedelta(seconds=rng.randrange(60 * 86400))
+        first = plan.index * self.replies_per_pin
+        parent_id = scaled_oid("replies", first) if idx != first else None
+        doc = payloads.reply_payload(
+            scaled_oid("replies", idx),
+            scaled_oid("pins", plan.index),
+            parent_id,
+            scaled_oid("users", author),
+            message,
+            created,
+        )
+        return doc, author
+
+    def reply_batch(self, plans: Sequence[PinPlan], pins: Sequence[Dict[str, Any]]) -> ReplyBatch:
+        """Tree replies of ``plans`` in one batch; ``pins`` carry their reply counts."""
+        assert self.reply_trees is not None
+        pools = [(plan.attendees or [plan.creator]) if plan.pin_type == "event" else [] for plan in plans]
+        counts = [pin["replyCount"] for pin in pins]
+        return self.reply_trees.build([plan.index for plan in plans], counts, pools, self.config.users).lists()
+
+    def _tree_replies(
+        self, batch: ReplyBatch, i: int, plan: PinPlan, texts: Optional[List[str]] = None
+    ) -> List[DocWithUser]:
+        """Documents of the batch's pin ``i``; ``texts`` holds the batch's messages, if drawn already."""
+        first, base = batch.starts[i], plan.index << REPLY_BITS
+        docs = []
+        for j in range(first, batch.starts[i + 1]):
+            idx = base | batch.position[j]
+            if texts is not None:
+                message = texts[j]
+            else:
+                rng = doc_rng(self.config.seed, "replies", idx)
+                message = f"{rng.choice(payloads.SNIPPET_BANK)} : {payloads.gibberish(rng)}"
+            parent = batch.parent[j]
+            author = batch.author[j]
+            doc = payloads.reply_payload(
+                scaled_oid("replies", idx),
+                scaled_oid("pins", plan.index),
+                scaled_oid("replies", base | batch.position[parent]) if parent >= 0 else None,
+                scaled_oid("users", author),
+                message,
+                plan.start_dt + timedelta(seconds=batch.offset[j]),
+            )
+            docs.append((doc, author))
+        return docs
+
+    def _bookmark_draws(self, pin_index: int) -> Tuple[List[int], List[int]]:
+        rng = doc_rng(self.config.seed, "bookmarks", pin_index)
+        users = rng.sample(range(self.config.users), self.bookmarks_per_pin)
+        offsets = [rng.randrange(45 * 86400) for _ in users]
+        return users, offsets
+
+    def _bookmark_doc(self, idx: int, plan: PinPlan, uid: int, offset: int) -> Dict[str, Any]:
+        notes = payloads.BOOKMARK_NOTES[plan.pin_type].format(plan.title)
+        return payloads.bookmark_payload(
+            scaled_oid("bookmarks", idx),
+            scaled_oid("users", uid),
+            scaled_oid("pins", plan.index),
+            notes,
+            BOOKMARK_WINDOW + timedelta(seconds=offset),
+        )
+
+    def _pin_docs(self, plans: Sequence[PinPlan]) -> List[Dict[str, Any]]:
+        """Pins of ``plans``, each linked to the grid room its coordinates fall in."""
+        pins = [self._pin_doc(plan) for plan in plans]
+        for pin, room_id in zip(pins, self.room_index.assign_ids([pin["coordinates"] for pin in pins])):
+            pin["linkedChatRoomId"] = room_id
+        return pins
+
+    def pin(self, idx: int) -> Dict[str, Any]:
+        return self._pin_docs([self.pin_plan(idx)])[0]
+
+    def reply(self, idx: int) -> Dict[str, Any]:
+        return self._reply_doc(idx, self.pin_plan(idx // self.replies_per_pin))[0]
+
+    def bookmark(self, idx: int) -> Dict[str, Any]:
+        pin_index, k = divmod(idx, self.bookmarks_per_pin)
+        users, offsets = self._bookmark_draws(pin_index)
+        return self._bookmark_doc(idx, self.pin_plan(pin_index), users[k], offsets[k])
+
+    def thread(self, pin_index: int) -> Thread:
+        """Build a pin with its replies and bookmarks from a single plan.
+
+        Returns ``(plan, pin, [(reply, author)], [(bookmark, user)])``; the
+        documents are identical to ``pins[i]``, ``replies[j]`` and
+        ``bookmarks[k]`` but the plan is only drawn once.
+        """
+        return next(self.threads(pin_index, pin_index + 1))
+
+    def threads(self, lo: int, hi: int) -> Iterator[Thread]:
+        """:meth:`thread` for pins ``lo`` to ``hi``; tree replies are drawn in one batch."""
+        plans = [self.pin_plan(idx) for idx in range(lo, hi)]
+        pins = self._pin_docs(plans)
+        batch = self.reply_batch(plans, pins) if self.reply_trees is not None else None
+        texts = None
+        if batch is not None and self.text is not None:
+            indexes: List[int] = []
+            for plan, first, last in zip(plans, batch.starts, batch.starts[1:]):
+                base = plan.index << REPLY_BITS
+                indexes.extend(range(base, base + last - first))
+            texts = self.text.texts("replies", indexes)
+        rpp, bpp = self.replies_per_pin, self.bookmarks_per_pin
+        for i, (plan, pin) in enumerate(zip(plans, pins)):
+            idx = plan.index
+            if batch is not None:
+                replies = self._tree_replies(batch, i, plan, texts)
+            else:
+                replies = [self._reply_doc(j, plan) for j in range(idx * rpp, (idx + 1) * rpp)]
+            users, offsets = self._bookmark_draws(idx)
+            bookmarks = [
+                (self._bookmark_doc(idx * bpp + k, plan, uid, offset), uid)
+                for k, (uid, offset) in enumerate(zip(users, offsets))
+            ]
+            yield plan, pin, replies, bookmarks
+
+    # -- chat ------------------------------------------------------------------
+    def message(self, idx: int) -> Dict[str, Any]:
+        cfg = self.config
+        rng = doc_rng(cfg.seed, "proximityChatMessages", idx)
+        room = rng.randrange(cfg.rooms)
+        uid = rng.randrange(cfg.users)
+        dt = CHAT_START + timedelta(seconds=idx * 30)
+        return self._message_doc(idx, room, uid, rng, self._room_point(room), dt)
+
+    def simulated_message(self, idx: int, room: int, uid: int, dt: datetime) -> Dict[str, Any]:
+        """Message ``idx`` of a traffic simulation; like :meth:`message`, posted from inside ``room``'s circle."""
+        return self._message_doc(
+            idx, room, uid, doc_rng(self.config.seed, "proximityChatMessages", idx), self._room_point(room), dt
+        )
+
+    def _room_point(self, room: int) -> Any:
+        def draw(rng: CounterRandom) -> Dict[str, Any]:
+            lon, lat = room_center(room, self.config.rooms)
+            # Clear of the edge, so the server's haversine check passes after rounding.
+            distance = 0.95 * ROOM_RADIUS_METERS * DEGREES_PER_METER * math.sqrt(rng.random())
+            angle = 2 * math.pi * rng.random()
+            lon += distance * math.sin(angle) / math.cos(math.radians(lat))
+            lat += distance * math.cos(angle)
+            return {"type": "Point", "coordinates": [round(lon, 6), round(lat, 6)], "accuracy": rng.randint(5, 12)}
+
+        return draw
+
+    def _message_doc(
+        self, idx: int, room: int, uid: int, rng: CounterRandom, coordinates: Any, dt: datetime
+    ) -> Dict[str, Any]:
+        attachments = []
+        if idx % 3 == 0:
+            attachments = [payloads.image_attachment(rng.choice(ATTACHMENTS_POOL))]
+        message = self.text.text("messages", idx) if self.text is not None else payloads.gibberish(rng)
+        name = username(uid)
+        return payloads.chat_message_payload(
+            scaled_oid("proximityChatMessages", idx),
+            scaled_oid("proximityChatRooms", room),
+            scaled_oid("users", uid),
+            name,
+            name.title(),
+            avatar(uid),
+            avatar(uid),
+            message,
+            coordinates(rng),
+            attachments,
+            dt,
+        )
+
+    def presence_pair(self, idx: int) -> Tuple[int, int]:
+        """``(room, user)`` of presence record ``idx``.
+
+        Pairs are walked with a stride coprime to ``rooms * users``, so every
+        record gets a distinct pair without tracking the ones already used.
+        """
+        uid, room = divmod((self.presence_start + idx * self.presence_stride) % self.pairs, self.config.rooms)
+        return room, uid
+
+    def presence_record(self, idx: int) -> Dict[str, Any]:
+        rng = doc_rng(self.config.seed, "proximityChatPresence", idx)
+        room, uid = self.presence_pair(idx)
+        joined = CHAT_START + timedelta(seconds=idx * 15)
+        last_active = joined + timedelta(minutes=5 + rng.randrange(4))
+        return payloads.presence_payload(
+            scaled_oid("proximityChatPresence", idx),
+            scaled_oid("proximityChatRooms", room),
+            scaled_oid("users", uid),
+            scaled_oid("sessions", idx),
+            joined,
+            last_active,
+        )
+
+    # -- aggregates --------------------------------------------------------------
+    def attach_counters(self, user_stats: Dict[str, array], room_presence: array) -> None:
+        self.user_stats = user_stats
+        self.room_presence = room_presence
+
+    def compute_counters(self) -> None:
+        """Aggregate user and room counters from the plans of every document."""
+        touched = pin_touches(self, 0, self.config.pins)
+        touched.update(presence_touches(self, 0, self.config.presence))
+        self.attach_counters(*fold_touches([touched], self.config))
+
+    def room(self, idx: int) -> Dict[str, Any]:
+        if self.room_presence is None:
+            self.compute_counters()
+        cfg = self.config
+        row, col = divmod(idx, grid_side(cfg.rooms))
+        lon, lat = room_center(idx, cfg.rooms)
+        return payloads.room_payload(
+            scaled_oid("proximityChatRooms", idx),
+            scaled_oid("users", idx % cfg.users),
+            f"Load Grid R{row + 1}C{col + 1}",
+            lon,
+            lat,
+            ROOM_RADIUS_METERS,
+            self.room_presence[idx],
+            ROOM_CREATED,
+        )
+
+    def user(self, idx: int) -> Dict[str, Any]:
+        if self.user_stats is None:
+            self.compute_counters()
+        stats: Dict[str, int] = {name: self.user_stats[name][idx] for name in USER_COUNTERS}
+        stats.update(followers=0, following=0)
+        name = username(idx)
+        return payloads.user_payload(scaled_oid("users", idx), name, name.title(), avatar(idx), stats, USER_CREATED)
+
+
+def pin_touches(dataset: ScaledDataset, lo: int, hi: int) -> Dict[str, array]:
+    """User indexes incremented by pins ``[lo, hi)``, one entry per increment."""
+    touched = {name: array("I") for name in USER_COUNTERS}
+    seed = dataset.config.seed
+    rpp = dataset.replies_per_pin
+    plans = [dataset.pin_plan(idx) for idx in range(lo, hi)]
+    if dataset.reply_trees is not None:
+        batch = dataset.reply_batch(plans, [dataset._pin_doc(plan) for plan in plans])
+        touched["posts"].extend(batch.author)
+    for plan in plans:
+        idx = plan.index
+        if plan.pin_type == "event":
+            touched["eventsHosted"].append(plan.creator)
+            touched["eventsAttended"].extend(plan.attendees)
+        if dataset.reply_trees is None:
+            for j in range(idx * rpp, (idx + 1) * rpp):
+                touched["posts"].append(dataset._reply_author(doc_rng(seed, "replies", j), plan))
+        touched["bookmarks"].extend(dataset._bookmark_draws(idx)[0])
+    return touched
+
+
+def presence_touches(dataset: ScaledDataset, lo: int, hi: int) -> Dict[str, array]:
+    return {"rooms": array("I", (dataset.presence_pair(idx)[0] for idx in range(lo, hi)))}
+
+
+def fold_touches(results: Any, config: ScaleConfig) -> Tuple[Dict[str, array], array]:
+    user_stats = {name: array("I", bytes(4 * config.users)) for name in USER_COUNTERS}
+    room_presence = array("I", bytes(4 * config.rooms))
+    for touched in results:
+        for name, indexes in touched.items():
+            target = room_presence if name == "rooms" else user_stats[name]
+            for index in indexes:
+                target[index] += 1
+    return user_stats, room_presence
+
+
+def fragment_path(work_dir: Path, collection: str, shard: int) -> Path:
+    return work_dir / f"{collection}.{shard:06d}.part"
+
+
+# -- shard tasks (module level so they pickle into worker processes) ----------
+def pin_shard(config: ScaleConfig, shard: int, lo: int, hi: int, work_dir: Path, fmt: str) -> Dict[str, array]:
+    """Write pins ``[lo, hi)`` plus their replies and bookmarks.
+
+    Returns flat arrays of user indexes (one entry per increment) so the parent
+    can fold them into the per-user stats without shipping dense arrays.
+    """
+    dataset = ScaledDataset(config)
+    if dataset.pin_field is not None:
+        dataset.pin_field.prefetch(lo, hi)
+    touched = {name: array("I") for name in USER_COUNTERS}
+    with DocumentWriter(fragment_path(work_dir, "pins", shard), fmt, fragment=True) as pins, DocumentWriter(
+        fragment_path(work_dir, "replies", shard), fmt, fragment=True
+    ) as replies, DocumentWriter(fragment_path(work_dir, "bookmarks", shard), fmt, fragment=True) as bookmarks:
+        for plan, pin, thread_replies, thread_bookmarks in dataset.threads(lo, hi):
+            pins.write(pin)
+            if plan.pin_type == "event":
+                touched["eventsHosted"].append(plan.creator)
+                touched["eventsAttended"].extend(plan.attendees)
+            for doc, author in thread_replies:
+                replies.write(doc)
+                touched["posts"].append(author)
+            for doc, uid in thread_bookmarks:
+                bookmarks.write(doc)
+                touched["bookmarks"].append(uid)
+    return touched
+
+
+def message_shard(config: ScaleConfig, shard: int, lo: int, hi: int, work_dir: Path, fmt: str) -> Dict[str, array]:
+    dataset = ScaledDataset(config)
+    with DocumentWriter(fragment_path(work_dir, "proximityChatMessages", shard), fmt, fragment=True) as out:
+        out.write_all(dataset.messages[lo:hi])
+    return {}
+
+
+def presence_shard(config: ScaleConfig, shard: int, lo: int, hi: int, work_dir: Path, fmt: str) -> Dict[str, array]:
+    dataset = ScaledDataset(config)
+    with DocumentWriter(fragment_path(work_dir, "proximityChatPresence", shard), fmt, fragment=True) as out:
+        out.write_all(dataset.presence[lo:hi])
+    return presence_touches(dataset, lo, hi)
+
+
+def traffic_task(
+    config: ScaleConfig, messages_path: Path, presence_path: Path, spill_dir: Path, fmt: str
+) -> Tuple[TrafficReport, array]:
+    """Simulate chat traffic into the message and presence files.
+
+    Returns the simulation report and the presence records per room.
+    """
+    dataset = ScaledDataset(config)
+    room_presence = array("I", bytes(4 * config.rooms))
+    simulator = TrafficSimulator(config.traffic_config(), config.users, config.rooms, CHAT_START, spill_dir)
+    try:
+        with DocumentWriter(messages_path, fmt) as messages:
+
+            def post(seconds: float, room: int, uid: int) -> None:
+                dt = CHAT_START + timedelta(seconds=seconds)
+                messages.write(dataset.simulated_message(messages.count, room, uid, dt))
+
+            report = simulator.run(post)
+        with DocumentWriter(presence_path, fmt) as presence:
+            for room, uid, joined, last_active, session in simulator.presence():
+                presence.write(
+                    payloads.presence_payload(
+                        scaled_oid("proximityChatPresence", presence.count),
+                        scaled_oid("proximityChatRooms", room),
+                        scaled_oid("users", uid),
+                        scaled_oid("sessions", session),
+                        CHAT_START + timedelta(milliseconds=joined),
+                        CHAT_START + timedelta(milliseconds=last_active),
+                    )
+                )
+                room_presence[room] += 1
+    finally:
+        simulator.close()
+    return report, room_presence
+
+
+CHAT_COLLECTIONS = ("proximityChatMessages", "proximityChatPresence")
+SHARDED = (
+    ("pins", pin_shard, ("pins", "replies", "bookmarks")),
+    ("messages", message_shard, ("proximityChatMessages",)),
+    ("presence", presence_shard, ("proximityChatPresence",)),
+)
+
+
+class ScaleGenerator:
+    def __init__(self, config: ScaleConfig, workers: int | None = None, fmt: str = DEFAULT_FORMAT) -> None:
+        self.dataset = ScaledDataset(config)
+        self.config = config
+        self.workers = max(1, workers or default_workers())
+        self.format = fmt
+
+    def run(self, out_dir: Path) -> GenerationReport:
+        cfg = self.config
+        out_dir.mkdir(parents=True, exist_ok=True)
+        report = GenerationReport(workers=self.workers)
+        started = time.perf_counter()
+        work_dir = Path(tempfile.mkdtemp(prefix=".shards-", dir=out_dir))
+        try:
+            totals = {"pins": cfg.pins, "messages": cfg.messages, "presence": cfg.presence}
+            tasks = []
+            sharded = SHARDED
+            if cfg.chat_days:
+                # First, so the longest task starts while the pin shards queue up.
+                messages, presence = (self.output_path(out_dir, name) for name in CHAT_COLLECTIONS)
+                tasks.append((traffic_task, (cfg, messages, presence, work_dir, self.format)))
+                sharded = tuple(entry for entry in SHARDED if entry[0] == "pins")
+            layout: List[Tuple[Tuple[str, ...], int]] = []
+            for key, fn, collections in sharded:
+                ranges = shard_ranges(totals[key], cfg.shard_size)
+                tasks.extend((fn, (cfg, shard, lo, hi, work_dir, self.format)) for shard, (lo, hi) in enumerate(ranges))
+                layout.append((collections, len(ranges)))
+
+            tick = time.perf_counter()
+            results = run_tasks(tasks, self.workers)
+            traffic_presence = None
+            if cfg.chat_days:
+                report.traffic, traffic_presence = next(results)
+            user_stats, room_presence = fold_touches(results, cfg)
+            if traffic_presence is not None:
+                for room, count in enumerate(traffic_presence):
+                    room_presence[room] += count
+            self.dataset.attach_counters(user_stats, room_presence)
+            generated = {
+                "pins": len(self.dataset.pins),
+                "replies": len(self.dataset.replies),
+                "bookmarks": len(self.dataset.bookmarks),
+                "proximityChatMessages": len(self.dataset.messages),
+                "proximityChatPresence": len(self.dataset.presence),
+            }
+            if self.dataset.reply_trees is not None:
+                generated["replies"] = sum(user_stats["posts"])
+            if report.traffic is not None:
+                generated["proximityChatMessages"] = report.traffic.messages
+                generated["proximityChatPresence"] = report.traffic.presence
+            report.phase(f"{len(tasks)} shards", sum(generated.values()), time.perf_counter() - tick)
+
+            tick = time.perf_counter()
+            for collections, shard_count in layout:
+                for name in collections:
+                    parts = [fragment_path(work_dir, name, shard) for shard in range(shard_count)]
+                    merge_fragments(self.output_path(out_dir, name), parts, self.format)
+                    report.counts[name] = generated[name]
+            if report.traffic is not None:
+                report.counts.update((name, generated[name]) for name in CHAT_COLLECTIONS)
+            report.phase("merge", sum(generated.values()), time.perf_counter() - tick)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        # Users and rooms go last so their counters reflect everything above.
+        for name, view in (("proximityChatRooms", self.dataset.rooms), ("users", self.dataset.users)):
+            tick = time.perf_counter()
+            with DocumentWriter(self.output_path(out_dir, name), self.format) as writer:
+                writer.write_all(view)
+            report.counts[name] = writer.count
+            report.phase(name, writer.count, time.perf_counter() - tick)
+
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def output_path(self, out_dir: Path, name: str) -> Path:
+        return format_path(out_dir / COLLECTION_FILES[name], self.format)
+
+
+def generate(
+    config: ScaleConfig, out_dir: Path, workers: int | None = None, fmt: str = DEFAULT_FORMAT
+) -> GenerationReport:
+    return ScaleGenerator(config, workers, fmt).run(out_dir)
@@ -0,0 +1,45 @@
+"""Deterministic sharding helpers for parallel fixture generation.
+
+Shards cover contiguous index ranges and every document draws from an RNG
+derived from (base seed, collection, index) via :func:`derive_seed`, so the
+worker count and shard size change how fast shards are produced, never what
+they contain.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Iterator, List, Tuple
+
+
+def derive_seed(base_seed: int, collection: str, index: int) -> int:
+    digest = hashlib.blake2b(f"{base_seed}:{collection}:{index}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def shard_ranges(total: int, shard_size: int) -> List[Tuple[int, int]]:
+    """Split ``range(total)`` into contiguous ``(lo, hi)`` chunks."""
+    if shard_size < 1:
+        raise ValueError("shard_size must be at least 1")
+    return [(lo, min(lo + shard_size, total)) for lo in range(0, total, shard_size)]
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def run_tasks(tasks: List[Tuple[Callable[..., Any], tuple]], workers: int) -> Iterator[Any]:
+    """Run ``(fn, args)`` tasks, yielding results in submission order.
+
+    ``workers <= 1`` runs everything in-process, which keeps tracebacks simple
+    and avoids pool start-up for small fixtures.
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        for fn, args in tasks:
+            yield fn(*args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures: List[Future] = [pool.submit(fn, *args) for fn, args in tasks]
+        for future in futures:
+            yield future.result()
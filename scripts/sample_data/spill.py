@@ -0,0 +1,168 @@
+"""Count ObjectId references under a memory budget, spilling to disk.
+
+:class:`SpillingCounter` keeps at most ``max_keys`` distinct keys in memory.
+When a new key would go over that, the table is written out as a run file of
+``(key, count)`` records sorted by key and cleared. :meth:`SpillingCounter.items`
+then merges every run with what is still in memory (a k-way merge over the
+sorted runs), adding up the partial counts of each key, so the totals are
+exactly those of an unbounded ``Counter``. Every :data:`MERGE_FANIN` runs are
+merged into one as they accumulate, so the number of open files stays small.
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import re
+import struct
+import tempfile
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .codec import ObjectId, oid_value
+
+_RECORD = struct.Struct(">12sQ")
+_READ_RECORDS = 1 << 14
+# Runs are merged into one once there are this many, to bound open files.
+MERGE_FANIN = 64
+
+# Rough resident size of one in-memory entry: dict slot, ObjectId key and int count.
+ENTRY_BYTES = 160
+
+_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)(i?b)?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+
+
+def parse_size(text: str) -> int:
+    """``"512M"``, ``"2GiB"``, ``"65536"`` -> bytes (binary units)."""
+    match = _SIZE.match(text)
+    if not match:
+        raise ValueError(f"not a size: {text!r}")
+    value = int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+    if value <= 0:
+        raise ValueError(f"size must be positive: {text!r}")
+    return value
+
+
+def add_memory_budget_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--memory-budget",
+        type=parse_size,
+        metavar="SIZE",
+        help="Cap the memory used for counting references (e.g. 512M, 2G); "
+        "partial counts beyond it are spilled to sorted files and merged (default: no cap)",
+    )
+    parser.add_argument(
+        "--spill-dir",
+        type=Path,
+        help="Directory for spilled count files (default: the system temp directory)",
+    )
+
+
+def read_run(fh: BinaryIO, record: struct.Struct = _RECORD) -> Iterator[Tuple[Any, ...]]:
+    """The records of a run file, from the start."""
+    fh.seek(0)
+    while True:
+        block = fh.read(record.size * _READ_RECORDS)
+        if not block:
+            return
+        yield from record.iter_unpack(block)
+
+
+def write_run(
+    items: Iterable[Tuple[Any, ...]],
+    record: struct.Struct = _RECORD,
+    spill_dir: Optional[Path] = None,
+    prefix: str = "sample-data-counts-",
+) -> BinaryIO:
+    """Write ``items`` (already in order) as ``record``-packed rows to a new run file."""
+    if spill_dir is not None:
+        spill_dir.mkdir(parents=True, exist_ok=True)
+    # An anonymous temporary file: it disappears when closed, or if we die.
+    fh = tempfile.TemporaryFile(prefix=prefix, dir=spill_dir)
+    pack = record.pack
+    batch: List[bytes] = []
+    for item in items:
+        batch.append(pack(*item))
+        if len(batch) >= _READ_RECORDS:
+            fh.write(b"".join(batch))
+            batch.clear()
+    fh.write(b"".join(batch))
+    fh.flush()
+    return fh
+
+
+def _merge(sources: List[Iterator[Tuple[Any, ...]]]) -> Iterator[Tuple[bytes, int]]:
+    """k-way merge of key-sorted ``(key, count)`` streams, summing equal keys."""
+    current: Optional[bytes] = None
+    total = 0
+    for key, n in heapq.merge(*sources, key=lambda item: item[0]):
+        if key == current:
+            total += n
+            continue
+        if current is not None:
+            yield current, total
+        current, total = key, n
+    if current is not None:
+        yield current, total
+
+
+class SpillingCounter:
+    def __init__(self, max_keys: int, spill_dir: Optional[Path] = None) -> None:
+        if max_keys < 1:
+            raise ValueError("max_keys must be at least 1")
+        self.max_keys = max_keys
+        self.spill_dir = spill_dir
+        self.counts: Dict[ObjectId, int] = {}
+        self.runs: List[BinaryIO] = []
+
+    def __enter__(self) -> "SpillingCounter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def append(self, value: Any) -> None:
+        """Count one reference (an ObjectId or ``{"$oid": ...}``); anything else is ignored."""
+        if value.__class__ is not ObjectId:
+            value = oid_value(value)
+            if value is None:
+                return
+        counts = self.counts
+        n = counts.get(value)
+        if n is None:
+            if len(counts) >= self.max_keys:
+                self._spill()
+                counts = self.counts
+            counts[value] = 1
+        else:
+            counts[value] = n + 1
+
+    def extend(self, values: Iterable[Any]) -> None:
+        for value in values:
+            self.append(value)
+
+    def _spill(self) -> None:
+        self.runs.append(write_run(sorted(self.counts.items()), spill_dir=self.spill_dir))
+        self.counts = {}
+        if len(self.runs) >= MERGE_FANIN:
+            merged = write_run(_merge([read_run(fh) for fh in self.runs]), spill_dir=self.spill_dir)
+            for fh in self.runs:
+                fh.close()
+            self.runs = [merged]
+
+    def items(self) -> Iterator[Tuple[bytes, int]]:
+        """Every ``(key, total)`` in key order; keys from spilled runs are plain ``bytes``."""
+        sources = [read_run(fh) for fh in self.runs]
+        sources.append(iter(sorted(self.counts.items())))
+        return _merge(sources)
+
+    def close(self) -> None:
+        for fh in self.runs:
+            fh.close()
+        self.runs = []
+        self.counts = {}
+
+
+def max_keys_for(memory_budget: int, tables: int) -> int:
+    """How many keys each of ``tables`` counters may hold within ``memory_budget`` bytes."""
+    return max(1, memory_budget // (ENTRY_BYTES * max(1, tables)))
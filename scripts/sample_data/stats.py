@@ -0,0 +1,306 @@
+"""Derived pin and user counters, computed in one pass per collection.
+
+The fixture scripts all keep the same denormalised counters in step with the
+collections they summarise: pin ``bookmarkCount``/``replyCount``/
+``participantCount`` and user ``stats.bookmarks``/``eventsHosted``/
+``eventsAttended``/``posts``. :func:`compute_stats` reads each collection once,
+pulling every reference it needs into a column, maps each column onto a dense
+``0..n-1`` index of pin or user ids in bulk (:class:`IdIndex`) and counts the
+indexes with ``numpy.bincount``, or with a ``Counter`` when NumPy is not
+installed; the results are identical.
+
+With a ``memory_budget`` the reference columns are never held in full: each
+is counted as it is read by a :class:`~sample_data.spill.SpillingCounter`,
+which spills partial counts to disk beyond its share of the budget, and the
+merged totals are looked up in the index. The counters come out the same.
+
+Any collection may also be passed as a :class:`~sample_data.columns.ColumnSet`
+(its cached columns); its references are then counted straight from the
+mapped code arrays without parsing a document.
+
+Counters are returned as plain ``int`` lists so they can be written straight
+into documents; :func:`apply_pin_stats` and :func:`apply_user_stats` do that.
+"""
+from __future__ import annotations
+
+from collections import Counter
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from itertools import repeat
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .codec import ObjectId, oid_value
+from .columns import MISSING, CodedColumn, ColumnSet
+from .spill import SpillingCounter, max_keys_for
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+PIN_COUNTERS = ("bookmarkCount", "replyCount", "participantCount")
+USER_COUNTERS = ("bookmarks", "eventsHosted", "eventsAttended", "posts")
+# Pin counters that are mirrored under ``pin["stats"]``.
+PIN_STAT_COUNTERS = ("bookmarkCount", "replyCount")
+
+
+class IdIndex:
+    """Dense integer index over the distinct ids of one collection.
+
+    ``rows[i]`` is the index of the ``i``-th document's id, or ``-1`` for a
+    document without one; documents sharing an id share an index.
+    """
+
+    def __init__(self, ids: Iterable[Optional[ObjectId]]) -> None:
+        lookup: Dict[ObjectId, int] = {}
+        self.rows: List[int] = [-1 if oid is None else lookup.setdefault(oid, len(lookup)) for oid in ids]
+        self._lookup = lookup
+        # The cached ``_id`` column this index was built from, if any.
+        self._column: Optional[CodedColumn] = None
+
+    @classmethod
+    def from_column(cls, column: CodedColumn) -> "IdIndex":
+        """The index of a cached ``_id`` column; its codes already are dense indexes."""
+        index = cls(())
+        index._lookup = {key: code for code, key in enumerate(column.keys)}
+        index.rows = column.rows()
+        index._column = column
+        return index
+
+    def __len__(self) -> int:
+        return len(self._lookup)
+
+    def positions(self, refs: Sequence[Any]) -> List[int]:
+        """The index of each reference in ``refs``, ``-1`` for ids not in the index."""
+        get = self._lookup.get
+        try:
+            return list(map(get, refs, repeat(-1)))
+        except TypeError:
+            # Some references are still ``{"$oid": ...}`` dicts (not hashable).
+            return list(map(get, map(oid_value, refs), repeat(-1)))
+
+    def count(self, refs: Sequence[Any]) -> List[int]:
+        """How many times each indexed id occurs in ``refs``; other references are ignored."""
+        size = len(self)
+        rows = self.positions(refs)
+        if np is not None:
+            dense = np.array(rows, dtype=np.int64)
+            return np.bincount(dense[dense >= 0], minlength=size).tolist()
+        counts = [0] * size
+        for row, n in Counter(rows).items():
+            if row >= 0:
+                counts[row] = n
+        return counts
+
+    def count_column(self, column: CodedColumn) -> List[int]:
+        """How many times each indexed id occurs in a cached reference column."""
+        if np is None or self._column is None or not len(self):
+            return self.count_totals(column.totals())
+        # Both key arrays are sorted: map each distinct reference to its index
+        # in one search, then count the per-row codes through that map.
+        known, keys = self._column.key_array(), column.key_array()
+        pos = np.minimum(np.searchsorted(known, keys), len(known) - 1)
+        target = np.append(np.where(known[pos] == keys, pos, -1), -1)
+        codes = np.asarray(column.codes).astype(np.int64)
+        codes[codes == MISSING] = -1
+        rows = target[codes]
+        return np.bincount(rows[rows >= 0], minlength=len(self)).tolist()
+
+    def count_totals(self, totals: Iterable[Tuple[bytes, int]]) -> List[int]:
+        """Per-index counts from ``(id, total)`` pairs with unique ids; other ids are ignored."""
+        counts = [0] * len(self)
+        get = self._lookup.get
+        for key, n in totals:
+            row = get(key)
+            if row is not None:
+                counts[row] = n
+        return counts
+
+
+# A reference column: every value as read, counted on the fly under a budget,
+# or read from the column cache.
+Column = Union[List[Any], SpillingCounter, CodedColumn]
+Source = Union[Iterable[Any], ColumnSet]
+
+# Reference columns compute_stats keeps, one counting table each when spilling.
+_COLUMNS = 6
+
+
+def _count(index: IdIndex, column: Column) -> List[int]:
+    if isinstance(column, SpillingCounter):
+        return index.count_totals(column.items())
+    if isinstance(column, CodedColumn):
+        return index.count_column(column)
+    return index.count(column)
+
+
+@dataclass
+class FixtureStats:
+    pins: IdIndex
+    users: IdIndex
+    # Counter name -> value per dense pin / user index.
+    pin_counts: Dict[str, List[int]] = field(default_factory=dict)
+    user_counts: Dict[str, List[int]] = field(default_factory=dict)
+    # Attendee count per pin document (not per id), for ``participantCount``.
+    participants: List[int] = field(default_factory=list)
+
+    def pin_count(self, name: str, doc: int) -> int:
+        row = self.pins.rows[doc]
+        return self.pin_counts[name][row] if row >= 0 else 0
+
+    def user_count(self, name: str, doc: int) -> int:
+        row = self.users.rows[doc]
+        return self.user_counts[name][row] if row >= 0 else 0
+
+    def user_totals(self, users: Sequence[Any]) -> Dict[ObjectId, List[int]]:
+        """``USER_COUNTERS`` values for each user in ``users``, keyed by id."""
+        totals: Dict[ObjectId, List[int]] = {}
+        for doc, user in enumerate(users):
+            if self.users.rows[doc] >= 0:
+                totals[oid_value(user.get("_id"))] = [self.user_count(name, doc) for name in USER_COUNTERS]
+        return totals
+
+
+def compute_stats(
+    pins: Source = (),
+    users: Source = (),
+    bookmarks: Source = (),
+    replies: Source = (),
+    memory_budget: Optional[int] = None,
+    spill_dir: Optional[Path] = None,
+) -> FixtureStats:
+    """Every pin and user counter over the given collections, one pass over each.
+
+    The collections may be streams. Pass the same (materialised) ``pins`` and
+    ``users`` sequences to :func:`apply_pin_stats` / :func:`apply_user_stats`,
+    since results are addressed by document position. ``memory_budget``
+    (bytes) bounds the reference counting tables; see the module docstring.
+    """
+    with ExitStack() as stack:
+        if memory_budget is None:
+            columns: List[Column] = [[] for _ in range(_COLUMNS)]
+        else:
+            max_keys = max_keys_for(memory_budget, _COLUMNS)
+            columns = [stack.enter_context(SpillingCounter(max_keys, spill_dir)) for _ in range(_COLUMNS)]
+        return _compute(pins, users, bookmarks, replies, *columns)
+
+
+def _compute(
+    pins: Source,
+    users: Source,
+    bookmarks: Source,
+    replies: Source,
+    hosts: Column,
+    attendees: Column,
+    bookmark_pins: Column,
+    bookmark_users: Column,
+    reply_pins: Column,
+    reply_authors: Column,
+) -> FixtureStats:
+    if isinstance(pins, ColumnSet):
+        pin_index = IdIndex.from_column(pins.oid("_id"))
+        events = pins.category("type").mask("event")
+        attending = pins.oid_list("attendingUserIds")
+        participants = attending.lengths()
+        hosts = pins.oid("creatorId").select(events)
+        attendees = attending.select(events)
+    else:
+        pin_ids: List[Optional[ObjectId]] = []
+        participants = []
+        for pin in pins:
+            pin_ids.append(oid_value(pin.get("_id")))
+            attending = pin.get("attendingUserIds") or []
+            participants.append(len(attending))
+            if pin.get("type") == "event":
+                hosts.append(pin.get("creatorId"))
+                attendees.extend(attending)
+        pin_index = IdIndex(pin_ids)
+
+    if isinstance(users, ColumnSet):
+        user_index = IdIndex.from_column(users.oid("_id"))
+    else:
+        user_index = IdIndex([oid_value(user.get("_id")) for user in users])
+
+    # Raw reference values, resolved in bulk by IdIndex (or counted as read when spilling).
+    if isinstance(bookmarks, ColumnSet):
+        bookmark_pins, bookmark_users = bookmarks.oid("pinId"), bookmarks.oid("userId")
+    else:
+        for bookmark in bookmarks:
+            bookmark_pins.append(bookmark.get("pinId"))
+            bookmark_users.append(bookmark.get("userId"))
+
+    if isinstance(replies, ColumnSet):
+        reply_pins, reply_authors = replies.oid("pinId"), replies.oid("authorId")
+    else:
+        for reply in replies:
+            reply_pins.append(reply.get("pinId"))
+            reply_authors.append(reply.get("authorId"))
+
+    return FixtureStats(
+        pins=pin_index,
+        users=user_index,
+        pin_counts={
+            "bookmarkCount": _count(pin_index, bookmark_pins),
+            "replyCount": _count(pin_index, reply_pins),
+        },
+        user_counts={
+            "bookmarks": _count(user_index, bookmark_users),
+            "eventsHosted": _count(user_index, hosts),
+            "eventsAttended": _count(user_index, attendees),
+            "posts": _count(user_index, reply_authors),
+        },
+        participants=participants,
+    )
+
+
+def user_contributions(
+    pins: Iterable[Any] = (),
+    bookmarks: Iterable[Any] = (),
+    replies: Iterable[Any] = (),
+) -> Dict[ObjectId, List[int]]:
+    """What the given documents add to each user they reference, as ``USER_COUNTERS`` values.
+
+    Counts follow the same rules as :func:`compute_stats`, so adding the
+    contributions of new documents to earlier totals gives the new totals.
+    """
+    refs: Dict[str, List[Any]] = {name: [] for name in USER_COUNTERS}
+    for pin in pins:
+        if pin.get("type") == "event":
+            refs["eventsHosted"].append(pin.get("creatorId"))
+            refs["eventsAttended"].extend(pin.get("attendingUserIds") or [])
+    refs["bookmarks"].extend(bookmark.get("userId") for bookmark in bookmarks)
+    refs["posts"].extend(reply.get("authorId") for reply in replies)
+
+    totals: Dict[ObjectId, List[int]] = {}
+    for slot, name in enumerate(USER_COUNTERS):
+        for uid, n in Counter(filter(None, map(oid_value, refs[name]))).items():
+            totals.setdefault(uid, [0] * len(USER_COUNTERS))[slot] += n
+    return totals
+
+
+def apply_pin_stats(pins: Sequence[Any], stats: FixtureStats, counters: Sequence[str] = PIN_COUNTERS) -> None:
+    """Write ``counters`` onto ``pins``; ``participantCount`` is only kept on events."""
+    mirrored = [name for name in counters if name in PIN_STAT_COUNTERS]
+    top_level = [name for name in counters if name in stats.pin_counts]
+    for doc, pin in enumerate(pins):
+        values = {name: stats.pin_count(name, doc) for name in top_level}
+        for name in top_level:
+            pin[name] = values[name]
+        if mirrored:
+            pin_stats = pin.setdefault("stats", {})
+            for name in mirrored:
+                pin_stats[name] = values[name]
+        if "participantCount" in counters and pin.get("type") == "event":
+            pin["participantCount"] = stats.participants[doc]
+
+
+def apply_user_stats(users: Sequence[Any], stats: FixtureStats, counters: Sequence[str] = USER_COUNTERS) -> None:
+    """Write ``counters`` into each user's ``stats`` subdocument."""
+    for doc, user in enumerate(users):
+        if stats.users.rows[doc] < 0:
+            continue
+        user_stats = user.get("stats") or {}
+        for name in counters:
+            user_stats[name] = stats.user_count(name, doc)
+        user["stats"] = user_stats
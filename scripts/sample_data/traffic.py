@@ -0,0 +1,345 @@
+"""Discrete-event simulation of proximity chat presence and message traffic.
+
+Scale mode normally writes one message every 30 seconds and one short presence
+record per (room, user) pair, which says nothing about how sessions pile up in
+the evening or how a room's messages arrive in bursts. :class:`TrafficSimulator`
+instead plays a simulated time window through a heap of pending events:
+
+* **joins** arrive as one Poisson process for the whole user base, its rate
+  following a daily cycle (peaking at :data:`PEAK_HOUR_UTC`) by thinning. Each
+  join picks a user at random and, with probability ``home_share``, that
+  user's home room, otherwise any room. A join for a (room, user) pair that
+  already has a live session is folded into it, as the server's upsert would.
+* **leaves** end a session after an exponentially distributed stay.
+* **messages** come in bursts: bursts start as a Poisson process per session
+  and hold a geometric number of messages (mean ``burst_size``) spaced by
+  short exponential gaps. ``burst_size=1`` gives plain Poisson arrivals.
+* **heartbeats** are the client's presence upserts every
+  ``heartbeat_seconds`` (``PRESENCE_HEARTBEAT_MS`` in
+  ``client/src/hooks/chat/useChatRealtime.js``). They only ever move
+  ``lastActiveAt`` forward, so they are counted and their last tick is worked
+  out when the session ends rather than pushing one heap event each, which at
+  5 seconds would be nearly every event of the run.
+
+Every live session has at most two pending events (its leave and its next
+message), so the heap and the table of live sessions grow with the number of
+concurrent sessions, not with the users or the window. Messages go to a
+callback the moment they happen, in time order, to be streamed to disk.
+
+Presence is upserted by ``(roomId, userId)`` and never deleted, so the
+collection ends up with one record per pair ever seen, holding that pair's
+latest session. :class:`PresenceLog` keeps ended sessions to the latest per
+pair in a bounded table and spills it to sorted run files when full;
+:meth:`PresenceLog.latest` merges the runs back, again keeping the latest
+session of each pair.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import count
+from pathlib import Path
+from struct import Struct
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .counter_rng import GOLDEN_GAMMA, MASK64, CounterRandom, mix64
+from .sharding import derive_seed
+from .spill import MERGE_FANIN, read_run, write_run
+
+DAY_SECONDS = 86400
+# Joins peak at 20:00 in Long Beach (PDT).
+PEAK_HOUR_UTC = 3.0
+# As PRESENCE_HEARTBEAT_MS in client/src/hooks/chat/useChatRealtime.js.
+HEARTBEAT_SECONDS = 5.0
+
+JOIN, LEAVE, MESSAGE = 0, 1, 2
+
+# room, user, joinedAt (ms into the window), lastActiveAt (ms), session ordinal.
+PresenceRecord = Tuple[int, int, int, int, int]
+_PRESENCE = Struct(">IIqqQ")
+
+
+@dataclass
+class TrafficConfig:
+    days: float = 7.0
+    sessions_per_user_day: float = 1.5
+    # Mean session length (exponential).
+    session_minutes: float = 15.0
+    # Mean messages per hour from one session, bursts included.
+    messages_per_hour: float = 4.0
+    # Mean messages per burst; 1 makes arrivals plain Poisson.
+    burst_size: float = 3.0
+    burst_gap_seconds: float = 10.0
+    heartbeat_seconds: float = HEARTBEAT_SECONDS
+    # Amplitude of the daily join cycle: 0 is flat, 1 stops joins at the trough.
+    diurnal: float = 0.6
+    # Share of sessions held in the user's home room.
+    home_share: float = 0.8
+    seed: int = 42
+    # Distinct pairs the presence log holds before spilling a sorted run.
+    spill_pairs: int = 1 << 18
+
+    def validate(self) -> None:
+        if self.days <= 0:
+            raise ValueError("simulated days must be positive")
+        for name in ("sessions_per_user_day", "session_minutes", "burst_gap_seconds", "heartbeat_seconds"):
+            if getattr(self, name) <= 0:
+                raise ValueError(f"{name.replace('_', ' ')} must be positive")
+        if self.messages_per_hour < 0:
+            raise ValueError("messages per hour must be non-negative")
+        if self.burst_size < 1:
+            raise ValueError("burst size must be at least 1")
+        if not 0.0 <= self.diurnal <= 1.0:
+            raise ValueError("diurnal amplitude must be between 0 and 1")
+        if not 0.0 <= self.home_share <= 1.0:
+            raise ValueError("home share must be between 0 and 1")
+        if self.spill_pairs < 1:
+            raise ValueError("spill_pairs must be at least 1")
+
+
+@dataclass
+class TrafficReport:
+    days: float
+    heartbeat_seconds: float
+    sessions: int = 0
+    # Joins for a pair that was already present, folded into its session.
+    folded_joins: int = 0
+    messages: int = 0
+    bursts: int = 0
+    heartbeats: int = 0
+    presence: int = 0
+    peak_sessions: int = 0
+    peak_messages_per_minute: int = 0
+    events: int = 0
+    peak_heap: int = 0
+    runs: int = 0
+    elapsed: float = 0.0
+
+    def lines(self) -> List[str]:
+        rate = self.events / self.elapsed if self.elapsed else float("inf")
+        upserts = self.peak_sessions * 60 / self.heartbeat_seconds
+        return [
+            f"  {self.days:g} simulated days, {self.events:,} events in {self.elapsed:.2f}s ({rate:,.0f} events/sec)",
+            f"  {self.sessions:,} sessions ({self.folded_joins:,} further joins folded into live ones), "
+            f"{self.heartbeats:,} heartbeats",
+            f"  {self.messages:,} messages in {self.bursts:,} bursts, peak {self.peak_messages_per_minute:,}/minute",
+            f"  peak {self.peak_sessions:,} concurrent sessions (~{upserts:,.0f} presence upserts/minute)",
+            f"  {self.presence:,} presence records (latest session per room/user pair, "
+            f"{self.runs} spilled runs, peak heap {self.peak_heap:,})",
+        ]
+
+
+def _latest(records: Iterable[PresenceRecord]) -> Iterator[PresenceRecord]:
+    """Last record of each (room, user) run in ``records``, which are sorted."""
+    previous: Optional[PresenceRecord] = None
+    for record in records:
+        if previous is not None and (record[0] != previous[0] or record[1] != previous[1]):
+            yield previous
+        previous = record
+    if previous is not None:
+        yield previous
+
+
+class PresenceLog:
+    """Ended sessions, kept to the latest per (room, user); see the module docstring."""
+
+    def __init__(self, max_pairs: int, spill_dir: Optional[Path] = None) -> None:
+        if max_pairs < 1:
+            raise ValueError("max_pairs must be at least 1")
+        self.max_pairs = max_pairs
+        self.spill_dir = spill_dir
+        self.pairs: Dict[Tuple[int, int], Tuple[int, int, int]] = {}
+        self.runs: List[BinaryIO] = []
+
+    def __enter__(self) -> "PresenceLog":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def add(self, room: int, user: int, joined: int, last_active: int, session: int) -> None:
+        # A pair's sessions never overlap, so the one ending last is also the latest.
+        pairs = self.pairs
+        if len(pairs) >= self.max_pairs and (room, user) not in pairs:
+            self._spill()
+            pairs = self.pairs
+        pairs[(room, user)] = (joined, last_active, session)
+
+    def _sorted(self) -> Iterator[PresenceRecord]:
+        return ((room, user, *rest) for (room, user), rest in sorted(self.pairs.items()))
+
+    def _write(self, records: Iterable[PresenceRecord]) -> BinaryIO:
+        return write_run(records, _PRESENCE, self.spill_dir, "sample-data-presence-")
+
+    def _spill(self) -> None:
+        self.runs.append(self._write(self._sorted()))
+        self.pairs = {}
+        if len(self.runs) >= MERGE_FANIN:
+            merged = self._write(_latest(heapq.merge(*(read_run(fh, _PRESENCE) for fh in self.runs))))
+            for fh in self.runs:
+                fh.close()
+            self.runs = [merged]
+
+    def latest(self) -> Iterator[PresenceRecord]:
+        """The latest record of every pair logged, in (room, user) order."""
+        sources = [read_run(fh, _PRESENCE) for fh in self.runs]
+        sources.append(self._sorted())
+        return _latest(heapq.merge(*sources))
+
+    def close(self) -> None:
+        for fh in self.runs:
+            fh.close()
+        self.runs = []
+        self.pairs = {}
+
+
+class _Session:
+    __slots__ = ("room", "user", "ordinal", "joined", "leave", "burst_left")
+
+    def __init__(self, room: int, user: int, ordinal: int, joined: float, leave: float) -> None:
+        self.room = room
+        self.user = user
+        self.ordinal = ordinal
+        self.joined = joined
+        self.leave = leave
+        self.burst_left = 0
+
+
+class TrafficSimulator:
+    """Chat traffic of ``users`` users over ``rooms`` rooms, from ``start`` on.
+
+    Users and rooms are indexes; callers map them to documents. Times handed
+    out are seconds (messages) or milliseconds (presence) into the window.
+    """
+
+    def __init__(
+        self,
+        config: TrafficConfig,
+        users: int,
+        rooms: int,
+        start: datetime,
+        spill_dir: Optional[Path] = None,
+    ) -> None:
+        config.validate()
+        if users < 1 or rooms < 1:
+            raise ValueError("chat traffic needs at least one user and one room")
+        self.config = config
+        self.users = users
+        self.rooms = rooms
+        self.end = config.days * DAY_SECONDS
+        midnight = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.start_offset = (start - midnight).total_seconds()
+        self.rng = CounterRandom(derive_seed(config.seed, "chat-traffic", 0))
+        self.home_key = derive_seed(config.seed, "chat-home-rooms", 0)
+        self.join_rate = users * config.sessions_per_user_day / DAY_SECONDS
+        self.burst_rate = config.messages_per_hour / config.burst_size / 3600
+        self.log = PresenceLog(config.spill_pairs, spill_dir)
+        self.report = TrafficReport(config.days, config.heartbeat_seconds)
+
+    def home_room(self, user: int) -> int:
+        return mix64((self.home_key + (user + 1) * GOLDEN_GAMMA) & MASK64) % self.rooms
+
+    def _next_join(self, t: float) -> float:
+        """Time of the first join after ``t`` (thinning of the daily cycle)."""
+        rng, amplitude = self.rng, self.config.diurnal
+        peak_rate = self.join_rate * (1 + amplitude)
+        phase = 2 * math.pi / DAY_SECONDS
+        peak = PEAK_HOUR_UTC * 3600 - self.start_offset
+        while True:
+            t += rng.expovariate(peak_rate)
+            if t >= self.end or rng.random() * (1 + amplitude) <= 1 + amplitude * math.cos(phase * (t - peak)):
+                return t
+
+    def _burst_length(self) -> int:
+        mean = self.config.burst_size
+        if mean <= 1:
+            return 1
+        # Geometric on 1, 2, ... with the configured mean.
+        return 1 + int(math.log(1.0 - self.rng.random()) / math.log(1 - 1 / mean))
+
+    def _end_session(self, session: _Session, stop: float) -> None:
+        ticks = int((stop - session.joined) // self.config.heartbeat_seconds)
+        self.report.heartbeats += ticks
+        last_active = session.joined + ticks * self.config.heartbeat_seconds
+        self.log.add(
+            session.room, session.user, round(session.joined * 1000), round(last_active * 1000), session.ordinal
+        )
+
+    def run(self, on_message: Callable[[float, int, int], None]) -> TrafficReport:
+        """Play the window, calling ``on_message(seconds, room, user)`` for every message in time order."""
+        started = time.perf_counter()
+        cfg, rng, report, end = self.config, self.rng, self.report, self.end
+        heap: List[Tuple[float, int, int, Optional[_Session]]] = []
+        push, pop = heapq.heappush, heapq.heappop
+        sequence = count()
+        live: Dict[int, _Session] = {}
+        stay_rate = 1 / (cfg.session_minutes * 60)
+        gap_rate = 1 / cfg.burst_gap_seconds
+        burst_rate = self.burst_rate
+        minute, in_minute = -1, 0
+
+        push(heap, (self._next_join(0.0), next(sequence), JOIN, None))
+        while heap:
+            t, _, kind, session = pop(heap)
+            if t >= end:
+                break
+            report.events += 1
+            if kind == MESSAGE:
+                assert session is not None
+                if not session.burst_left:
+                    session.burst_left = self._burst_length()
+                    report.bursts += 1
+                session.burst_left -= 1
+                on_message(t, session.room, session.user)
+                report.messages += 1
+                if int(t // 60) != minute:
+                    minute, in_minute = int(t // 60), 0
+                in_minute += 1
+                if in_minute > report.peak_messages_per_minute:
+                    report.peak_messages_per_minute = in_minute
+                after = t + rng.expovariate(gap_rate if session.burst_left else burst_rate)
+                if after < session.leave:
+                    push(heap, (after, next(sequence), MESSAGE, session))
+            elif kind == JOIN:
+                push(heap, (self._next_join(t), next(sequence), JOIN, None))
+                user = rng.randrange(self.users)
+                room = self.home_room(user) if rng.random() < cfg.home_share else rng.randrange(self.rooms)
+                key = room * self.users + user
+                if key in live:
+                    report.folded_joins += 1
+                    continue
+                session = _Session(room, user, report.sessions, t, t + rng.expovariate(stay_rate))
+                report.sessions += 1
+                live[key] = session
+                if len(live) > report.peak_sessions:
+                    report.peak_sessions = len(live)
+                if session.leave < end:
+                    push(heap, (session.leave, next(sequence), LEAVE, session))
+                if burst_rate:
+                    first = t + rng.expovariate(burst_rate)
+                    if first < session.leave:
+                        push(heap, (first, next(sequence), MESSAGE, session))
+                if len(heap) > report.peak_heap:
+                    report.peak_heap = len(heap)
+            else:
+                assert session is not None
+                del live[session.room * self.users + session.user]
+                self._end_session(session, t)
+        # Sessions still live when the window closes keep their last heartbeat.
+        for session in live.values():
+            self._end_session(session, end)
+        report.runs = len(self.log.runs)
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def presence(self) -> Iterator[PresenceRecord]:
+        """After :meth:`run`: the latest session of every (room, user) pair, in pair order."""
+        for record in self.log.latest():
+            self.report.presence += 1
+            yield record
+
+    def close(self) -> None:
+        self.log.close()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Check the sample fixtures for dangling references, duplicate ids and stale counters.
+
+Exits with status 1 when any problem is found, so it can gate a fixture refresh.
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import List
+
+from sample_data.collections import DATA_DIR
+from sample_data.columns import add_column_cache_argument
+from sample_data.integrity import validate, validate_uncached
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=DATA_DIR,
+        help="Directory holding the mongodb-sample-* files (default: the checked-in fixtures)",
+    )
+    parser.add_argument("--workers", type=int, help="Worker processes for reading collections (default: CPU count)")
+    add_column_cache_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.column_cache:
+        report = validate(args.data_dir, args.workers)
+    else:
+        report = validate_uncached(args.data_dir, args.workers)
+    for line in report.lines():
+        print(line)
+    if not report.ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
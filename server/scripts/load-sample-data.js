@@ -5,7 +5,13 @@ const dotenv = require('dotenv');
 
 dotenv.config({ path: path.join(__dirname, '..', '.env') });
 
-const { loadSampleData, COLLECTIONS, DEFAULT_DATA_DIR } = require('./utils/sampleDataLoader');
+const {
+  loadSampleData,
+  applySampleDataDelta,
+  COLLECTIONS,
+  DEFAULT_DATA_DIR,
+  DEFAULT_DELTA_DIR
+} = require('./utils/sampleDataLoader');
 
 const COLLECTION_NAMES = COLLECTIONS.map((collection) => collection.name);
 
@@ -18,6 +24,8 @@ Options:
   -d, --data-dir <path>      Override the sample data directory (default: ${DEFAULT_DATA_DIR})
       --keep                 Keep existing documents (skip collection drop)
       --drop                 Explicitly drop existing documents before inserting (default)
+      --delta [path]         Upsert only the documents in a delta written by the fixture scripts'
+                             --delta option (default: ${DEFAULT_DELTA_DIR}); implies --keep
       --dry-run              Show what would happen without writing to MongoDB
   -h, --help                 Show this message
 
@@ -32,6 +40,8 @@ function parseArgs(argv) {
     dryRun: false,
     collections: null,
     dataDir: DEFAULT_DATA_DIR,
+    deltaDir: null,
+    explicitDrop: false,
     help: false
   };
 
@@ -68,7 +78,19 @@ function parseArgs(argv) {
         break;
       case '--drop':
         options.drop = true;
+        options.explicitDrop = true;
         break;
+      case '--delta': {
+        const value = argv[index + 1];
+        if (value && !value.startsWith('-')) {
+          options.deltaDir = path.resolve(process.cwd(), value);
+          index += 1;
+        } else {
+          options.deltaDir = DEFAULT_DELTA_DIR;
+        }
+        options.drop = false;
+        break;
+      }
       case '--dry-run':
         options.dryRun = true;
         break;
@@ -85,6 +107,10 @@ function parseArgs(argv) {
     options.collections = null;
   }
 
+  if (options.deltaDir && options.explicitDrop) {
+    throw new Error('--delta upserts into the existing documents and cannot be combined with --drop.');
+  }
+
   return options;
 }
 
@@ -112,13 +138,22 @@ async function main() {
   await mongoose.connect(process.env.MONGODB_URI || 'mongodb://localhost:27017/pinpoint');
 
   try {
-    await loadSampleData({
-      collections,
-      dropExisting: args.drop,
-      dryRun: args.dryRun,
-      dataDir: args.dataDir,
-      logger: console
-    });
+    if (args.deltaDir) {
+      await applySampleDataDelta({
+        collections,
+        dryRun: args.dryRun,
+        deltaDir: args.deltaDir,
+        logger: console
+      });
+    } else {
+      await loadSampleData({
+        collections,
+        dropExisting: args.drop,
+        dryRun: args.dryRun,
+        dataDir: args.dataDir,
+        logger: console
+      });
+    }
 
     if (args.dryRun) {
       console.log('[dry-run] Completed without modifying the database.');
@@ -130,7 +165,11 @@ async function main() {
   }
 }
 
-main().catch((error) => {
-  console.error('Sample data load failed:', error.message || error);
-  mongoose.disconnect().finally(() => process.exit(1));
-});
+if (require.main === module) {
+  main().catch((error) => {
+    console.error('Sample data load failed:', error.message || error);
+    mongoose.disconnect().finally(() => process.exit(1));
+  });
+}
+
+module.exports = { parseArgs };
@@ -1,5 +1,7 @@
 const fs = require('fs/promises');
+const { createReadStream } = require('fs');
 const path = require('path');
+const readline = require('readline');
 const mongoose = require('mongoose');
 
 const User = require('../../models/User');
@@ -19,6 +21,10 @@ const ContentReport = require('../../models/ContentReport');
 const DirectMessageThread = require('../../models/DirectMessageThread');
 
 const DEFAULT_DATA_DIR = path.join(__dirname, '..', '..', '..', 'docs', 'mongodb-local-sample-data');
+// Written by the fixture scripts' --delta option (scripts/sample_data/delta.py).
+const DEFAULT_DELTA_DIR = path.join(DEFAULT_DATA_DIR, '.delta');
+const DELTA_VERSION = 1;
+const DELTA_BATCH_SIZE = 1000;
 
 const COLLECTIONS = [
   { name: 'users', model: User, filename: 'mongodb-sample-users.json' },
@@ -146,8 +152,99 @@ async function loadSampleData({
   }
 }
 
+async function* readDeltaDocuments(filePath) {
+  const lines = readline.createInterface({
+    input: createReadStream(filePath, { encoding: 'utf8' }),
+    crlfDelay: Infinity
+  });
+  for await (const line of lines) {
+    if (line.trim()) {
+      yield convertExtendedJSON(JSON.parse(line));
+    }
+  }
+}
+
+async function readDeltaManifest(deltaDir) {
+  const manifestPath = path.join(deltaDir, 'manifest.json');
+  let manifest;
+  try {
+    manifest = JSON.parse(await fs.readFile(manifestPath, 'utf8'));
+  } catch (error) {
+    if (error.code === 'ENOENT') {
+      throw new Error(`No delta found at ${deltaDir} (missing manifest.json). Run the fixture scripts with --delta first.`);
+    }
+    throw new Error(`Failed to read ${manifestPath}: ${error.message}`);
+  }
+  if (manifest.version !== DELTA_VERSION) {
+    throw new Error(`Unsupported delta version ${manifest.version} in ${manifestPath}.`);
+  }
+  return manifest;
+}
+
+async function applySampleDataDelta({
+  collections,
+  dryRun = false,
+  deltaDir = DEFAULT_DELTA_DIR,
+  logger = console
+} = {}) {
+  const manifest = await readDeltaManifest(deltaDir);
+  const wanted = collections && collections.length ? new Set(collections) : null;
+  const names = Object.keys(manifest.collections || {}).filter((name) => !wanted || wanted.has(name));
+
+  logger.info?.(
+    `${dryRun ? '[dry-run] ' : ''}Applying sample data delta for ${names.length} collection${names.length === 1 ? '' : 's'} from ${deltaDir}.`
+  );
+
+  for (const name of names) {
+    const entry = collectionIndex.get(name);
+    if (!entry) {
+      logger.warn?.(`Skipping unknown collection "${name}" in the delta manifest.`);
+      continue;
+    }
+    const { file, upserts = 0, deleted = [] } = manifest.collections[name];
+    const collectionName = entry.model.collection.collectionName;
+
+    if (dryRun) {
+      logger.info?.(`[dry-run] Would upsert ${upserts} and delete ${deleted.length} documents in ${collectionName}.`);
+      continue;
+    }
+
+    // Deletes go first: an upsert may reuse the unique key (e.g. a bookmark's userId + pinId)
+    // of a document the delta removes, and would fail with E11000 while that one still exists.
+    if (deleted.length) {
+      await entry.model.deleteMany({ _id: { $in: deleted.map((id) => new ObjectId(id)) } });
+    }
+
+    // Whole documents replace their stored version by _id, so applying a delta twice is harmless.
+    let written = 0;
+    let batch = [];
+    const flush = async () => {
+      if (batch.length) {
+        await entry.model.bulkWrite(batch, { ordered: false });
+        written += batch.length;
+        batch = [];
+      }
+    };
+    if (file) {
+      for await (const document of readDeltaDocuments(path.join(deltaDir, file))) {
+        batch.push({ replaceOne: { filter: { _id: document._id }, replacement: document, upsert: true } });
+        if (batch.length >= DELTA_BATCH_SIZE) {
+          await flush();
+        }
+      }
+    }
+    await flush();
+    logger.info?.(`Upserted ${written} and deleted ${deleted.length} documents in ${collectionName}.`);
+  }
+}
+
 module.exports = {
   loadSampleData,
+  applySampleDataDelta,
+  convertExtendedJSON,
+  readDeltaManifest,
   COLLECTIONS,
-  DEFAULT_DATA_DIR
+  DEFAULT_DATA_DIR,
+  DEFAULT_DELTA_DIR,
+  DELTA_BATCH_SIZE
 };
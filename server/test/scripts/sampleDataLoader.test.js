@@ -0,0 +1,171 @@
+const fs = require('fs/promises');
+const os = require('os');
+const path = require('path');
+const mongoose = require('mongoose');
+
+function mockModel(collectionName) {
+  return {
+    collection: { collectionName },
+    bulkWrite: jest.fn().mockResolvedValue({}),
+    deleteMany: jest.fn().mockResolvedValue({}),
+    insertMany: jest.fn().mockResolvedValue([])
+  };
+}
+
+jest.mock('../../models/User', () => mockModel('users'));
+jest.mock('../../models/Pin', () => mockModel('pins'));
+jest.mock('../../models/Bookmark', () => ({
+  Bookmark: mockModel('bookmarks'),
+  BookmarkCollection: mockModel('bookmarkcollections')
+}));
+jest.mock('../../models/Reply', () => mockModel('replies'));
+jest.mock('../../models/ProximityChat', () => ({
+  ProximityChatRoom: mockModel('proximitychatrooms'),
+  ProximityChatMessage: mockModel('proximitychatmessages'),
+  ProximityChatPresence: mockModel('proximitychatpresences')
+}));
+jest.mock('../../models/Update', () => mockModel('updates'));
+jest.mock('../../models/Location', () => mockModel('locations'));
+jest.mock('../../models/FriendRequest', () => mockModel('friendrequests'));
+jest.mock('../../models/ModerationAction', () => mockModel('moderationactions'));
+jest.mock('../../models/ContentReport', () => mockModel('contentreports'));
+jest.mock('../../models/DirectMessageThread', () => mockModel('directmessagethreads'));
+
+const { Bookmark } = require('../../models/Bookmark');
+const {
+  applySampleDataDelta,
+  readDeltaManifest,
+  DELTA_BATCH_SIZE
+} = require('../../scripts/utils/sampleDataLoader');
+const { parseArgs } = require('../../scripts/load-sample-data');
+
+const { ObjectId } = mongoose.Types;
+
+const logger = { info: jest.fn(), warn: jest.fn() };
+
+async function writeDelta(manifest, files = {}) {
+  const deltaDir = await fs.mkdtemp(path.join(os.tmpdir(), 'sample-delta-'));
+  await fs.writeFile(path.join(deltaDir, 'manifest.json'), JSON.stringify(manifest));
+  await Promise.all(
+    Object.entries(files).map(([name, documents]) =>
+      fs.writeFile(path.join(deltaDir, name), documents.map((doc) => JSON.stringify(doc)).join('\n') + '\n')
+    )
+  );
+  return deltaDir;
+}
+
+function bookmarkDocument(index) {
+  return {
+    _id: { $oid: new ObjectId().toHexString() },
+    userId: { $oid: '68e061721329566a22d474a7' },
+    pinId: { $oid: new ObjectId().toHexString() },
+    notes: `bookmark ${index}`,
+    createdAt: { $date: '2025-10-04T12:00:00.000Z' }
+  };
+}
+
+describe('sampleDataLoader delta', () => {
+  let deltaDir;
+
+  afterEach(async () => {
+    if (deltaDir) {
+      await fs.rm(deltaDir, { recursive: true, force: true });
+      deltaDir = null;
+    }
+  });
+
+  it('rejects a manifest written for another delta version', async () => {
+    deltaDir = await writeDelta({ version: 2, collections: {} });
+
+    await expect(readDeltaManifest(deltaDir)).rejects.toThrow('Unsupported delta version 2');
+    await expect(applySampleDataDelta({ deltaDir, logger })).rejects.toThrow('Unsupported delta version 2');
+    expect(Bookmark.bulkWrite).not.toHaveBeenCalled();
+  });
+
+  it('reports a missing manifest', async () => {
+    deltaDir = await fs.mkdtemp(path.join(os.tmpdir(), 'sample-delta-'));
+
+    await expect(readDeltaManifest(deltaDir)).rejects.toThrow('missing manifest.json');
+  });
+
+  it('upserts NDJSON documents converted from Extended JSON', async () => {
+    const document = bookmarkDocument(0);
+    deltaDir = await writeDelta(
+      { version: 1, collections: { bookmarks: { file: 'bookmarks.ndjson', upserts: 1, deleted: [] } } },
+      { 'bookmarks.ndjson': [document] }
+    );
+
+    await applySampleDataDelta({ deltaDir, logger });
+
+    expect(Bookmark.bulkWrite).toHaveBeenCalledTimes(1);
+    const [operations, options] = Bookmark.bulkWrite.mock.calls[0];
+    expect(options).toEqual({ ordered: false });
+    const { filter, replacement, upsert } = operations[0].replaceOne;
+    expect(upsert).toBe(true);
+    expect(replacement._id).toBeInstanceOf(ObjectId);
+    expect(replacement._id.toHexString()).toBe(document._id.$oid);
+    expect(filter._id).toBe(replacement._id);
+    expect(replacement.userId).toBeInstanceOf(ObjectId);
+    expect(replacement.createdAt).toEqual(new Date('2025-10-04T12:00:00.000Z'));
+    expect(replacement.notes).toBe('bookmark 0');
+    expect(Bookmark.deleteMany).not.toHaveBeenCalled();
+  });
+
+  it('writes upserts in batches of DELTA_BATCH_SIZE', async () => {
+    const documents = Array.from({ length: DELTA_BATCH_SIZE + 1 }, (_, index) => bookmarkDocument(index));
+    deltaDir = await writeDelta(
+      {
+        version: 1,
+        collections: { bookmarks: { file: 'bookmarks.ndjson', upserts: documents.length, deleted: [] } }
+      },
+      { 'bookmarks.ndjson': documents }
+    );
+
+    await applySampleDataDelta({ deltaDir, logger });
+
+    expect(Bookmark.bulkWrite.mock.calls.map(([operations]) => operations.length)).toEqual([DELTA_BATCH_SIZE, 1]);
+  });
+
+  it('deletes removed documents before upserting their replacements', async () => {
+    const removed = ['68e061721329566a22d47a10', '68e061721329566a22d47a11'];
+    deltaDir = await writeDelta(
+      { version: 1, collections: { bookmarks: { file: 'bookmarks.ndjson', upserts: 1, deleted: removed } } },
+      { 'bookmarks.ndjson': [bookmarkDocument(0)] }
+    );
+
+    await applySampleDataDelta({ deltaDir, logger });
+
+    expect(Bookmark.deleteMany).toHaveBeenCalledTimes(1);
+    const [{ _id }] = Bookmark.deleteMany.mock.calls[0];
+    expect(_id.$in.map((id) => id.toHexString())).toEqual(removed);
+    expect(Bookmark.deleteMany.mock.invocationCallOrder[0]).toBeLessThan(
+      Bookmark.bulkWrite.mock.invocationCallOrder[0]
+    );
+  });
+
+  it('writes nothing on a dry run', async () => {
+    deltaDir = await writeDelta(
+      { version: 1, collections: { bookmarks: { file: 'bookmarks.ndjson', upserts: 1, deleted: [] } } },
+      { 'bookmarks.ndjson': [bookmarkDocument(0)] }
+    );
+
+    await applySampleDataDelta({ deltaDir, dryRun: true, logger });
+
+    expect(Bookmark.bulkWrite).not.toHaveBeenCalled();
+    expect(Bookmark.deleteMany).not.toHaveBeenCalled();
+  });
+});
+
+describe('load-sample-data parseArgs', () => {
+  it('keeps existing documents when applying a delta', () => {
+    const options = parseArgs(['--delta', 'tmp/delta']);
+
+    expect(options.deltaDir).toBe(path.resolve(process.cwd(), 'tmp/delta'));
+    expect(options.drop).toBe(false);
+  });
+
+  it('refuses --delta together with --drop', () => {
+    expect(() => parseArgs(['--delta', '--drop'])).toThrow('cannot be combined with --drop');
+    expect(() => parseArgs(['--drop', '--delta'])).toThrow('cannot be combined with --drop');
+  });
+});